@@ -0,0 +1,249 @@
+"""
+LAB Dashboard asyncio Odoo client
+=================================
+Veel gelijktijdige Odoo requests (pagina's, deelperiodes, per bedrijf)
+zonder een thread per request.
+
+- AsyncOdooClient: JSON-RPC POSTs over asyncio streams (HTTP/1.1,
+  keep-alive, gzip). Verbindingen worden hergebruikt via een kleine pool;
+  een semaphore begrenst het aantal requests dat tegelijk bij Odoo ligt.
+  Coroutines die wachten kosten bijna niets, dus honderden calls tegelijk
+  aanbieden is geen probleem.
+- Eén event loop in een achtergrondthread per proces (overleeft reruns);
+  run_sync() voert een coroutine daarop uit vanuit gewone (Streamlit)
+  code. Wordt de aanroeper onderbroken of verloopt de timeout, dan wordt
+  de coroutine geannuleerd en worden open verbindingen gesloten.
+
+Met een governor (lab_governor) gaat elke request door dezelfde AIMD limiter
+en circuit breaker als het sync pad: de semaphore is dan alleen nog een
+bovengrens per client, Odoo ziet nooit meer dan de gedeelde limiet.
+
+Fouten zijn dezelfde als bij het requests-pad, zodat bestaande
+foutafhandeling en de governor ze herkennen:
+requests.exceptions.Timeout, requests.exceptions.ConnectionError en
+RpcErrorResponse (Odoo gaf "error" terug).
+
+Alleen de standaardbibliotheek; geen aiohttp/httpx nodig.
+"""
+
+import asyncio
+import collections
+import json
+import ssl
+import threading
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+
+from lab_stream import RpcErrorResponse
+
+DEFAULT_CONCURRENCY = 16
+
+
+class _Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    """Keep-alive verbindingen naar één host; alleen te gebruiken vanuit de event loop"""
+
+    def __init__(self, url, max_idle=DEFAULT_CONCURRENCY):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.path = parts.path or "/"
+        self.ssl = ssl.create_default_context() if parts.scheme == "https" else None
+        self.max_idle = max_idle
+        self.opened = 0
+        self._idle = collections.deque()
+
+    async def acquire(self):
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn.reader.at_eof():
+                conn.reused = True
+                return conn
+            conn.close()
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+        self.opened += 1
+        return _Connection(reader, writer)
+
+    def release(self, conn, reusable):
+        if reusable and len(self._idle) < self.max_idle:
+            self._idle.append(conn)
+        else:
+            conn.close()
+
+    def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+async def _read_response(reader):
+    """(status, headers, body) van één HTTP/1.1 response"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("verbinding gesloten voor het antwoord")
+    version, status, _ = status_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        headers["connection"] = "close"
+
+    if version == "HTTP/1.0" and headers.get("connection", "").lower() != "keep-alive":
+        headers["connection"] = "close"
+    return int(status), headers, body
+
+
+class AsyncOdooClient:
+    """JSON-RPC client voor één Odoo URL
+
+    governor: optionele Governor (lab_governor) die met het sync pad gedeeld
+    wordt; elke request wacht op een plek binnen de gedeelde limiet en
+    meldt succes of overbelasting terug. Bij een open breaker faalt een call
+    direct met CircuitOpen.
+    """
+
+    def __init__(self, url, concurrency=DEFAULT_CONCURRENCY, governor=None):
+        self.url = url
+        self.concurrency = concurrency
+        self.governor = governor
+        self.pool = ConnectionPool(url, max_idle=concurrency)
+        self.requests = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _request_bytes(self, body):
+        head = (
+            f"POST {self.pool.path} HTTP/1.1\r\n"
+            f"Host: {self.pool.host}:{self.pool.port}\r\n"
+            "Content-Type: application/json\r\n"
+            "Accept-Encoding: gzip\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+    async def _exchange(self, data):
+        """Eén request/response; een hergebruikte verbinding die al dicht bleek wordt één keer opnieuw geprobeerd"""
+        for attempt in range(2):
+            conn = await self.pool.acquire()
+            reusable = False
+            try:
+                conn.writer.write(data)
+                await conn.writer.drain()
+                status, headers, body = await _read_response(conn.reader)
+                reusable = headers.get("connection", "").lower() != "close"
+                return status, headers, body
+            except (ConnectionError, asyncio.IncompleteReadError):
+                if conn.reused and attempt == 0:
+                    continue
+                raise
+            finally:
+                # Ook bij annuleren: een half gelezen verbinding gaat nooit terug in de pool
+                self.pool.release(conn, reusable)
+
+    async def _send(self, data, timeout):
+        """_exchange met de fouten van het requests-pad"""
+        try:
+            return await asyncio.wait_for(self._exchange(data), timeout)
+        except asyncio.TimeoutError:
+            raise requests.exceptions.Timeout(f"geen antwoord binnen {timeout}s") from None
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            raise requests.exceptions.ConnectionError(str(e) or type(e).__name__) from e
+        finally:
+            self.requests += 1
+
+    async def post(self, payload, timeout=120):
+        """Verstuur een JSON-RPC payload; geeft (result, bytes over de lijn)"""
+        data = self._request_bytes(json.dumps(payload).encode("utf-8"))
+        async with self._semaphore:
+            if self.governor:
+                async with self.governor.async_slot():
+                    status, headers, body = await self._send(data, timeout)
+            else:
+                status, headers, body = await self._send(data, timeout)
+        nbytes = len(body)
+        if headers.get("content-encoding", "").lower() == "gzip":
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        if status >= 400 and not body.startswith(b"{"):
+            raise requests.exceptions.HTTPError(f"HTTP {status}")
+        result = json.loads(body)
+        if "error" in result:
+            raise RpcErrorResponse(result["error"])
+        return result.get("result", []), nbytes
+
+    def close(self):
+        self.pool.close()
+
+
+# =============================================================================
+# SYNC FACADE
+# =============================================================================
+
+_loop = None
+_loop_lock = threading.Lock()
+_clients = {}
+
+
+def _event_loop():
+    """De gedeelde event loop (achtergrondthread, start bij het eerste gebruik)"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="lab-async", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+def open_client(url, concurrency=DEFAULT_CONCURRENCY, governor=None):
+    """Client per (url, concurrency); één instantie per proces, gebonden aan de gedeelde loop"""
+    key = (url, concurrency)
+    with _loop_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = AsyncOdooClient(url, concurrency, governor)
+    return client
+
+
+def run_sync(coro, timeout=None):
+    """Voer een coroutine uit op de gedeelde loop en wacht op het resultaat
+
+    Niet aanroepen vanuit de loop zelf (gebruik daar await). Bij een timeout
+    of onderbreking wordt de coroutine geannuleerd.
+    """
+    loop = _event_loop()
+    if threading.current_thread().name == "lab-async":
+        raise RuntimeError("run_sync vanuit de event loop; gebruik await")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except BaseException:
+        future.cancel()
+        raise
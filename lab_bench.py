@@ -0,0 +1,321 @@
+"""
+LAB Dashboard benchmarks
+========================
+Tijdt elke get_* datafunctie (koud en warm) en de rendertijd per tab tegen
+de lokale mock Odoo (lab_mock_odoo.py) bij verschillende datagroottes.
+De productie-Odoo wordt nooit aangesproken.
+
+Gebruik:
+    python lab_bench.py --sizes 10k,100k,1m --latency-ms 20
+    python lab_bench.py --sizes 5m --no-render --json bench.json
+
+Een opgenomen sessie (LAB_ODOO_RECORD, zie lab_cassette.py) afspelen tegen
+de huidige branch, zonder Odoo of mock:
+    python lab_bench.py --replay sessies/maandag.jsonl.gz --latency recorded
+
+De gedeelde cache via de Redis backend, tegen de stand-in binnen het proces
+(lab_store.MemoryRedis) of een echte server; met een controle van de
+gedeelde laag en de locks (exit code 1 bij een fout):
+    python lab_bench.py --sizes 10k --cache-backend memory://
+    python lab_bench.py --sizes 10k --cache-backend redis://localhost:6379/15
+
+Importtijd bewaken (exit code 1 bij overschrijding, of als pandas/plotly
+weer bij het importeren geladen worden):
+    python lab_bench.py --import-only --max-import-ms 1000
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "lab_dashboard.py")
+
+# Mogen niet bij het importeren van het dashboard geladen worden (pas bij de eerste grafiek/tabel)
+DEFERRED_MODULES = ("pandas", "plotly.express", "folium")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import lab_dashboard
+print(json.dumps({"ms": (time.perf_counter() - started) * 1000,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _prepare_environment():
+    """Eigen cachemap en API key vóór het importeren van het dashboard"""
+    os.environ.setdefault("LAB_CACHE_DIR", tempfile.mkdtemp(prefix="lab-bench-"))
+    os.environ.setdefault("ODOO_API_KEY", "bench")
+    os.environ.setdefault("LAB_ODOO_URL", "http://127.0.0.1:9/jsonrpc")
+    # Change feed polls zouden de gemeten requests vertekenen
+    os.environ.setdefault("LAB_CHANGE_POLL", "0")
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    if HERE not in sys.path:
+        sys.path.insert(0, HERE)
+
+
+def _rows(value):
+    if isinstance(value, tuple):
+        return sum(_rows(v) for v in value)
+    try:
+        return len(value)
+    except TypeError:
+        return 1 if value else 0
+
+
+def _data_functions(data, odoo, year):
+    """(naam, callable) paren voor alle datafuncties in de standaard weergave"""
+    lines = odoo.search_read("account.move.line", [["move_id.move_type", "=", "out_invoice"],
+                                                   ["display_type", "=", "product"]], ["move_id"], limit=1)
+    invoice_id = lines[0]["move_id"][0] if lines else 1
+    return [
+        ("get_bank_balances", lambda: data.get_bank_balances()),
+        ("get_rc_balances", lambda: data.get_rc_balances()),
+        ("get_revenue_data", lambda: data.get_revenue_data(year, None)),
+        ("get_cost_data", lambda: data.get_cost_data(year, None)),
+        ("get_ledger_rollup", lambda: data.get_ledger_rollup(year, None)),
+        ("get_receivables_payables", lambda: data.get_receivables_payables(None)),
+        ("get_invoices", lambda: data.get_invoices(year, None, None, None, None)),
+        ("get_product_sales", lambda: data.get_product_sales(year, None)),
+        ("get_product_categories", lambda: data.get_product_categories()),
+        ("get_pos_product_sales", lambda: data.get_pos_product_sales(year, 1)),
+        ("get_top_products", lambda: data.get_top_products(year, None, limit=20)),
+        ("get_customer_locations", lambda: data.get_customer_locations(3)),
+        ("get_invoice_lines", lambda: data.get_invoice_lines(invoice_id)),
+        ("get_invoice_pdf", lambda: data.get_invoice_pdf(invoice_id)),
+    ]
+
+
+def bench_functions(data, odoo, year, repeat):
+    import lab_cache
+
+    results = []
+    for name, call in _data_functions(data, odoo, year):
+        cold, warm = [], []
+        requests_before = odoo.stats["__requests"]
+        for _ in range(repeat):
+            lab_cache.clear_all(closed=True)
+            started = time.perf_counter()
+            value = call()
+            cold.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            call()
+            warm.append(time.perf_counter() - started)
+        results.append({
+            "function": name,
+            "rows": _rows(value),
+            "cold_ms": round(statistics.median(cold) * 1000, 1),
+            "warm_ms": round(statistics.median(warm) * 1000, 2),
+            "requests": (odoo.stats["__requests"] - requests_before) // repeat,
+        })
+    return results
+
+
+def check_backend(data, odoo):
+    """Gedeelde backend: een tweede replica leest uit de backend i.p.v. Odoo en locks zijn exclusief
+
+    Lijst van fouten; leeg betekent geslaagd.
+    """
+    import lab_cache
+    import lab_metrics
+    from lab_store import open_backend
+
+    failures = []
+    year = date.today().year        # lopend jaar: gedeelde laag, niet de permanente opslag
+    lab_cache.clear_all(closed=True)
+    expected = _rows(data.get_revenue_data(year, None))
+    # 'Tweede replica': leeg geheugen, zelfde backend
+    budget = lab_cache.memory_stats()["budget"]
+    lab_cache.configure_memory(0)
+    lab_cache.configure_memory(budget)
+    requests_before = odoo.stats["__requests"]
+    mark = lab_metrics.mark()
+    rows = _rows(data.get_revenue_data(year, None))
+    outcomes = [e["outcome"] for e in lab_metrics.recent(since=mark) if e["type"] == "cache"]
+    if "shared" not in outcomes or odoo.stats["__requests"] != requests_before or rows != expected:
+        failures.append(f"backend: gedeelde waarde niet overgenomen ({outcomes}, "
+                        f"{odoo.stats['__requests'] - requests_before} requests, {rows}/{expected} rijen)")
+
+    backend = open_backend("check")
+    with backend.lock("bezet", timeout=5):
+        started = time.perf_counter()
+        with backend.lock("bezet", timeout=0.2):
+            waited = time.perf_counter() - started
+    if waited < 0.2:
+        failures.append(f"backend: lock niet exclusief (na {waited * 1000:.0f} ms verkregen)")
+
+    # Een verlopen lock die vrijgegeven wordt mag de lock van de nieuwe houder niet verwijderen
+    expired = backend.lock("verlopen", timeout=0.05)
+    expired.__enter__()
+    time.sleep(0.1)
+    with backend.lock("verlopen", timeout=1):
+        expired.__exit__(None, None, None)
+        started = time.perf_counter()
+        with backend.lock("verlopen", timeout=0.2):
+            waited = time.perf_counter() - started
+    if waited < 0.2:
+        failures.append("backend: verlopen lock verwijderde de lock van een andere houder")
+    backend.clear()
+    return failures
+
+
+def bench_render(repeat):
+    """Volledige scriptrun via Streamlit's AppTest, koud en warm, met tijd per tab"""
+    from streamlit.testing.v1 import AppTest
+
+    import lab_cache
+    import lab_metrics
+
+    results = []
+    for label, clear in (("cold", True), ("warm", False)):
+        runs = []
+        for _ in range(repeat):
+            if clear:
+                lab_cache.clear_all(closed=True)
+            mark = lab_metrics.mark()
+            started = time.perf_counter()
+            app = AppTest.from_file(SCRIPT, default_timeout=600).run()
+            elapsed = time.perf_counter() - started
+            if app.exception:
+                print(f"  ! dashboard fout ({label}): {app.exception[0].message}", file=sys.stderr)
+            events = lab_metrics.recent(since=mark)
+            tabs = {e["section"]: e["ms"] for e in events if e["type"] == "render"}
+            runs.append((elapsed, tabs, sum(e["type"] == "rpc" for e in events)))
+        row = {"run": label, "total_ms": round(statistics.median(r[0] for r in runs) * 1000, 1),
+               "requests": runs[-1][2]}
+        for tab in runs[0][1]:
+            row[tab] = round(statistics.median(r[1].get(tab, 0.0) for r in runs), 1)
+        results.append(row)
+    return results
+
+
+def bench_import(repeat):
+    """Importtijd van het dashboard in een vers proces (mediaan) en te vroeg geladen modules"""
+    env = dict(os.environ, LAB_CACHE_DIR=tempfile.mkdtemp(prefix="lab-bench-import-"))
+    env.setdefault("ODOO_API_KEY", "bench")
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_PROBE % (DEFERRED_MODULES,)], cwd=HERE,
+                                env=env, capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {"import_ms": round(statistics.median(r["ms"] for r in runs), 1),
+            "loaded": ",".join(runs[-1]["loaded"]) or "-"}
+
+
+def check_import(result, max_import_ms=None):
+    """Lijst van overschrijdingen; leeg betekent geslaagd"""
+    failures = []
+    if result["loaded"] != "-":
+        failures.append(f"bij het importeren geladen: {result['loaded']}")
+    if max_import_ms is not None and result["import_ms"] > max_import_ms:
+        failures.append(f"importtijd {result['import_ms']} ms > {max_import_ms} ms")
+    return failures
+
+
+def _print_table(rows):
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = [max(len(str(c)), *(len(str(r.get(c, ""))) for r in rows)) for c in columns]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark het LAB dashboard tegen de mock Odoo")
+    parser.add_argument("--sizes", default="10k,100k,1m", help="komma-gescheiden aantallen regels")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--year", type=int, default=date.today().year - 1)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--row-latency-us", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-render", action="store_true", help="sla de AppTest tab-render metingen over")
+    parser.add_argument("--replay", help="speel een opgenomen cassette af in plaats van de mock")
+    parser.add_argument("--latency", default="recorded",
+                        help="latency profiel bij --replay: recorded, none, fixed:<ms> of scale:<factor>")
+    parser.add_argument("--cache-backend",
+                        help="gedeelde cache (LAB_CACHE_BACKEND), bv. memory:// of redis://...; met controle")
+    parser.add_argument("--json", help="schrijf resultaten als JSON naar dit bestand")
+    parser.add_argument("--import-only", action="store_true", help="alleen de importtijd meten")
+    parser.add_argument("--max-import-ms", type=float, help="maximale importtijd van het dashboard")
+    args = parser.parse_args()
+
+    print("=== import ===")
+    startup = bench_import(args.repeat)
+    _print_table([startup])
+    failures = check_import(startup, args.max_import_ms)
+    report = [{"import": startup}]
+
+    if args.import_only:
+        _finish(report, failures, args.json)
+        return
+
+    if args.replay:
+        os.environ["LAB_ODOO_REPLAY"] = args.replay
+        os.environ["LAB_REPLAY_LATENCY"] = args.latency
+    if args.cache_backend:
+        os.environ["LAB_CACHE_BACKEND"] = args.cache_backend
+
+    _prepare_environment()
+    import lab_data as data
+    from lab_mock_odoo import MockOdoo, generate_dataset, parse_size, serve
+
+    if args.replay:
+        print(f"\n=== replay {args.replay} (latency {args.latency}) ===")
+        renders = bench_render(args.repeat)
+        _print_table(renders)
+        misses = data.ODOO_TRANSPORT.misses
+        if misses:
+            print(f"  ! {misses} requests niet in de cassette", file=sys.stderr)
+        report.append({"replay": args.replay, "latency": args.latency, "render": renders, "misses": misses})
+
+    sizes = [] if args.replay else args.sizes.split(",")
+    for size_text in sizes:
+        size = parse_size(size_text)
+        started = time.perf_counter()
+        odoo = MockOdoo(generate_dataset(size, seed=args.seed), latency_ms=args.latency_ms,
+                        row_latency_us=args.row_latency_us, seed=args.seed)
+        server, url = serve(odoo)
+        data.ODOO_URL = url
+        os.environ["LAB_ODOO_URL"] = url
+        print(f"\n=== {size:,} regels (dataset {time.perf_counter() - started:.1f}s, {url}) ===")
+        try:
+            functions = bench_functions(data, odoo, args.year, args.repeat)
+            _print_table(functions)
+            if args.cache_backend:
+                backend_failures = check_backend(data, odoo)
+                print(f"\nbackend {args.cache_backend}: {'; '.join(backend_failures) or 'ok'}")
+                failures.extend(backend_failures)
+            renders = [] if args.no_render else bench_render(args.repeat)
+            if renders:
+                print()
+                _print_table(renders)
+        finally:
+            server.shutdown()
+            server.server_close()
+        report.append({"lines": size, "functions": functions, "render": renders})
+
+    _finish(report, failures, args.json)
+
+
+def _finish(report, failures, json_path):
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,693 @@
+"""
+LAB Dashboard cachelaag
+=======================
+Stale-while-revalidate cache voor de Odoo datafuncties.
+
+- Verse entry (jonger dan ttl): direct uit geheugen
+- Verlopen entry: de laatste goede waarde wordt direct geserveerd en een
+  achtergrondthread haalt een nieuwe versie op
+- Prewarmer: ververst veelgebruikte entries kort vóór ze verlopen, zodat
+  een gebruiker in de praktijk nooit op een koude Odoo fetch wacht
+- Single-flight: gelijktijdige identieke calls (meerdere sessies na een
+  verlopen cache) wachten op één upstream request en delen het resultaat
+- Afgesloten periodes: resultaten voor afgesloten boekjaren veranderen niet
+  meer; die worden één keer op schijf gezet en daarna zonder ttl geserveerd
+- Noodval: mislukt een synchrone fetch (Odoo traag/onbereikbaar, circuit
+  breaker open), dan wordt de laatst bekende waarde geserveerd, ongeacht de
+  leeftijd, in plaats van een leeg resultaat. Zulke lookups worden als
+  "fallback" gemeten (met de leeftijd) zodat het dashboard een banner toont
+- Gedeelde laag / warm start: elke entry wordt ook naar de gedeelde backend
+  geschreven (lab_store: lokale map of Redis). Een replica of een herstart
+  proces leest een entry bij het eerste gebruik daaruit, serveert hem direct
+  en ververst op de achtergrond. Een lock per key zorgt dat maar één replica
+  tegelijk dezelfde dataset bij Odoo ophaalt; de anderen nemen die versie over
+- Wijzigingen: functies met sources (Odoo modellen) worden door de change feed
+  (lab_changes.py) ongeldig gemaakt zodra die modellen wijzigen. Zolang de
+  feed loopt geldt voor hen FEED_TTL in plaats van de ttl
+- Geheugenbudget: elke entry krijgt een geschatte omvang; boven het budget
+  (configure_memory) worden entries verwijderd volgens GreedyDual-Size-
+  Frequency: eerst groot, weinig gebruikt en goedkoop opnieuw op te halen
+  (afgesloten periodes staan op schijf). Verwijderen is veilig: de volgende
+  call haalt de waarde uit de gedeelde laag, van schijf of uit Odoo.
+  De gedeelde dimensietabellen van de FactTables (lab_facts.py) tellen mee
+  voor het budget; namen die geen enkele tabel meer gebruikt verdwijnen
+  zodra de laatste entry die ze gebruikte verwijderd is
+
+De state staat in deze module (en niet in lab_dashboard.py) omdat Streamlit
+het hoofdscript bij elke rerun opnieuw uitvoert; geïmporteerde modules blijven
+wél in het geheugen.
+"""
+
+import contextlib
+import functools
+import hashlib
+import inspect
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import lab_metrics
+from lab_facts import dimensions_nbytes
+from lab_store import open_backend
+
+DEFAULT_TTL = 300
+MAX_STALE = 3600        # ouder dan dit: niet meer stale serveren maar synchroon ophalen
+RETRY_AFTER = 30        # wachttijd na een mislukte achtergrond-refresh
+PREWARM_LEAD = 0.2      # ververs hot entries in de laatste 20% van hun ttl
+PREWARM_INTERVAL = 10   # seconden tussen twee prewarm rondes
+HOT_WINDOW = 3          # entry is 'hot' als hij binnen 3x ttl is opgevraagd
+WARM_MAX_AGE = 24 * 3600  # warm-start entries ouder dan dit worden genegeerd
+FEED_TTL = 1800         # ttl van entries met sources zolang de change feed loopt (vangnet)
+MEMORY_BUDGET = 512 * 2**20  # geheugen voor alle entries plus dimensietabellen (configure_memory)
+EVICT_TO = 0.9          # na een overschrijding ruimen tot 90% van het budget
+DISK_COST = 0.01        # geschatte seconden om een afgesloten entry van schijf te lezen
+SIZE_SAMPLE = 100       # grote lijsten/dicts: omvang schatten uit zoveel elementen
+
+_lock = threading.RLock()
+_entries = {}
+_functions = {}
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="lab-cache")
+_local = threading.local()
+_prewarmer = None
+_backend_url = None
+_closed_backend = open_backend("closed")
+_shared_backend = open_backend("shared")
+_feed_valid_until = 0.0
+_memory_budget = MEMORY_BUDGET
+_memory_used = 0
+_evictions = 0
+_evicted_bytes = 0
+_clock = 0.0            # GDSF: prioriteit van de laatst verwijderde entry (veroudering)
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "last_access", "hits", "call",
+                 "refreshing", "failed_at", "closed", "expired_at", "size", "cost", "priority")
+
+    def __init__(self, value, call, closed=False):
+        now = time.time()
+        self.value = value
+        self.stored_at = now
+        self.last_access = now
+        self.hits = 0
+        self.call = call
+        self.refreshing = False
+        self.failed_at = 0.0
+        self.closed = closed
+        self.expired_at = 0.0   # tijdstip waarop de change feed de entry ongeldig maakte
+        self.size = 0           # geschatte bytes
+        self.cost = DISK_COST   # geschatte seconden om de waarde opnieuw op te halen
+        self.priority = 0.0
+
+    def touch(self, now):
+        """Gebruik registreren (lock moet vastgehouden worden)"""
+        self.last_access = now
+        self.hits += 1
+        self.priority = _priority(self)
+
+
+def _priority(entry):
+    """GreedyDual-Size-Frequency: klok + gebruik × herhaalkosten per MB; de laagste gaat eruit"""
+    return _clock + (entry.hits + 1) * entry.cost / (max(entry.size, 1) / 2**20)
+
+
+def _sizeof(value, depth=0):
+    """Geschatte geheugenomvang in bytes; grote verzamelingen via een steekproef"""
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        # FactTable en numpy/pandas: zelf bijgehouden
+        return nbytes
+    size = sys.getsizeof(value)
+    if depth > 3 or isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        sample = list(itertools.islice(value.items(), SIZE_SAMPLE))
+        inner = sum(_sizeof(k, depth + 1) + _sizeof(v, depth + 1) for k, v in sample)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        sample = list(itertools.islice(value, SIZE_SAMPLE))
+        inner = sum(_sizeof(v, depth + 1) for v in sample)
+    else:
+        return size
+    return size + (inner * len(value) // len(sample) if sample else 0)
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, tuple):
+        return all(_is_empty(v) for v in value)
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+class SingleFlight:
+    """Coalesceer gelijktijdige calls met dezelfde key tot één uitvoering"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Voer fn uit, of wacht op de lopende uitvoering met dezelfde key"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_flight = SingleFlight()
+
+
+def single_flight(func):
+    """Decorator: coalesceer gelijktijdige identieke calls naar een (ongecachte) functie"""
+    signature = inspect.signature(func)
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return _flight.do((name, tuple(bound.arguments.items())), func, *args, **kwargs)
+    return wrapper
+
+
+def in_background():
+    """True als de huidige thread een achtergrond-refresh uitvoert"""
+    return getattr(_local, "background", False)
+
+
+def note_error():
+    """Markeer dat de lopende berekening een Odoo fout kreeg (niet persistent opslaan)"""
+    _local.errors = getattr(_local, "errors", 0) + 1
+
+
+def _code_version(code):
+    """Stabiele hash van een code object (ook over processen heen)"""
+    digest = hashlib.sha1(code.co_code)
+    for const in code.co_consts:
+        # Geneste code objects (comprehensions) hebben een adres in hun repr
+        digest.update(_code_version(const).encode() if inspect.iscode(const) else repr(const).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class CachedFunction:
+    """Wrapper rond een datafunctie met stale-while-revalidate caching"""
+
+    def __init__(self, func, ttl=DEFAULT_TTL, max_stale=MAX_STALE,
+                 stale_while_revalidate=True, closed=None, shared=True, sources=()):
+        self.func = func
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.stale_while_revalidate = stale_while_revalidate
+        self.closed = closed
+        self.shared = shared
+        self.sources = frozenset(sources)
+        self.cost = None        # gemiddelde rekentijd (s), voor de evictie-prioriteit
+        # Wijzigt de functie (bv. het domein), dan vervallen de opgeslagen resultaten
+        self.version = _code_version(func.__code__)
+        self._signature = inspect.signature(func)
+        functools.update_wrapper(self, func)
+
+    def fresh_for(self):
+        """Effectieve ttl: langer als de change feed deze bronnen bewaakt"""
+        if self.sources and time.time() < _feed_valid_until:
+            return max(self.ttl, FEED_TTL)
+        return self.ttl
+
+    def _is_fresh(self, entry, now):
+        return entry.closed or (not entry.expired_at and now - entry.stored_at < self.fresh_for())
+
+    def _bind(self, args, kwargs):
+        bound = self._signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        return bound.arguments
+
+    def __call__(self, *args, **kwargs):
+        arguments = self._bind(args, kwargs)
+        key = (self.name, tuple(arguments.items()))
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and self._is_fresh(entry, time.time()):
+                entry.touch(time.time())
+                lab_metrics.record_cache(self.name, "hit")
+                return entry.value
+
+        if self.closed is not None and self.closed(arguments):
+            return _flight.do(key, self._load_closed, key, args, kwargs)
+
+        now = time.time()
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and self.stale_while_revalidate and (
+                    now - entry.stored_at < self.max_stale or entry.refreshing):
+                entry.touch(now)
+                _schedule_refresh(self, key, entry)
+                # Laatste refresh mislukt: de waarde is ouder dan normaal
+                outcome = "fallback" if entry.failed_at > entry.stored_at else "stale"
+                lab_metrics.record_cache(self.name, outcome, age=now - entry.stored_at)
+                return entry.value
+
+        if entry is None and self.shared:
+            value = _flight.do(key, self._load_shared, key, args, kwargs)
+            if value is not _MISSING:
+                return value
+
+        return _flight.do(key, self._load, key, args, kwargs)
+
+    def peek(self, *args, stale=False, **kwargs):
+        """Verse of afgesloten waarde zonder Odoo te raadplegen; None als er geen is
+
+        stale=True: ook een verlopen waarde die een gewone call nog zou serveren
+        (en op de achtergrond zou verversen).
+        """
+        arguments = self._bind(args, kwargs)
+        key = (self.name, tuple(arguments.items()))
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and (self._is_fresh(entry, time.time()) or (
+                    stale and self.stale_while_revalidate and time.time() - entry.stored_at < self.max_stale)):
+                return entry.value
+        if self.closed is not None and self.closed(arguments):
+            stored = _backend_call(_closed_backend.get, self._store_key(key))
+            if stored is not None:
+                self._store(key, stored[0], (args, kwargs), closed=True)
+                return stored[0]
+        if self.shared and entry is None:
+            # Warm start: een gewone call zou deze versie overnemen
+            stored = _backend_call(_shared_backend.get, self._store_key(key))
+            if stored is not None and time.time() - stored[1] < (WARM_MAX_AGE if stale else self.fresh_for()):
+                return stored[0]
+        return None
+
+    def prime(self, value, *args, **kwargs):
+        """Sla een elders opgehaalde waarde op alsof de functie hem met deze argumenten gaf
+
+        Voor één partitie uit een gecombineerde query (bv. één jaar uit een
+        meerjarige read_group). Alleen volledige resultaten aanbieden: een
+        afgesloten periode wordt permanent bewaard.
+        """
+        arguments = self._bind(args, kwargs)
+        key = (self.name, tuple(arguments.items()))
+        store_key = self._store_key(key)
+        closed = self.closed is not None and self.closed(arguments) and not _is_empty(value)
+        if closed:
+            _backend_call(_closed_backend.put, store_key, value)
+        elif self.shared:
+            _backend_call(_shared_backend.put, store_key, value, ttl=WARM_MAX_AGE)
+        self._store(key, value, (args, kwargs), closed=closed)
+        lab_metrics.record_cache(self.name, "prime")
+
+    def _store_key(self, key):
+        return (self.name, self.version, key[1])
+
+    def _load_shared(self, key, args, kwargs):
+        """Eerste gebruik in dit proces: neem de versie uit de gedeelde backend over
+        (ververst op de achtergrond als hij ouder is dan ttl)"""
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None:
+                return entry.value
+        stored = _backend_call(_shared_backend.get, self._store_key(key))
+        if stored is None or time.time() - stored[1] > WARM_MAX_AGE:
+            return _MISSING
+        value, stored_at = stored
+        lab_metrics.record_cache(self.name, "shared")
+        entry = self._store(key, value, (args, kwargs), stored_at=stored_at)
+        if time.time() - stored_at >= self.fresh_for():
+            with _lock:
+                _schedule_refresh(self, key, entry)
+        return value
+
+    def _compute(self, args, kwargs, outcome="miss"):
+        """Voer de functie uit; geeft (value, aantal Odoo fouten) terug"""
+        outer_errors = getattr(_local, "errors", 0)
+        _local.errors = 0
+        started = time.perf_counter()
+        try:
+            value = self.func(*args, **kwargs)
+            return value, _local.errors
+        finally:
+            _local.errors += outer_errors
+            duration = time.perf_counter() - started
+            self.cost = duration if self.cost is None else 0.7 * self.cost + 0.3 * duration
+            lab_metrics.record_cache(self.name, outcome, duration)
+
+    def _load_closed(self, key, args, kwargs):
+        """Afgesloten periode: uit de persistente store, of één keer ophalen en opslaan"""
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None and entry.closed:
+                return entry.value
+        store_key = self._store_key(key)
+        with _backend_lock(_closed_backend, store_key):
+            stored = _backend_call(_closed_backend.get, store_key)
+            if stored is not None:
+                value = stored[0]
+                lab_metrics.record_cache(self.name, "closed")
+            else:
+                value, errors = self._compute(args, kwargs)
+                if errors or _is_empty(value):
+                    # Onvolledig resultaat nooit permanent maken
+                    self._store(key, value, (args, kwargs))
+                    return value
+                _backend_call(_closed_backend.put, store_key, value)
+        self._store(key, value, (args, kwargs), closed=True)
+        return value
+
+    def _load(self, key, args, kwargs, force=False):
+        """Haal op bij Odoo en sla op (altijd binnen de single-flight van key)"""
+        with _lock:
+            entry = _entries.get(key)
+            # Een andere call kan de entry net ververst hebben
+            if not force and entry is not None and self._is_fresh(entry, time.time()):
+                return entry.value
+        outcome = "refresh" if force else "miss"
+        started = time.time()
+        if not self.shared:
+            value, errors = self._compute(args, kwargs, outcome)
+            if errors and entry is not None:
+                return self._fallback(entry.value, entry.stored_at)
+            self._store(key, value, (args, kwargs), fetched_at=started)
+            return value
+
+        # Na een wijziging alleen een versie overnemen die daarna is opgehaald
+        known_at = max(entry.stored_at, entry.expired_at) if entry is not None else 0.0
+        # Bij een refresh alleen een versie overnemen die zelf nog niet aan verversen toe is
+        max_age = self.fresh_for() * (1 - PREWARM_LEAD) if force else self.fresh_for()
+        store_key = self._store_key(key)
+        with _backend_lock(_shared_backend, store_key):
+            stored = _backend_call(_shared_backend.get, store_key)
+            if stored is not None and stored[1] > known_at and time.time() - stored[1] < max_age:
+                # Een andere replica heeft deze versie net opgehaald
+                self._store(key, stored[0], (args, kwargs), stored_at=stored[1])
+                lab_metrics.record_cache(self.name, "shared")
+                return stored[0]
+            value, errors = self._compute(args, kwargs, outcome)
+            if errors:
+                # Liever de laatst bekende waarde (hoe oud ook) dan nullen in de KPI's
+                if entry is not None:
+                    return self._fallback(entry.value, entry.stored_at)
+                if stored is not None:
+                    self._store(key, stored[0], (args, kwargs), stored_at=stored[1])
+                    return self._fallback(stored[0], stored[1])
+                self._store(key, value, (args, kwargs))
+                lab_metrics.record_cache(self.name, "unavailable")
+                return value
+            self._store(key, value, (args, kwargs), fetched_at=started)
+            _backend_call(_shared_backend.put, store_key, value, ttl=WARM_MAX_AGE)
+        return value
+
+    def _fallback(self, value, stored_at):
+        lab_metrics.record_cache(self.name, "fallback", age=time.time() - stored_at)
+        return value
+
+    def _store(self, key, value, call, closed=False, stored_at=None, fetched_at=None):
+        global _memory_used
+        size = _sizeof(value)
+        with _lock:
+            previous = _entries.get(key)
+            entry = _Entry(value, call, closed)
+            entry.size = size
+            if not closed and self.cost is not None:
+                entry.cost = max(self.cost, DISK_COST)
+            if stored_at is not None:
+                entry.stored_at = stored_at
+            if previous is not None:
+                entry.last_access = previous.last_access
+                entry.hits = previous.hits
+                # Tijdens het ophalen gewijzigd: deze waarde is al achterhaald
+                if previous.expired_at > (fetched_at or entry.stored_at) and not closed:
+                    entry.expired_at = previous.expired_at
+                _memory_used -= previous.size
+            entry.priority = _priority(entry)
+            _entries[key] = entry
+            _memory_used += size
+            if _memory_used + dimensions_nbytes() > _memory_budget:
+                _evict(keep=key)
+        return entry
+
+    def clear(self):
+        """Verwijder alle entries van deze functie"""
+        with _lock:
+            for key in [k for k in _entries if k[0] == self.name]:
+                _drop(key)
+
+
+def cached(ttl=DEFAULT_TTL, max_stale=MAX_STALE, stale_while_revalidate=True,
+           closed=None, shared=True, sources=()):
+    """Decorator: vervanger voor st.cache_data(ttl=...) met stale-while-revalidate
+
+    closed: optionele functie die de (gebonden) argumenten krijgt en True geeft
+    als de periode afgesloten is; zulke resultaten worden permanent bewaard.
+    shared: entries ook via de gedeelde backend delen met andere replica's.
+    sources: Odoo modellen waaruit de functie leest; de change feed maakt
+    entries ongeldig zodra een daarvan wijzigt (zie invalidate).
+    """
+    def decorator(func):
+        wrapper = CachedFunction(func, ttl=ttl, max_stale=max_stale,
+                                 stale_while_revalidate=stale_while_revalidate,
+                                 closed=closed, shared=shared, sources=sources)
+        _functions[wrapper.name] = wrapper
+        return wrapper
+    return decorator
+
+
+_MISSING = object()
+
+
+def _backend_call(method, *args, **kwargs):
+    """Backend fouten (volle schijf, Redis weg) mogen het dashboard niet breken"""
+    try:
+        return method(*args, **kwargs)
+    except Exception:
+        return None
+
+
+@contextlib.contextmanager
+def _backend_lock(backend, key):
+    """backend.lock(), maar zonder lock doorgaan als de backend onbereikbaar is"""
+    try:
+        lock = backend.lock(key)
+        lock.__enter__()
+    except Exception:
+        yield
+        return
+    try:
+        yield
+    finally:
+        try:
+            lock.__exit__(None, None, None)
+        except Exception:
+            pass
+
+
+def configure_backend(url):
+    """Wissel van gedeelde backend (bv. "redis://cache:6379/0"); zie lab_store.open_backend"""
+    global _backend_url, _closed_backend, _shared_backend
+    if url == _backend_url:
+        return
+    _closed_backend = open_backend("closed", url)
+    _shared_backend = open_backend("shared", url)
+    _backend_url = url
+
+
+def _drop(key):
+    """Verwijder een entry uit het geheugen (lock moet vastgehouden worden)"""
+    global _memory_used
+    entry = _entries.pop(key, None)
+    if entry is not None:
+        _memory_used -= entry.size
+    return entry
+
+
+def _evict(keep=None):
+    """Ruim entries met de laagste GDSF-prioriteit tot EVICT_TO van het budget (lock vasthouden)
+
+    De dimensietabellen tellen mee en krimpen mee: een verwijderde FactTable
+    geeft zijn namen vrij zodra niets anders er nog naar verwijst.
+    """
+    global _clock, _evictions, _evicted_bytes
+    target = _memory_budget * EVICT_TO
+    # Alleen (prioriteit, key): een verwijderde waarde moet meteen vrij kunnen komen
+    for priority, key in sorted(((e.priority, k) for k, e in _entries.items()), key=lambda item: item[0]):
+        if _memory_used + dimensions_nbytes() <= target:
+            break
+        if key == keep:
+            continue
+        entry = _drop(key)
+        _clock = max(_clock, priority)
+        _evictions += 1
+        _evicted_bytes += entry.size
+        lab_metrics.record_cache(key[0], "evict")
+        del entry
+
+
+def configure_memory(budget):
+    """Stel het geheugenbudget (bytes) voor entries plus dimensietabellen in en ruim direct op als nodig"""
+    global _memory_budget
+    with _lock:
+        _memory_budget = budget
+        if _memory_used + dimensions_nbytes() > _memory_budget:
+            _evict()
+
+
+def memory_stats():
+    """Gauges: geschat geheugengebruik (entries plus dimensietabellen), budget, evicties en bytes per functie"""
+    with _lock:
+        per_function = {}
+        for key, entry in _entries.items():
+            per_function[key[0]] = per_function.get(key[0], 0) + entry.size
+        dimensions = dimensions_nbytes()
+        return {
+            "entries": len(_entries),
+            "bytes": _memory_used + dimensions,
+            "dimensions": dimensions,
+            "budget": _memory_budget,
+            "evictions": _evictions,
+            "evicted_bytes": _evicted_bytes,
+            "functions": per_function,
+        }
+
+
+def _schedule_refresh(cached_func, key, entry):
+    """Start een achtergrond-refresh voor een entry (lock moet vastgehouden worden)"""
+    if entry.refreshing or time.time() - entry.failed_at < RETRY_AFTER:
+        return False
+    entry.refreshing = True
+    _executor.submit(_refresh, cached_func, key, entry.call)
+    return True
+
+
+def _refresh(cached_func, key, call):
+    args, kwargs = call
+    _local.background = True
+    try:
+        _flight.do(key, cached_func._load, key, args, kwargs, force=True)
+    except Exception:
+        # Houd de laatste goede waarde vast; volgende poging na RETRY_AFTER
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None:
+                entry.refreshing = False
+                entry.failed_at = time.time()
+        return
+    finally:
+        _local.background = False
+
+
+def _prewarm_once():
+    """Eén prewarm ronde: ververs hot entries die bijna verlopen"""
+    now = time.time()
+    scheduled = 0
+    with _lock:
+        for key, entry in list(_entries.items()):
+            cached_func = _functions.get(key[0])
+            if cached_func is None:
+                continue
+            ttl = cached_func.fresh_for()
+            is_hot = now - entry.last_access < HOT_WINDOW * ttl
+            almost_expired = entry.expired_at or now - entry.stored_at >= ttl * (1 - PREWARM_LEAD)
+            if entry.closed:
+                # Nooit verversen; ongebruikt uit geheugen halen (staat op schijf)
+                if not is_hot:
+                    _drop(key)
+            elif is_hot and almost_expired:
+                scheduled += _schedule_refresh(cached_func, key, entry)
+            elif not is_hot and now - entry.stored_at >= cached_func.max_stale:
+                # Niet meer gebruikt en te oud om nog stale te serveren
+                _drop(key)
+    return scheduled
+
+
+def _prewarm_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            _prewarm_once()
+        except Exception:
+            pass
+
+
+def start_prewarmer(interval=PREWARM_INTERVAL):
+    """Start de prewarm scheduler (idempotent, één thread per proces)"""
+    global _prewarmer
+    with _lock:
+        if _prewarmer is None or not _prewarmer.is_alive():
+            _prewarmer = threading.Thread(target=_prewarm_loop, args=(interval,),
+                                          name="lab-cache-prewarm", daemon=True)
+            _prewarmer.start()
+    return _prewarmer
+
+
+def feed_alive(valid_for):
+    """De change feed heeft net gepolld; tot valid_for seconden geldt FEED_TTL"""
+    global _feed_valid_until
+    _feed_valid_until = time.time() + valid_for
+
+
+def watched_sources():
+    """Alle Odoo modellen waar gecachte functies uit lezen"""
+    return sorted({model for f in _functions.values() for model in f.sources})
+
+
+def invalidate(model, company_ids=None):
+    """Maak entries ongeldig die uit model lezen (change feed)
+
+    company_ids: alleen entries voor deze bedrijven (plus entries over alle
+    bedrijven); None = alle entries. Afgesloten periodes blijven staan.
+    Hot entries worden direct op de achtergrond ververst, de rest bij het
+    volgende gebruik (stale-while-revalidate). Geeft het aantal entries terug.
+    """
+    now = time.time()
+    count = 0
+    with _lock:
+        for key, entry in list(_entries.items()):
+            cached_func = _functions.get(key[0])
+            if cached_func is None or model not in cached_func.sources or entry.closed:
+                continue
+            company_id = dict(key[1]).get("company_id")
+            if company_ids is not None and company_id is not None and company_id not in company_ids:
+                continue
+            entry.expired_at = now
+            count += 1
+            if now - entry.last_access < HOT_WINDOW * cached_func.fresh_for():
+                _schedule_refresh(cached_func, key, entry)
+    return count
+
+
+def clear_all(closed=False):
+    """Leeg de volledige cache (knop 'Ververs data'), inclusief de gedeelde laag
+
+    closed=True wist ook de permanente opslag van afgesloten boekjaren
+    (bv. voor koude metingen in lab_bench.py).
+    """
+    global _memory_used
+    with _lock:
+        _entries.clear()
+        _memory_used = 0
+    _backend_call(_shared_backend.clear)
+    if closed:
+        _backend_call(_closed_backend.clear)
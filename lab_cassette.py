@@ -0,0 +1,366 @@
+"""
+LAB Dashboard record/replay van Odoo verkeer
+============================================
+Transportlaag onder odoo_call() zodat benchmarks reproduceerbaar zijn:
+
+- HttpTransport: gewoon HTTP naar Odoo (standaard)
+- RecordingTransport: stuurt door naar HTTP en schrijft elk request/response
+  paar geanonimiseerd naar een cassette (gzip JSON lines)
+- ReplayTransport: beantwoordt requests uit een cassette, zonder Odoo, met de
+  opgenomen latency of een instelbaar latency profiel
+
+Instellen via de omgeving of Streamlit Secrets:
+    LAB_ODOO_RECORD=sessies/maandag.jsonl.gz     opnemen
+    LAB_ODOO_REPLAY=sessies/maandag.jsonl.gz     afspelen
+    LAB_REPLAY_LATENCY=recorded | none | fixed:50 | scale:0.5
+    LAB_CASSETTE_SECRET=...                      sleutel (optioneel, zie onder)
+
+Anonimisering: API key, database en uid worden vervangen; persoonsgegevens
+(e-mail, telefoon, adres, btw-nummer, relatienamen) worden deterministisch
+gepseudonimiseerd zodat groeperen en filteren op dezelfde relatie blijft
+werken. Pseudoniemen en request-sleutels zijn een HMAC-SHA256 met een
+geheime sleutel: zonder die sleutel valt er niets terug te raden met een
+woordenlijst. De sleutel staat nooit in de cassette: LAB_CASSETTE_SECRET,
+of anders <cassette>.key naast de cassette (bij de eerste opname
+aangemaakt). Afspelen heeft dezelfde sleutel nodig; deel de cassette
+zonder het .key bestand als de inhoud anoniem moet blijven. Omschrijvingen en referenties van boekingen en regels (name, ref)
+evenzo. PDF-inhoud wordt vervangen door opvulling van dezelfde lengte.
+Postcode en plaats blijven staan (nodig voor de klantenkaart).
+
+In de opgenomen requests worden zoektermen en filters op zulke velden in
+het domein op dezelfde manier vervangen (bedragen door ***). De sleutel
+voor het terugvinden is een HMAC van het oorspronkelijke request, dus
+afspelen werkt ongewijzigd.
+"""
+
+import collections
+import gzip
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+import requests
+
+REDACTED = "***"
+
+# Velden met persoonsgegevens (op elk model)
+PII_FIELDS = {
+    "email", "phone", "mobile", "street", "street2", "vat", "acc_number",
+    "partner_id", "commercial_partner_id", "invoice_partner_display_name",
+}
+# Velden die alleen op deze modellen persoonsgegevens zijn
+PII_MODEL_FIELDS = {
+    "res.partner": {"name", "display_name"},
+    "account.move": {"name", "ref"},
+    "account.move.line": {"name", "ref"},
+}
+# Bedragvelden: in domeinen (filters) vervangen door REDACTED
+AMOUNT_FIELDS = {"amount_total", "amount_residual", "amount_untaxed", "balance", "debit", "credit",
+                 "price_unit", "price_subtotal"}
+# Operatoren waarvan de waarde vrije tekst is (zoektermen)
+TEXT_OPERATORS = {"like", "ilike", "=like", "=ilike", "not like", "not ilike"}
+# Binaire inhoud: vervangen door opvulling van dezelfde grootte
+BLOB_FIELDS = {"datas"}
+
+
+class CassetteMiss(Exception):
+    """Request staat niet in de cassette"""
+
+
+def cassette_secret(path, secret=None, create=False):
+    """HMAC sleutel voor een cassette: secret (LAB_CASSETTE_SECRET), anders <path>.key
+
+    create=True (opnemen): een ontbrekend .key bestand wordt aangemaakt (alleen
+    leesbaar voor de eigenaar). Zonder sleutel kan een cassette niet worden afgespeeld.
+    """
+    if secret:
+        return secret.encode("utf-8") if isinstance(secret, str) else secret
+    key_path = path + ".key"
+    if create:
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_hex(32).encode("ascii"))
+    try:
+        with open(key_path, "rb") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"geen sleutel voor {path}: zet LAB_CASSETTE_SECRET of leg {key_path} "
+                                "naast de cassette") from None
+
+
+def _digest(secret, text):
+    return hmac.new(secret, text.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+# =============================================================================
+# ANONIMISERING
+# =============================================================================
+
+def _pseudonym(secret, field, value):
+    digest = _digest(secret, f"{field}:{value}")[:8]
+    if field in ("email",):
+        return f"{digest}@example.invalid"
+    if field in ("phone", "mobile"):
+        return f"+31 6 {int(digest, 16) % 10**8:08d}"
+    if field in ("name", "ref"):
+        return f"Tekst {digest}"
+    return f"Relatie {digest}"
+
+
+def _anonymize_value(secret, field, value):
+    if value is False or value is None:
+        return value
+    if isinstance(value, list) and len(value) == 2 and isinstance(value[0], int):
+        return [value[0], _pseudonym(secret, field, value[0])]    # many2one: [id, naam]
+    if isinstance(value, str):
+        return _pseudonym(secret, field, value)
+    return value
+
+
+def anonymize_records(secret, model, records):
+    """Pseudonimiseer persoonsgegevens in een search_read/read resultaat"""
+    if not isinstance(records, list):
+        return records
+    pii = PII_FIELDS | PII_MODEL_FIELDS.get(model, set())
+    result = []
+    for record in records:
+        if not isinstance(record, dict):
+            result.append(record)
+            continue
+        record = dict(record)
+        for field in record.keys() & pii:
+            record[field] = _anonymize_value(secret, field, record[field])
+        for field in record.keys() & BLOB_FIELDS:
+            if isinstance(record[field], str):
+                record[field] = "A" * len(record[field])
+        result.append(record)
+    return result
+
+
+def _anonymize_leaf(secret, model, leaf):
+    """Eén domein-leaf [pad, operator, waarde]; persoonsgegevens en bedragen vervangen"""
+    path, operator, value = leaf
+    first, _, rest = str(path).partition(".")
+    field = rest.rpartition(".")[2] if rest else first
+    if rest:
+        # Gepunt pad (partner_id.name): de relatie of het eindveld bevat persoonsgegevens
+        pii = first in PII_FIELDS or field in PII_FIELDS | {"name", "display_name", "ref"}
+    else:
+        pii = first in PII_FIELDS | PII_MODEL_FIELDS.get(model, set())
+    if pii or str(operator) in TEXT_OPERATORS:
+        if isinstance(value, str):
+            value = _pseudonym(secret, field, value)
+        elif isinstance(value, list):
+            value = [_pseudonym(secret, field, v) if isinstance(v, str) else v for v in value]
+    elif field in AMOUNT_FIELDS and isinstance(value, (int, float)) and value:
+        value = REDACTED
+    return [path, operator, value]
+
+
+def anonymize_domain(secret, model, domain):
+    """Domein met zoektermen, relatiefilters en bedragen gepseudonimiseerd (operatoren blijven)"""
+    if not isinstance(domain, list):
+        return domain
+    return [_anonymize_leaf(secret, model, term) if isinstance(term, list) and len(term) == 3
+            and isinstance(term[0], str) else term
+            for term in domain]
+
+
+def anonymize_request(secret, payload):
+    """Vervang credentials en anonimiseer het domein in een execute_kw payload; geeft (payload, model, method)"""
+    payload = json.loads(json.dumps(payload))
+    args = payload.get("params", {}).get("args", [])
+    model = method = None
+    if len(args) >= 5:
+        args[0], args[1], args[2] = REDACTED, 0, REDACTED
+        model, method = args[3], args[4]
+        # execute_kw positionele argumenten: [domein] (search_read, read_group, ...)
+        if len(args) > 5 and isinstance(args[5], list) and args[5] and isinstance(args[5][0], list):
+            args[5][0] = anonymize_domain(secret, model, args[5][0])
+    return payload, model, method
+
+
+def request_key(secret, payload):
+    """Sleutel voor het terugvinden van een request: HMAC van alles behalve credentials en id
+
+    Met HMAC i.p.v. een gewone hash zijn geredigeerde domeinwaarden (bedragen,
+    zoektermen) niet terug te vinden door te raden en na te rekenen.
+    """
+    args = payload.get("params", {}).get("args", [])
+    return _digest(secret, json.dumps(args[3:], sort_keys=True, default=str))
+
+
+# =============================================================================
+# TRANSPORTS
+# =============================================================================
+
+class ReplayResponse:
+    """Minimale stand-in voor requests.Response (content, json(), iter_content())"""
+
+    def __init__(self, body):
+        self.content = json.dumps(body).encode("utf-8")
+        self.status_code = 200
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """Gewone JSON-RPC over HTTP; één Session voor connection pooling"""
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def post(self, url, payload, timeout, stream=False):
+        """stream=True: body nog niet gelezen (voor incrementeel decoderen via iter_content)"""
+        return self.session.post(url, json=payload, timeout=timeout, stream=stream)
+
+
+class RecordingTransport:
+    """Stuurt door naar een ander transport en neemt elk request/response paar op
+
+    Elke regel wordt als los gzip member toegevoegd; zo blijft de cassette
+    leesbaar als het proces halverwege stopt en kunnen meerdere reruns of
+    processen naar hetzelfde bestand schrijven.
+    """
+
+    def __init__(self, path, inner=None, secret=None):
+        self.path = path
+        self.secret = cassette_secret(path, secret, create=True)
+        self.inner = inner or HttpTransport()
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _write(self, entry):
+        line = (json.dumps(entry, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        with self._lock, gzip.open(self.path, "ab") as f:
+            f.write(line)
+
+    def post(self, url, payload, timeout, stream=False):
+        # Opnemen vraagt de volledige body; stream wordt genegeerd
+        request, model, method = anonymize_request(self.secret, payload)
+        entry = {
+            "key": request_key(self.secret, payload), "t": round(time.time() - self.started, 3),
+            "model": model, "method": method, "request": request,
+        }
+        started = time.perf_counter()
+        try:
+            response = self.inner.post(url, payload, timeout)
+        except requests.exceptions.Timeout:
+            entry.update(ms=round((time.perf_counter() - started) * 1000, 1), error="timeout")
+            self._write(entry)
+            raise
+        except requests.exceptions.RequestException as e:
+            entry.update(ms=round((time.perf_counter() - started) * 1000, 1), error=str(e))
+            self._write(entry)
+            raise
+        entry["ms"] = round((time.perf_counter() - started) * 1000, 1)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"error": {"message": "invalid JSON response"}}
+        if "result" in body:
+            body = dict(body, result=anonymize_records(self.secret, model, body["result"]))
+        entry["response"] = body
+        self._write(entry)
+        return response
+
+
+class ReplayTransport:
+    """Beantwoordt requests uit een cassette
+
+    Identieke requests worden in opnamevolgorde beantwoord; zijn ze op, dan
+    wordt het laatste antwoord herhaald (een branch met meer of minder calls
+    blijft zo afspeelbaar). Onbekende requests geven CassetteMiss.
+
+    latency:
+    - "recorded": de opgenomen duur per request
+    - "none": geen vertraging
+    - "fixed:<ms>": vaste vertraging per request
+    - "scale:<factor>": opgenomen duur × factor
+    """
+
+    def __init__(self, path, latency="recorded", secret=None):
+        self.path = path
+        self.secret = cassette_secret(path, secret)
+        self.latency = latency or "recorded"
+        self._lock = threading.Lock()
+        self._entries = collections.defaultdict(list)
+        self._served = collections.Counter()
+        self.misses = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries[entry["key"]].append(entry)
+
+    def _delay(self, entry):
+        mode, _, value = self.latency.partition(":")
+        if mode == "none":
+            return 0.0
+        if mode == "fixed":
+            return float(value) / 1000
+        recorded = entry.get("ms", 0.0) / 1000
+        if mode == "scale":
+            return recorded * float(value)
+        return recorded
+
+    def post(self, url, payload, timeout, stream=False):
+        key = request_key(self.secret, payload)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                entry = None
+            else:
+                entry = entries[min(self._served[key], len(entries) - 1)]
+                self._served[key] += 1
+        if entry is None:
+            args = payload.get("params", {}).get("args", [])
+            raise CassetteMiss(f"geen opname voor {args[3:5]} in {self.path}")
+        delay = self._delay(entry)
+        if delay:
+            time.sleep(min(delay, timeout))
+        if entry.get("error") == "timeout":
+            raise requests.exceptions.Timeout("opgenomen timeout")
+        if "error" in entry:
+            raise requests.exceptions.ConnectionError(entry["error"])
+        return ReplayResponse(entry["response"])
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def open_transport(record=None, replay=None, latency=None, secret=None):
+    """Transport voor odoo_call(); één instantie per configuratie (overleeft reruns)
+
+    secret: HMAC sleutel voor de cassette (LAB_CASSETTE_SECRET); zonder: <cassette>.key
+    """
+    config = (record or None, replay or None, latency or None, secret or None)
+    with _transports_lock:
+        transport = _transports.get(config)
+        if transport is None:
+            if replay:
+                transport = ReplayTransport(replay, latency, secret)
+            elif record:
+                transport = RecordingTransport(record, secret=secret)
+            else:
+                transport = HttpTransport()
+            _transports[config] = transport
+    return transport
@@ -0,0 +1,125 @@
+"""
+LAB Dashboard change feed
+=========================
+In plaats van alle datasets elke ttl opnieuw op te halen vraagt een
+achtergrondthread periodiek per bewaakt Odoo model de laatste write_date en
+het aantal records op, per bedrijf (één goedkope read_group per model).
+
+- Eerste ronde: alleen de uitgangssituatie vastleggen
+- Volgende rondes: alleen voor (model, bedrijf) combinaties waarvan de
+  laatste write_date of het aantal (verwijderde records) veranderde,
+  worden de gecachte entries ongeldig gemaakt (lab_cache.invalidate).
+  Hot entries worden direct ververst, de rest bij het volgende gebruik
+- Zolang de feed slaagt geldt voor entries met sources lab_cache.FEED_TTL
+  in plaats van hun eigen ttl; in stille periodes kost Odoo dan alleen de
+  polls. Mislukt een ronde, dan vallen de entries terug op hun eigen ttl
+
+Bewaakte modellen: de sources van de @cached functies (lab_cache.watched_sources).
+"""
+
+import logging
+import threading
+import time
+
+import lab_cache
+
+DEFAULT_INTERVAL = 60
+# Na zoveel intervallen zonder geslaagde ronde gelden de gewone ttl's weer
+VALID_INTERVALS = 2
+
+log = logging.getLogger("lab_changes")
+
+
+class ChangeFeed:
+    """Pollt wijzigingsmarkeringen en maakt alleen de geraakte cache entries ongeldig
+
+    fetch(models) geeft {model: {company_id of None: (laatste write_date, aantal)}};
+    een model dat ontbreekt telt als mislukte ronde.
+    """
+
+    def __init__(self, fetch, interval=DEFAULT_INTERVAL):
+        self.fetch = fetch
+        self.interval = interval
+        self.marks = {}
+        self.polls = 0
+        self.failures = 0
+        self.invalidated = 0
+        self.last_poll = 0.0
+        self.last_change = 0.0
+        self.last_error = None
+        self._thread = None
+
+    def poll_once(self):
+        """Eén ronde; geeft {model: gewijzigde bedrijven (None = alle)} terug"""
+        models = lab_cache.watched_sources()
+        try:
+            marks = self.fetch(models)
+        except Exception as e:
+            marks = {}
+            self.last_error = str(e) or type(e).__name__
+        changed = {}
+        for model, current in marks.items():
+            previous = self.marks.get(model)
+            self.marks[model] = current
+            if previous is None:
+                continue
+            companies = {c for c in current.keys() | previous.keys() if current.get(c) != previous.get(c)}
+            if companies:
+                changed[model] = None if None in companies else companies
+        for model, company_ids in changed.items():
+            self.invalidated += lab_cache.invalidate(model, company_ids)
+        self.polls += 1
+        self.last_poll = time.time()
+        if changed:
+            self.last_change = self.last_poll
+        if all(model in marks for model in models):
+            lab_cache.feed_alive(VALID_INTERVALS * self.interval)
+        else:
+            self.failures += 1
+            log.warning("change feed: geen markeringen voor %s", sorted(set(models) - marks.keys()))
+        return changed
+
+    def _run(self):
+        while True:
+            try:
+                self.poll_once()
+            except Exception:
+                log.exception("change feed ronde mislukt")
+            time.sleep(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="lab-changes", daemon=True)
+            self._thread.start()
+        return self
+
+    def snapshot(self):
+        return {
+            "interval": self.interval,
+            "models": len(self.marks),
+            "polls": self.polls,
+            "failures": self.failures,
+            "invalidated": self.invalidated,
+            "last_poll": self.last_poll,
+            "last_change": self.last_change,
+            "last_error": self.last_error,
+        }
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def start_change_feed(fetch, interval=DEFAULT_INTERVAL):
+    """Start de change feed (idempotent, één thread per proces)"""
+    global _feed
+    with _feed_lock:
+        if _feed is None:
+            _feed = ChangeFeed(fetch, interval)
+        _feed.start()
+    return _feed
+
+
+def current_feed():
+    """De lopende change feed, of None als die uit staat"""
+    return _feed
@@ -0,0 +1,186 @@
+"""
+LAB Dashboard financiële kubus
+==============================
+Overzicht en Kosten aggregeerden elk bij elke rerun opnieuw dezelfde
+omzet- en kostenregels. FinancialCube telt de saldi één keer op in een
+numpy array met drie assen:
+
+    rekening (code) × maand (JJJJ-MM) × bedrijf (id)
+
+Tabs lezen daarna alleen nog uit de kubus: totalen, per maand, per
+rekening en roll-ups (rekening → 2-cijferige categorie → W&V-sectie).
+Filteren (slice) geeft een nieuwe, kleinere kubus zonder de regels
+opnieuw te lezen.
+
+financial_cube() bouwt de kubus één keer per dataversie: zolang de cache
+dezelfde resultaat-objecten teruggeeft wordt de bestaande kubus gebruikt.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+# W&V-sectie op basis van het eerste cijfer van de rekeningcode
+PNL_SECTIONS = {
+    "8": "Omzet",
+    "7": "Kostprijs verkopen",
+    "4": "Bedrijfskosten",
+}
+
+MAX_CUBES = 16
+
+
+def account_code(name):
+    """Rekeningcode uit een many2one naam ("800000 Product sales" → "800000")"""
+    code, _, _ = (name or "").partition(" ")
+    return code if code[:1].isdigit() else ""
+
+
+def pnl_section(code):
+    return PNL_SECTIONS.get(str(code)[:1], "Overig")
+
+
+class FinancialCube:
+    """Saldi per rekening × maand × bedrijf
+
+    accounts: rekeningcodes, names: rekeningnamen (zelfde volgorde),
+    months: "JJJJ-MM", companies: bedrijf-ids (0 = onbekend),
+    values: float64 array met vorm (len(accounts), len(months), len(companies)),
+    counts: aantal regels per cel (zelfde vorm).
+    """
+
+    def __init__(self, accounts, names, months, companies, values, counts):
+        self.accounts = accounts
+        self.names = names
+        self.months = months
+        self.companies = companies
+        self.values = values
+        self.counts = counts
+
+    @classmethod
+    def from_facts(cls, *tables):
+        """Bouw de kubus uit move lines (date, account_id, company_id, balance)
+
+        Ook uit al gegroepeerde rijen (read_group) met een count kolom;
+        losse regels tellen als 1.
+        """
+        account_index, month_index, company_index = {}, {}, {}
+        names = {}
+        a_idx, m_idx, c_idx, balances, counts = [], [], [], [], []
+        for table in tables:
+            if not table:
+                continue
+            for account, date, company, balance, count in zip(
+                    table.column("account_id"), table.column("date", ""),
+                    table.column("company_id"), table.column("balance", 0), table.column("count", 1)):
+                if not account:
+                    continue
+                code = account_code(account[1]) or str(account[0])
+                if code not in account_index:
+                    account_index[code] = len(account_index)
+                    names[code] = account[1]
+                month = (date or "")[:7]
+                if month not in month_index:
+                    month_index[month] = len(month_index)
+                company_id = company[0] if company else 0
+                if company_id not in company_index:
+                    company_index[company_id] = len(company_index)
+                a_idx.append(account_index[code])
+                m_idx.append(month_index[month])
+                c_idx.append(company_index[company_id])
+                balances.append(balance)
+                counts.append(count)
+
+        # Assen gesorteerd, zodat slices en grafieken een vaste volgorde hebben
+        accounts = sorted(account_index)
+        months = sorted(month_index)
+        companies = sorted(company_index)
+
+        def remap(index, order):
+            position = {k: i for i, k in enumerate(order)}
+            return np.array([position[k] for k in index], dtype=np.intp)
+
+        a_map, m_map, c_map = remap(account_index, accounts), remap(month_index, months), remap(company_index, companies)
+
+        shape = (len(accounts), len(months), len(companies))
+        values = np.zeros(shape)
+        cell_counts = np.zeros(shape, dtype=np.int64)
+        if balances:
+            cells = (a_map[np.array(a_idx)], m_map[np.array(m_idx)], c_map[np.array(c_idx)])
+            np.add.at(values, cells, np.array(balances, dtype=float))
+            np.add.at(cell_counts, cells, np.array(counts, dtype=np.int64))
+        return cls(accounts, [names[c] for c in accounts], months, companies, values, cell_counts)
+
+    def __bool__(self):
+        return bool(self.accounts)
+
+    def __repr__(self):
+        a, m, c = self.values.shape
+        return f"<FinancialCube {a} rekeningen × {m} maanden × {c} bedrijven>"
+
+    def slice(self, accounts=None, months=None, companies=None):
+        """Deelkubus; elk filter is een collectie waarden of een functie (waarde → bool)
+
+        accounts filtert op rekeningcode, bv. lambda code: code.startswith("4").
+        """
+        def pick(axis, wanted):
+            if wanted is None:
+                return list(range(len(axis)))
+            test = wanted if callable(wanted) else set(wanted).__contains__
+            return [i for i, value in enumerate(axis) if test(value)]
+
+        a, m, c = pick(self.accounts, accounts), pick(self.months, months), pick(self.companies, companies)
+        return FinancialCube(
+            [self.accounts[i] for i in a], [self.names[i] for i in a],
+            [self.months[i] for i in m], [self.companies[i] for i in c],
+            self.values[np.ix_(a, m, c)], self.counts[np.ix_(a, m, c)],
+        )
+
+    def total(self):
+        return float(self.values.sum())
+
+    def by_month(self):
+        return dict(zip(self.months, self.values.sum(axis=(0, 2)).tolist()))
+
+    def by_company(self):
+        return dict(zip(self.companies, self.values.sum(axis=(0, 1)).tolist()))
+
+    def by_account(self):
+        """[(code, naam, saldo)] per rekening"""
+        return list(zip(self.accounts, self.names, self.values.sum(axis=(1, 2)).tolist()))
+
+    def count_by_account(self):
+        """{code: aantal regels} per rekening"""
+        return dict(zip(self.accounts, self.counts.sum(axis=(1, 2)).tolist()))
+
+    def rollup(self, key):
+        """Saldo per groep; key: rekeningcode → groepnaam (bv. get_category_name of pnl_section)"""
+        result = {}
+        for code, _, amount in self.by_account():
+            label = key(code)
+            result[label] = result.get(label, 0.0) + amount
+        return result
+
+
+_cubes = OrderedDict()
+_cubes_lock = threading.Lock()
+
+
+def financial_cube(*tables):
+    """Kubus voor deze resultaten; één keer gebouwd per combinatie van (cache-)objecten"""
+    key = tuple(id(t) for t in tables)
+    with _cubes_lock:
+        hit = _cubes.get(key)
+        if hit is not None:
+            refs, cube = hit
+            if all(ref() is t for ref, t in zip(refs, tables)):
+                _cubes.move_to_end(key)
+                return cube
+    cube = FinancialCube.from_facts(*tables)
+    with _cubes_lock:
+        _cubes[key] = ([weakref.ref(t) for t in tables], cube)
+        while len(_cubes) > MAX_CUBES:
+            _cubes.popitem(last=False)
+    return cube
@@ -19,29 +19,48 @@ Features:
 - ✅ Klantenkaart voor LAB Projects
 """
 
-# Fallback package installer voor Streamlit Cloud
-import subprocess
-import sys
-
-def install_packages():
-    packages = ['plotly', 'pandas', 'requests', 'folium', 'streamlit-folium']
-    for package in packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            subprocess.check_call([sys.executable, '-m', 'pip', 'install', package, '-q'])
-
-install_packages()
-
+# Dependencies komen uit requirements.txt; geen installatie tijdens het draaien
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import requests
-import json
-from datetime import datetime, timedelta
-from functools import lru_cache
+import hashlib
+import importlib
+import importlib.util
+import os
+import tempfile
+import threading
+import time
 import base64
+from datetime import datetime
+
+import lab_data
+import lab_export
+import lab_metrics
+from lab_cache import clear_all, memory_stats
+from lab_changes import current_feed
+from lab_cube import financial_cube, pnl_section
+from lab_data import (ACCOUNT_LINES_PAGE, COMPANIES, INVOICE_LIMIT, ODOO_GOVERNOR, PERIODS, bank_total,
+                      cash_positions, cashflow_forecast, get_account_lines, get_bank_balances,
+                      get_category_name, get_coords_from_postcode, get_customer_locations, get_invoice_lines,
+                      get_invoice_pdf, get_invoices, get_ledger_range, get_ledger_trend, get_rc_balances,
+                      get_receivables_payables, invoice_numbers, period_months, product_category_totals,
+                      project_margin_totals, top_product_totals, translate_account_name)
+
+class _LazyModule:
+    """Importeert de module pas bij het eerste gebruik
+
+    pandas en plotly kosten samen ~0.7s; zo staan pagina en sidebar er al
+    voordat de eerste tabel of grafiek ze nodig heeft, en laden de
+    datafuncties (bench, load test) zonder grafiekbibliotheken.
+    """
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+pd = _LazyModule("pandas")
+px = _LazyModule("plotly.express")
+go = _LazyModule("plotly.graph_objects")
 
 # =============================================================================
 # CONFIGURATIE
@@ -54,752 +73,105 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Odoo configuratie
-ODOO_URL = "https://lab.odoo.works/jsonrpc"
-ODOO_DB = "bluezebra-works-nl-vestingh-production-13415483"
-ODOO_UID = 37
-ODOO_API_KEY = st.secrets.get("ODOO_API_KEY", "")
-
-COMPANIES = {
-    1: "LAB Conceptstore",
-    2: "LAB Shops",
-    3: "LAB Projects"
-}
-
-# =============================================================================
-# NEDERLANDSE VERTALINGEN (UITGEBREID)
-# =============================================================================
-
-# Categorie vertalingen (voor kostencategorieën 40-49)
-CATEGORY_TRANSLATIONS = {
-    "40": "Personeelskosten",
-    "41": "Huisvestingskosten",
-    "42": "Vervoerskosten",
-    "43": "Kantoorkosten",
-    "44": "Marketing & Reclame",
-    "45": "Algemene Kosten",
-    "46": "Overige Bedrijfskosten",
-    "47": "Financiële Lasten",
-    "48": "Afschrijvingen",
-    "49": "Overige Kosten",
-    "70": "Kostprijs Verkopen",
-    "71": "Kostprijs Verkopen",
-    "72": "Kostprijs Verkopen",
-    "73": "Kostprijs Verkopen",
-    "74": "Kostprijs Verkopen",
-    "75": "Kostprijs Verkopen",
-    "80": "Omzet",
-    "81": "Omzet",
-    "82": "Omzet",
-    "83": "Omzet",
-    "84": "Omzet",
-    "85": "Omzet"
-}
-
-# Uitgebreide rekening vertalingen
-ACCOUNT_TRANSLATIONS = {
-    # Personeelskosten (40)
-    "Gross wages": "Brutolonen",
-    "Bonuses and commissions": "Bonussen en provisies",
-    "Holiday allowance": "Vakantietoeslag",
-    "Royalty": "Tantièmes",
-    "Employee car contribution": "Eigen bijdrage auto",
-    "Healthcare Insurance Act (SVW) contribution": "ZVW-bijdrage",
-    "Employer's share of payroll taxes": "Werkgeverslasten loonheffing",
-    "Employer's share of pensions": "Pensioenpremie werkgever",
-    "Employer's share of social security contributions": "Sociale lasten werkgever",
-    "Provision for holidays": "Reservering vakantiedagen",
-    "Compensation for commuting": "Reiskostenvergoeding",
-    "Reimbursement of study costs": "Studiekostenvergoeding",
-    "Reimbursement of other travel expenses": "Overige reiskostenvergoeding",
-    "Reimbursement of other expenses": "Overige onkostenvergoeding",
-    "Management fees": "Managementvergoeding",
-    "Staff on loan": "Ingehuurd personeel",
-    "Working expenses scheme (WKR max 1.2% gross pay)": "Werkkostenregeling (WKR)",
-    "Travel costs of hired staff": "Reiskosten ingehuurd personeel",
-    "Recharge of direct labour costs": "Doorbelaste personeelskosten",
-    "Sick leave insurance": "Verzuimverzekering",
-    "Canteen costs": "Kantinekosten",
-    "Corporate clothing": "Bedrijfskleding",
-    "Other travel expenses": "Overige reiskosten",
-    "Conferences, seminars and symposia": "Congressen en seminars",
-    "Staff recruitment costs": "Wervingskosten personeel",
-    "Study and training costs": "Opleidingskosten",
-    "Other personnel costs": "Overige personeelskosten",
-    "Temporary staff": "Uitzendkrachten",
-    
-    # Huisvestingskosten (41)
-    "Property rental": "Huur bedrijfspand",
-    "Major property maintenance": "Groot onderhoud pand",
-    "Small property maintenance": "Klein onderhoud pand",
-    "Cleaning and window cleaning": "Schoonmaak en glazenwassen",
-    "Gas": "Gas",
-    "Electricity": "Elektriciteit",
-    "Water": "Water",
-    "Property insurance": "Opstalverzekering",
-    "Property taxes": "Onroerendezaakbelasting",
-    "Other property costs": "Overige huisvestingskosten",
-    
-    # Vervoerskosten (42)
-    "Car leasing": "Autoleasing",
-    "Fuel costs": "Brandstofkosten",
-    "Repair and maintenance": "Reparatie en onderhoud",
-    "Motor vehicle insurance": "Motorrijtuigenverzekering",
-    "Motor vehicle tax": "Motorrijtuigenbelasting",
-    "Transport costs": "Transportkosten",
-    "Other vehicle costs": "Overige autokosten",
-    "Parking costs": "Parkeerkosten",
-    
-    # Kantoorkosten (43)
-    "Office supplies": "Kantoorbenodigdheden",
-    "Printing and copying": "Drukwerk en kopieerkosten",
-    "Telephone and fax": "Telefoon en fax",
-    "Internet costs": "Internetkosten",
-    "Postage costs": "Portokosten",
-    "Software": "Software",
-    "Computer costs": "Computerkosten",
-    "Other office costs": "Overige kantoorkosten",
-    
-    # Marketing & Reclame (44)
-    "Advertising costs": "Advertentiekosten",
-    "Promotional material": "Promotiemateriaal",
-    "Trade fairs and exhibitions": "Beurzen en exposities",
-    "Website costs": "Websitekosten",
-    "Public relations": "Public relations",
-    "Sponsoring": "Sponsoring",
-    "Other marketing costs": "Overige marketingkosten",
-    
-    # Algemene Kosten (45)
-    "External advice": "Extern advies",
-    "Accountant costs": "Accountantskosten",
-    "Legal costs": "Juridische kosten",
-    "Audit fees": "Controlekosten",
-    "Consultancy fees": "Advieskosten",
-    "Administration costs": "Administratiekosten",
-    "Collection costs": "Incassokosten",
-    "Other external costs": "Overige externe kosten",
-    
-    # Overige Bedrijfskosten (46)
-    "Bank charges": "Bankkosten",
-    "Payment service charges": "Betalingsverkeerskosten",
-    "Insurance": "Verzekeringen",
-    "Subscriptions and memberships": "Abonnementen en lidmaatschappen",
-    "Gifts and donations": "Giften en donaties",
-    "Entertainment expenses": "Representatiekosten",
-    "Other operating costs": "Overige bedrijfskosten",
-    
-    # Financiële Lasten (47)
-    "Interest expenses": "Rentelasten",
-    "Bank interest": "Bankrente",
-    "Interest on loans": "Rente op leningen",
-    "Interest and similar charges": "Rente en soortgelijke kosten",
-    "Exchange differences": "Koersverschillen",
-    "Other financial costs": "Overige financiële kosten",
-    
-    # Afschrijvingen (48)
-    "Depreciation of buildings": "Afschrijving gebouwen",
-    "Depreciation of machines": "Afschrijving machines",
-    "Depreciation of passenger cars": "Afschrijving personenauto's",
-    "Depreciation of other transport equipment": "Afschrijving overig vervoer",
-    "Depreciation of trucks": "Afschrijving vrachtwagens",
-    "Depreciation of furniture and fixtures": "Afschrijving inventaris",
-    "Depreciation of computer equipment": "Afschrijving computers",
-    "Depreciation of intangible assets": "Afschrijving immateriële activa",
-    "Other depreciation": "Overige afschrijvingen",
-    "Depreciation of tools": "Afschrijving gereedschap",
-    
-    # Omzet (80)
-    "Product sales": "Productverkopen",
-    "Service revenue": "Omzet diensten",
-    "Other revenue": "Overige omzet",
-    "Revenue from goods": "Omzet goederen",
-    "Domestic sales": "Binnenlandse verkopen",
-    "Export sales": "Exportverkopen",
-    "Intercompany sales": "Intercompany verkopen",
-    
-    # Kostprijs verkopen (70)
-    "Cost of goods sold": "Kostprijs verkopen",
-    "Cost of materials": "Materiaalkosten",
-    "Direct labour costs": "Directe loonkosten",
-    "Production costs": "Productiekosten",
-    "Purchase costs": "Inkoopkosten",
-    "Subcontracting": "Uitbesteed werk",
-    
-    # Balansposten
-    "Accounts receivable": "Debiteuren",
-    "Accounts payable": "Crediteuren",
-    "Bank": "Bank",
-    "Cash": "Kas",
-    "Prepaid expenses": "Vooruitbetaalde kosten",
-    "Accrued expenses": "Nog te betalen kosten",
-    "VAT receivable": "Te vorderen BTW",
-    "VAT payable": "Af te dragen BTW",
-    "Inventory": "Voorraad",
-    "Fixed assets": "Vaste activa",
-    
-    # Intercompany
-    "Intercompany receivables": "Vordering groepsmaatschappijen",
-    "Intercompany payables": "Schuld groepsmaatschappijen",
-    "Current account": "Rekening-courant"
-}
+# Odoo fouten als melding in de app (headless gaan ze naar de log)
+lab_data.set_error_handler(st.error)
 
-def translate_account_name(name):
-    """Vertaal Engelse rekeningnaam naar Nederlands indien beschikbaar"""
-    if not name:
-        return name
-    # Eerst exacte match proberen
-    if name in ACCOUNT_TRANSLATIONS:
-        return ACCOUNT_TRANSLATIONS[name]
-    # Dan gedeeltelijke match
-    for eng, nl in ACCOUNT_TRANSLATIONS.items():
-        if eng.lower() in name.lower():
-            return name.replace(eng, nl)
-    return name
+# Eerste jaar van de meerjarenvergelijking (Overzicht)
+TREND_FROM_YEAR = 2023
 
-def get_category_name(account_code):
-    """Haal Nederlandse categorienaam op basis van rekeningcode"""
-    if not account_code or len(str(account_code)) < 2:
-        return "Overig"
-    prefix = str(account_code)[:2]
-    return CATEGORY_TRANSLATIONS.get(prefix, f"Categorie {prefix}")
+# Grootboekexports worden op schijf opgebouwd, niet in het geheugen
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "lab_exports")
 
 # =============================================================================
-# ODOO API HELPERS
+# PERFORMANCE DEBUG PANEEL
 # =============================================================================
 
-def odoo_call(model, method, domain, fields, limit=None, timeout=120):
-    """Generieke Odoo JSON-RPC call met verbeterde timeout handling"""
-    if not ODOO_API_KEY:
-        st.error("⚠️ ODOO_API_KEY niet geconfigureerd in Streamlit Secrets")
-        return []
-    
-    args = [ODOO_DB, ODOO_UID, ODOO_API_KEY, model, method, [domain]]
-    kwargs = {"fields": fields}
-    if limit:
-        kwargs["limit"] = limit
-    args.append(kwargs)
-    
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "call",
-        "params": {
-            "service": "object",
-            "method": "execute_kw",
-            "args": args
-        },
-        "id": 1
-    }
-    
-    try:
-        response = requests.post(ODOO_URL, json=payload, timeout=timeout)
-        result = response.json()
-        if "error" in result:
-            st.error(f"Odoo error: {result['error']}")
-            return []
-        return result.get("result", [])
-    except requests.exceptions.Timeout:
-        st.error("⏱️ Timeout - probeer een kortere periode of specifieke entiteit")
-        return []
-    except Exception as e:
-        st.error(f"Connection error: {e}")
-        return []
-
-# =============================================================================
-# DATA FUNCTIES
-# =============================================================================
-
-@st.cache_data(ttl=300)
-def get_bank_balances():
-    """Haal alle banksaldi op per rekening (excl. R/C intercompany)"""
-    journals = odoo_call(
-        "account.journal", "search_read",
-        [["type", "=", "bank"]],
-        ["name", "company_id", "default_account_id", "current_statement_balance", "code"]
-    )
-    
-    # Haal account codes op voor de journals om R/C te kunnen filteren
-    account_ids = [j.get("default_account_id", [None])[0] for j in journals if j.get("default_account_id")]
-    accounts = {}
-    if account_ids:
-        account_data = odoo_call(
-            "account.account", "search_read",
-            [["id", "in", account_ids]],
-            ["id", "code", "name"]
-        )
-        accounts = {a["id"]: a for a in account_data}
-    
-    # Filter: echte bankrekeningen vs R/C intercompany
-    bank_only = []
-    for j in journals:
-        name = j.get("name", "")
-        account_id = j.get("default_account_id", [None])[0]
-        account_code = accounts.get(account_id, {}).get("code", "") if account_id else ""
-        
-        # R/C detectie: naam bevat R/C OF rekeningcode begint met 12 of 14
-        is_rc = (
-            "R/C" in name or 
-            "RC " in name or
-            str(account_code).startswith("12") or  # Vorderingen op groepsmaatschappijen
-            str(account_code).startswith("14")     # Schulden aan groepsmaatschappijen
-        )
-        
-        if not is_rc:
-            bank_only.append(j)
-    
-    return bank_only
-
-@st.cache_data(ttl=300)
-def get_rc_balances():
-    """Haal R/C (Rekening Courant) intercompany saldi op"""
-    journals = odoo_call(
-        "account.journal", "search_read",
-        [["type", "=", "bank"]],
-        ["name", "company_id", "default_account_id", "current_statement_balance", "code"]
-    )
-    
-    # Haal account codes op voor de journals
-    account_ids = [j.get("default_account_id", [None])[0] for j in journals if j.get("default_account_id")]
-    accounts = {}
-    if account_ids:
-        account_data = odoo_call(
-            "account.account", "search_read",
-            [["id", "in", account_ids]],
-            ["id", "code", "name"]
-        )
-        accounts = {a["id"]: a for a in account_data}
-    
-    # Filter: alleen R/C rekeningen
-    rc_only = []
-    for j in journals:
-        name = j.get("name", "")
-        account_id = j.get("default_account_id", [None])[0]
-        account_code = accounts.get(account_id, {}).get("code", "") if account_id else ""
+def format_age(seconds):
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 48 * 3600:
+        return f"{seconds / 3600:.1f} uur"
+    return f"{seconds / 86400:.0f} dagen"
+
+def render_staleness_banner(banner, run_mark):
+    """Waarschuwing bovenaan als deze run oude cachewaarden kreeg omdat Odoo faalde"""
+    lookups = [e for e in lab_metrics.recent(since=run_mark, thread=threading.get_ident())
+               if e["type"] == "cache" and e["outcome"] in ("fallback", "unavailable")]
+    if not lookups:
+        return
+    ages = [e["age"] for e in lookups if e["outcome"] == "fallback" and e["age"] is not None]
+    message = "⚠️ Odoo is traag of niet bereikbaar."
+    if ages:
+        message += f" Sommige cijfers zijn de laatst bekende waarden (tot {format_age(max(ages))} oud)."
+    if any(e["outcome"] == "unavailable" for e in lookups):
+        message += " Niet alle gegevens konden worden geladen."
+    if ODOO_GOVERNOR.breaker.state != "closed":
+        message += " Nieuwe pogingen volgen automatisch."
+    banner.warning(message)
+
+def render_debug_panel(run_mark):
+    """Sidebar paneel met Odoo calls en cache hits (opt-in via de sidebar)"""
+    with st.sidebar.expander("🐞 Performance debug", expanded=True):
+        this_run = lab_metrics.recent(since=run_mark, thread=threading.get_ident())
+        rpcs = [e for e in this_run if e["type"] == "rpc"]
+        lookups = [e for e in this_run if e["type"] == "cache"]
+        renders = [e for e in this_run if e["type"] == "render"]
+        misses = sum(1 for e in lookups if e["outcome"] == "miss")
+        governor = ODOO_GOVERNOR.snapshot()
+        st.caption(f"Odoo governor: max {governor['limit']} gelijktijdig, {governor['in_flight']} bezig, "
+                   f"circuit {governor['circuit']}")
+        feed = current_feed()
+        if feed is not None:
+            changes = feed.snapshot()
+            last_change = (f"laatste wijziging {format_age(time.time() - changes['last_change'])} geleden"
+                           if changes["last_change"] else "nog geen wijzigingen")
+            st.caption(f"Change feed: elke {changes['interval']}s, {changes['models']} modellen, "
+                       f"{changes['invalidated']} entries ongeldig gemaakt, {last_change}"
+                       + (f", {changes['failures']} mislukte rondes" if changes["failures"] else ""))
+        st.caption(f"Deze run: {len(rpcs)} Odoo calls, {sum(e['ms'] for e in rpcs):,.0f} ms, "
+                   f"{sum(e['bytes'] for e in rpcs) / 1024:,.0f} KB, "
+                   f"{len(lookups) - misses}/{len(lookups)} cache hits")
+        if renders:
+            st.caption("Render per tab: " + ", ".join(f"{e['section']} {e['ms']:,.0f} ms" for e in renders))
+        if rpcs:
+            st.dataframe(
+                pd.DataFrame(rpcs)[["model", "method", "ms", "bytes", "rows", "limit", "truncated", "error"]],
+                use_container_width=True, hide_index=True
+            )
         
-        # R/C detectie
-        is_rc = (
-            "R/C" in name or 
-            "RC " in name or
-            str(account_code).startswith("12") or
-            str(account_code).startswith("14")
-        )
+        st.markdown("**Odoo calls (sinds start proces)**")
+        rpc_summary = lab_metrics.rpc_summary()
+        if rpc_summary:
+            st.dataframe(
+                pd.DataFrame(rpc_summary)[["call", "calls", "avg_ms", "max_ms", "bytes", "rows", "truncated", "errors"]],
+                use_container_width=True, hide_index=True
+            )
         
-        if is_rc:
-            # Voeg account code toe aan journal voor weergave
-            j["account_code"] = account_code
-            j["account_type"] = "Vordering" if str(account_code).startswith("12") else "Schuld"
-            rc_only.append(j)
-    
-    return rc_only
-
-@st.cache_data(ttl=300)
-def get_revenue_data(year, company_id=None):
-    """Haal omzetdata op van 8* rekeningen"""
-    domain = [
-        ["account_id.code", ">=", "800000"],
-        ["account_id.code", "<", "900000"],
-        ["date", ">=", f"{year}-01-01"],
-        ["date", "<=", f"{year}-12-31"],
-        ["parent_state", "=", "posted"]
-    ]
-    if company_id:
-        domain.append(["company_id", "=", company_id])
-    
-    return odoo_call(
-        "account.move.line", "search_read",
-        domain,
-        ["date", "account_id", "company_id", "balance", "name"],
-        limit=10000
-    )
-
-@st.cache_data(ttl=300)
-def get_cost_data(year, company_id=None):
-    """Haal kostendata op van 4* en 7* rekeningen"""
-    domain = [
-        "|",
-        "&", ["account_id.code", ">=", "400000"], ["account_id.code", "<", "500000"],
-        "&", ["account_id.code", ">=", "700000"], ["account_id.code", "<", "800000"],
-        ["date", ">=", f"{year}-01-01"],
-        ["date", "<=", f"{year}-12-31"],
-        ["parent_state", "=", "posted"]
-    ]
-    if company_id:
-        domain.append(["company_id", "=", company_id])
-    
-    return odoo_call(
-        "account.move.line", "search_read",
-        domain,
-        ["date", "account_id", "company_id", "balance", "name"],
-        limit=15000
-    )
-
-@st.cache_data(ttl=300)
-def get_receivables_payables(company_id=None):
-    """Haal debiteuren en crediteuren saldi op"""
-    # Debiteuren
-    rec_domain = [
-        ["account_id.account_type", "=", "asset_receivable"],
-        ["parent_state", "=", "posted"],
-        ["amount_residual", "!=", 0]
-    ]
-    if company_id:
-        rec_domain.append(["company_id", "=", company_id])
-    
-    receivables = odoo_call(
-        "account.move.line", "search_read",
-        rec_domain,
-        ["company_id", "amount_residual", "partner_id"],
-        limit=5000
-    )
-    
-    # Crediteuren
-    pay_domain = [
-        ["account_id.account_type", "=", "liability_payable"],
-        ["parent_state", "=", "posted"],
-        ["amount_residual", "!=", 0]
-    ]
-    if company_id:
-        pay_domain.append(["company_id", "=", company_id])
-    
-    payables = odoo_call(
-        "account.move.line", "search_read",
-        pay_domain,
-        ["company_id", "amount_residual", "partner_id"],
-        limit=5000
-    )
-    
-    return receivables, payables
-
-@st.cache_data(ttl=300)
-def get_invoices(year, company_id=None, invoice_type=None, state=None, search_term=None):
-    """Haal facturen op met filters"""
-    domain = [
-        ["invoice_date", ">=", f"{year}-01-01"],
-        ["invoice_date", "<=", f"{year}-12-31"]
-    ]
-    
-    if company_id:
-        domain.append(["company_id", "=", company_id])
-    
-    if invoice_type == "verkoop":
-        domain.append(["move_type", "in", ["out_invoice", "out_refund"]])
-    elif invoice_type == "inkoop":
-        domain.append(["move_type", "in", ["in_invoice", "in_refund"]])
-    else:
-        domain.append(["move_type", "in", ["out_invoice", "out_refund", "in_invoice", "in_refund"]])
-    
-    if state:
-        domain.append(["state", "=", state])
-    
-    if search_term:
-        domain = ["&"] + domain + ["|", "|",
-            ["name", "ilike", search_term],
-            ["partner_id.name", "ilike", search_term],
-            ["ref", "ilike", search_term]
-        ]
-    
-    return odoo_call(
-        "account.move", "search_read",
-        domain,
-        ["name", "partner_id", "invoice_date", "amount_total", "amount_residual", 
-         "state", "move_type", "company_id", "ref"],
-        limit=500
-    )
-
-@st.cache_data(ttl=300)
-def get_product_sales(year, company_id=None):
-    """Haal verkopen per productcategorie op"""
-    domain = [
-        ["move_id.move_type", "=", "out_invoice"],
-        ["move_id.state", "=", "posted"],
-        ["move_id.invoice_date", ">=", f"{year}-01-01"],
-        ["move_id.invoice_date", "<=", f"{year}-12-31"],
-        ["product_id", "!=", False]
-    ]
-    if company_id:
-        domain.append(["company_id", "=", company_id])
-    
-    return odoo_call(
-        "account.move.line", "search_read",
-        domain,
-        ["product_id", "price_subtotal", "quantity", "company_id"],
-        limit=10000
-    )
-
-@st.cache_data(ttl=300)
-def get_product_categories():
-    """Haal alle producten op met hun categorie"""
-    products = odoo_call(
-        "product.product", "search_read",
-        [],
-        ["id", "name", "categ_id"],
-        limit=5000
-    )
-    return {p["id"]: p.get("categ_id", [None, "Onbekend"]) for p in products}
-
-@st.cache_data(ttl=300)
-def get_pos_product_sales(year, company_id=None):
-    """Haal POS verkopen op met productinfo (voor LAB Conceptstore)"""
-    # Haal POS orders op voor het jaar
-    domain = [
-        ["state", "in", ["paid", "done", "invoiced"]],
-        ["date_order", ">=", f"{year}-01-01"],
-        ["date_order", "<=", f"{year}-12-31 23:59:59"]
-    ]
-    if company_id:
-        domain.append(["company_id", "=", company_id])
-    
-    orders = odoo_call(
-        "pos.order", "search_read",
-        domain,
-        ["id", "name", "date_order", "amount_total"],
-        limit=50000
-    )
-    
-    if not orders:
-        return []
-    
-    order_ids = [o["id"] for o in orders]
-    
-    # Haal orderregels op met product en categorie
-    lines = odoo_call(
-        "pos.order.line", "search_read",
-        [["order_id", "in", order_ids]],
-        ["product_id", "price_subtotal_incl", "price_subtotal", "qty", "order_id"],
-        limit=100000
-    )
-    
-    return lines
-
-@st.cache_data(ttl=300)
-def get_top_products(year, company_id=None, limit=20):
-    """Haal top producten op met omzet"""
-    domain = [
-        ["move_id.move_type", "=", "out_invoice"],
-        ["move_id.state", "=", "posted"],
-        ["move_id.invoice_date", ">=", f"{year}-01-01"],
-        ["move_id.invoice_date", "<=", f"{year}-12-31"],
-        ["product_id", "!=", False]
-    ]
-    if company_id:
-        domain.append(["company_id", "=", company_id])
-    
-    lines = odoo_call(
-        "account.move.line", "search_read",
-        domain,
-        ["product_id", "price_subtotal", "quantity"],
-        limit=15000
-    )
-    
-    # Groepeer per product
-    products = {}
-    for line in lines:
-        prod = line.get("product_id")
-        if prod:
-            prod_id = prod[0]
-            prod_name = prod[1]
-            if prod_id not in products:
-                products[prod_id] = {"name": prod_name, "omzet": 0, "aantal": 0}
-            products[prod_id]["omzet"] += line.get("price_subtotal", 0)
-            products[prod_id]["aantal"] += line.get("quantity", 0)
-    
-    # Sorteer en return top N
-    sorted_products = sorted(products.values(), key=lambda x: -x["omzet"])
-    return sorted_products[:limit]
-
-@st.cache_data(ttl=300)
-def get_customer_locations(company_id=3):
-    """Haal klantlocaties op voor LAB Projects (of andere entiteit)"""
-    # Haal alle klanten met adressen op die facturen hebben gehad
-    invoices = odoo_call(
-        "account.move", "search_read",
-        [
-            ["company_id", "=", company_id],
-            ["move_type", "=", "out_invoice"],
-            ["state", "=", "posted"]
-        ],
-        ["partner_id", "amount_total"],
-        limit=5000
-    )
-    
-    # Verzamel unieke klant IDs met omzet
-    customer_revenue = {}
-    for inv in invoices:
-        partner = inv.get("partner_id")
-        if partner:
-            pid = partner[0]
-            if pid not in customer_revenue:
-                customer_revenue[pid] = {"name": partner[1], "omzet": 0, "facturen": 0}
-            customer_revenue[pid]["omzet"] += inv.get("amount_total", 0)
-            customer_revenue[pid]["facturen"] += 1
-    
-    if not customer_revenue:
-        return []
-    
-    # Haal adresgegevens op
-    partner_ids = list(customer_revenue.keys())
-    partners = odoo_call(
-        "res.partner", "search_read",
-        [["id", "in", partner_ids]],
-        ["id", "name", "street", "zip", "city", "country_id"]
-    )
-    
-    # Combineer data
-    result = []
-    for p in partners:
-        pid = p["id"]
-        if pid in customer_revenue:
-            result.append({
-                "id": pid,
-                "name": customer_revenue[pid]["name"],
-                "street": p.get("street", ""),
-                "zip": p.get("zip", ""),
-                "city": p.get("city", ""),
-                "country": p.get("country_id", ["", ""])[1] if p.get("country_id") else "",
-                "omzet": customer_revenue[pid]["omzet"],
-                "facturen": customer_revenue[pid]["facturen"]
-            })
-    
-    return result
-
-def get_invoice_lines(invoice_id):
-    """Haal factuurregels op voor een specifieke factuur"""
-    return odoo_call(
-        "account.move.line", "search_read",
-        [
-            ["move_id", "=", invoice_id],
-            ["display_type", "in", ["product", False]],
-            ["exclude_from_invoice_tab", "=", False]
-        ],
-        ["product_id", "name", "quantity", "price_unit", "price_subtotal", "tax_ids"]
-    )
-
-def get_invoice_pdf(invoice_id):
-    """Haal PDF bijlage op voor een factuur (indien beschikbaar)"""
-    attachments = odoo_call(
-        "ir.attachment", "search_read",
-        [
-            ["res_model", "=", "account.move"],
-            ["res_id", "=", invoice_id],
-            ["mimetype", "=", "application/pdf"]
-        ],
-        ["name", "datas"]
-    )
-    return attachments[0] if attachments else None
-
-# =============================================================================
-# GEOCODING HELPER (voor klantenkaart)
-# =============================================================================
-
-# Nederlandse postcodes naar lat/lon (vereenvoudigd - eerste 2 cijfers)
-POSTCODE_COORDS = {
-    "10": (52.3676, 4.9041),   # Amsterdam
-    "11": (52.3676, 4.9041),   # Amsterdam
-    "12": (52.0907, 5.1214),   # Utrecht
-    "13": (52.1561, 4.4858),   # Leiden
-    "14": (52.0116, 4.3571),   # Den Haag
-    "15": (52.0116, 4.3571),   # Den Haag
-    "16": (52.0116, 4.3571),   # Den Haag
-    "17": (51.9225, 4.4792),   # Rotterdam
-    "18": (51.9225, 4.4792),   # Rotterdam
-    "19": (51.9225, 4.4792),   # Rotterdam
-    "20": (51.9225, 4.4792),   # Rotterdam
-    "21": (51.9225, 4.4792),   # Rotterdam
-    "22": (51.9225, 4.4792),   # Rotterdam
-    "23": (51.9225, 4.4792),   # Rotterdam
-    "24": (51.9225, 4.4792),   # Rotterdam
-    "25": (51.9851, 5.8987),   # Nijmegen
-    "26": (51.9851, 5.8987),   # Nijmegen
-    "27": (52.2215, 6.8937),   # Enschede
-    "28": (52.5168, 6.0830),   # Zwolle
-    "29": (52.5168, 6.0830),   # Zwolle
-    "30": (52.0907, 5.1214),   # Utrecht
-    "31": (52.0907, 5.1214),   # Utrecht
-    "32": (52.2215, 6.0833),   # Amersfoort
-    "33": (52.2215, 6.0833),   # Amersfoort
-    "34": (52.0907, 5.1214),   # Utrecht
-    "35": (52.1561, 4.4858),   # Hilversum
-    "36": (52.0907, 5.1214),   # Utrecht
-    "37": (52.2215, 6.0833),   # Amersfoort
-    "38": (52.5200, 5.4700),   # Lelystad
-    "39": (52.2215, 6.0833),   # Amersfoort
-    "40": (51.4416, 5.4697),   # Eindhoven
-    "41": (51.4416, 5.4697),   # Eindhoven
-    "42": (51.4416, 5.4697),   # Eindhoven
-    "43": (51.5555, 5.0913),   # Tilburg
-    "44": (51.5890, 4.7756),   # Breda
-    "45": (51.5890, 4.7756),   # Breda
-    "46": (51.5890, 4.7756),   # Breda
-    "47": (51.5890, 4.7756),   # Breda
-    "48": (51.4416, 5.4697),   # Eindhoven
-    "49": (51.5555, 5.0913),   # Tilburg
-    "50": (51.4416, 5.4697),   # Eindhoven
-    "51": (51.4416, 5.4697),   # Eindhoven
-    "52": (51.4416, 5.4697),   # Eindhoven
-    "53": (51.4416, 5.4697),   # Eindhoven
-    "54": (51.4416, 5.4697),   # Eindhoven
-    "55": (51.4416, 5.4697),   # Eindhoven
-    "56": (51.4416, 5.4697),   # Eindhoven
-    "57": (51.4416, 5.4697),   # Eindhoven
-    "58": (51.4416, 5.4697),   # Eindhoven
-    "59": (51.5555, 5.0913),   # Tilburg
-    "60": (50.8514, 5.6910),   # Maastricht
-    "61": (50.8514, 5.6910),   # Maastricht
-    "62": (50.8514, 5.6910),   # Maastricht
-    "63": (50.8514, 5.6910),   # Maastricht
-    "64": (50.8514, 5.6910),   # Maastricht
-    "65": (51.4427, 6.0608),   # Roermond
-    "66": (51.4427, 6.0608),   # Roermond
-    "67": (51.9851, 5.8987),   # Nijmegen
-    "68": (51.9851, 5.8987),   # Nijmegen
-    "69": (51.9225, 6.0833),   # Arnhem
-    "70": (51.9225, 6.0833),   # Arnhem
-    "71": (51.9851, 5.8987),   # Nijmegen
-    "72": (52.0116, 6.0833),   # Apeldoorn
-    "73": (52.0116, 6.0833),   # Apeldoorn
-    "74": (52.0116, 6.0833),   # Apeldoorn
-    "75": (52.2215, 6.8937),   # Enschede
-    "76": (52.2215, 6.8937),   # Enschede
-    "77": (52.2215, 6.8937),   # Enschede
-    "78": (52.5168, 6.0830),   # Zwolle
-    "79": (52.5168, 6.0830),   # Zwolle
-    "80": (52.5168, 6.0830),   # Zwolle
-    "81": (52.5168, 6.0830),   # Zwolle
-    "82": (52.7792, 6.9004),   # Emmen
-    "83": (52.7792, 6.9004),   # Emmen
-    "84": (53.2194, 6.5665),   # Groningen
-    "85": (53.2194, 6.5665),   # Groningen
-    "86": (53.2194, 6.5665),   # Groningen
-    "87": (53.2194, 6.5665),   # Groningen
-    "88": (53.0000, 5.7500),   # Leeuwarden
-    "89": (53.0000, 5.7500),   # Leeuwarden
-    "90": (53.0000, 5.7500),   # Leeuwarden
-    "91": (53.0000, 5.7500),   # Leeuwarden
-    "92": (53.0000, 5.7500),   # Leeuwarden
-    "93": (53.2194, 6.5665),   # Groningen
-    "94": (53.2194, 6.5665),   # Groningen
-    "95": (53.2194, 6.5665),   # Groningen
-    "96": (53.2194, 6.5665),   # Groningen
-    "97": (53.2194, 6.5665),   # Groningen
-    "98": (53.2194, 6.5665),   # Groningen
-    "99": (53.2194, 6.5665),   # Groningen
-}
-
-def get_coords_from_postcode(postcode):
-    """Haal lat/lon op basis van postcode (eerste 2 cijfers)"""
-    if not postcode:
-        return None, None
-    prefix = str(postcode).strip()[:2]
-    if prefix in POSTCODE_COORDS:
-        return POSTCODE_COORDS[prefix]
-    return None, None
+        st.markdown("**Cache per functie**")
+        memory = memory_stats()
+        st.caption(f"Geheugen: {memory['bytes'] / 2**20:,.1f} van {memory['budget'] / 2**20:,.0f} MB "
+                   f"(waarvan dimensies {memory['dimensions'] / 2**20:,.1f} MB), "
+                   f"{memory['entries']} entries, {memory['evictions']} verwijderd "
+                   f"({memory['evicted_bytes'] / 2**20:,.1f} MB)")
+        cache_summary = lab_metrics.cache_summary()
+        if cache_summary:
+            df_cache = pd.DataFrame(cache_summary).fillna(0)
+            df_cache["mb"] = (df_cache["function"].map(memory["functions"]).fillna(0) / 2**20).round(2)
+            df_cache["function"] = df_cache["function"].str.rsplit(".", n=1).str[-1]
+            st.dataframe(df_cache, use_container_width=True, hide_index=True)
+        
+        if st.button("Reset metingen", key="perf_reset"):
+            lab_metrics.reset()
 
 # =============================================================================
 # MAIN APP
 # =============================================================================
 
 def main():
+    run_mark = lab_metrics.mark()
     st.title("📊 LAB Groep Financial Dashboard")
     st.caption("Real-time data uit Odoo | v8 - Met klantenkaart & verbeterde R/C filtering")
+    staleness_banner = st.empty()
     
     # Sidebar
     st.sidebar.header("🔧 Filters")
@@ -807,11 +179,18 @@ def main():
     # Dynamische jaarlijst
     current_year = datetime.now().year
     years = list(range(current_year, 2022, -1))
-    selected_year = st.sidebar.selectbox("📅 Jaar", years, index=0)
+    selected_year = st.sidebar.selectbox("📅 Jaar", years, index=0, key="year")
+    
+    # Periode voor Overzicht, Kosten en Verf vs Behang; uit gecachte maandpartities samengesteld
+    selected_period = st.sidebar.selectbox("🗓️ Periode", list(PERIODS), format_func=PERIODS.get,
+                                           key="period")
+    period_start, period_end = period_months(selected_period, selected_year)
+    if selected_period != "year":
+        st.sidebar.caption(f"Overzicht, Kosten en Verf vs Behang: {period_start} t/m {period_end}")
     
     # Entiteit selectie
     entity_options = ["Alle bedrijven"] + list(COMPANIES.values())
-    selected_entity = st.sidebar.selectbox("🏢 Entiteit", entity_options)
+    selected_entity = st.sidebar.selectbox("🏢 Entiteit", entity_options, key="entity")
     
     company_id = None
     if selected_entity != "Alle bedrijven":
@@ -820,8 +199,9 @@ def main():
     st.sidebar.markdown("---")
     st.sidebar.caption(f"⏱️ Laatste update: {datetime.now().strftime('%H:%M:%S')}")
     if st.sidebar.button("🔄 Ververs data"):
-        st.cache_data.clear()
+        clear_all()
         st.rerun()
+    show_debug = st.sidebar.checkbox("🐞 Performance debug", key="perf_debug")
     
     # ==========================================================================
     # TABS
@@ -831,45 +211,44 @@ def main():
     # =========================================================================
     # TAB 1: OVERZICHT
     # =========================================================================
-    with tabs[0]:
+    with tabs[0], lab_metrics.section("Overzicht"):
         st.header("📊 Financieel Overzicht")
         
         # KPIs
         col1, col2, col3, col4 = st.columns(4)
         
         with st.spinner("Data laden..."):
-            revenue_data = get_revenue_data(selected_year, company_id)
-            cost_data = get_cost_data(selected_year, company_id)
+            ledger = get_ledger_range(period_start, period_end, company_id)
             bank_data = get_bank_balances()
             receivables, payables = get_receivables_payables(company_id)
         
-        total_revenue = -sum(r.get("balance", 0) for r in revenue_data)
-        total_costs = sum(c.get("balance", 0) for c in cost_data)
+        # Omzet en kosten uit de kubus (één keer opgebouwd per dataversie, zie lab_cube.py)
+        cube = financial_cube(*ledger)
+        revenue_cube = cube.slice(accounts=lambda code: pnl_section(code) == "Omzet")
+        cost_cube = cube.slice(accounts=lambda code: pnl_section(code) != "Omzet")
+        total_revenue = -revenue_cube.total()
+        total_costs = cost_cube.total()
         result = total_revenue - total_costs
         
         # Filter bank voor geselecteerde company
-        if company_id:
-            bank_total = sum(b.get("current_statement_balance", 0) for b in bank_data 
-                          if b.get("company_id", [None])[0] == company_id)
-        else:
-            bank_total = sum(b.get("current_statement_balance", 0) for b in bank_data)
+        company_bank = bank_total(bank_data, company_id)
         
         with col1:
-            st.metric("💰 Omzet YTD", f"€{total_revenue:,.0f}")
+            st.metric("💰 Omzet", f"€{total_revenue:,.0f}")
         with col2:
-            st.metric("📉 Kosten YTD", f"€{total_costs:,.0f}")
+            st.metric("📉 Kosten", f"€{total_costs:,.0f}")
         with col3:
             st.metric("📊 Resultaat", f"€{result:,.0f}", 
                      delta=f"{result/total_revenue*100:.1f}%" if total_revenue else "0%")
         with col4:
-            st.metric("🏦 Banksaldo", f"€{bank_total:,.0f}")
+            st.metric("🏦 Banksaldo", f"€{company_bank:,.0f}")
         
         # Debiteuren/Crediteuren
         st.markdown("---")
         col1, col2 = st.columns(2)
         
-        rec_total = sum(r.get("amount_residual", 0) for r in receivables)
-        pay_total = sum(p.get("amount_residual", 0) for p in payables)
+        rec_total = sum(receivables.column("amount_residual", 0))
+        pay_total = sum(payables.column("amount_residual", 0))
         
         with col1:
             st.metric("👥 Debiteuren", f"€{rec_total:,.0f}")
@@ -880,23 +259,14 @@ def main():
         st.markdown("---")
         st.subheader("📈 Omzet vs Kosten per maand")
         
-        if revenue_data:
-            # Groepeer per maand
-            monthly = {}
-            for r in revenue_data:
-                month = r.get("date", "")[:7]
-                if month not in monthly:
-                    monthly[month] = {"omzet": 0, "kosten": 0}
-                monthly[month]["omzet"] += -r.get("balance", 0)
-            
-            for c in cost_data:
-                month = c.get("date", "")[:7]
-                if month in monthly:
-                    monthly[month]["kosten"] += c.get("balance", 0)
+        if revenue_cube:
+            # Per maand uit de kubus
+            revenue_monthly = revenue_cube.by_month()
+            cost_monthly = cost_cube.by_month()
             
             df_monthly = pd.DataFrame([
-                {"Maand": k, "Omzet": v["omzet"], "Kosten": v["kosten"]}
-                for k, v in sorted(monthly.items())
+                {"Maand": month, "Omzet": -amount, "Kosten": cost_monthly.get(month, 0)}
+                for month, amount in sorted(revenue_monthly.items())
             ])
             
             if not df_monthly.empty:
@@ -907,11 +277,62 @@ def main():
                                     marker_color="#87CEEB"))
                 fig.update_layout(barmode="group", height=400)
                 st.plotly_chart(fig, use_container_width=True)
-    
+
+        # Meerjarenvergelijking: ontbrekende jaren samen uit één read_group, per jaar gecachet
+        st.markdown("---")
+        if st.toggle("📈 Meerjarenvergelijking", key="trend_mode"):
+            trend_years = list(range(TREND_FROM_YEAR, current_year + 1))
+            with st.spinner("Meerjarendata laden..."):
+                trend = get_ledger_trend(trend_years, company_id)
+
+            trend_rows = []
+            monthly_rows = []
+            for year in trend_years:
+                year_cube = financial_cube(*trend[year])
+                year_revenue = year_cube.slice(accounts=lambda code: pnl_section(code) == "Omzet")
+                year_costs = year_cube.slice(accounts=lambda code: pnl_section(code) != "Omzet")
+                revenue_by_company = year_revenue.by_company()
+                costs_by_company = year_costs.by_company()
+                for cid in sorted(set(revenue_by_company) | set(costs_by_company)):
+                    omzet = -revenue_by_company.get(cid, 0)
+                    kosten = costs_by_company.get(cid, 0)
+                    trend_rows.append({"Jaar": year, "Bedrijf": COMPANIES.get(cid, "Onbekend"),
+                                       "Omzet": omzet, "Kosten": kosten, "Marge": omzet - kosten})
+                revenue_by_month = year_revenue.by_month()
+                costs_by_month = year_costs.by_month()
+                for month in sorted(set(revenue_by_month) | set(costs_by_month)):
+                    omzet = -revenue_by_month.get(month, 0)
+                    kosten = costs_by_month.get(month, 0)
+                    monthly_rows.append({"Jaar": str(year), "Maand": int(month[5:7]),
+                                         "Omzet": omzet, "Kosten": kosten, "Marge": omzet - kosten})
+
+            if trend_rows:
+                series = st.radio("Reeks", ["Omzet", "Kosten", "Marge"], horizontal=True, key="trend_series")
+                df_trend_months = pd.DataFrame(monthly_rows)
+                fig = px.line(df_trend_months, x="Maand", y=series, color="Jaar", markers=True,
+                              title=f"{series} per maand, {trend_years[0]}-{trend_years[-1]}")
+                fig.update_layout(height=400, xaxis=dict(dtick=1))
+                st.plotly_chart(fig, use_container_width=True)
+
+                df_trend = pd.DataFrame(trend_rows)
+                df_trend["Marge %"] = (df_trend["Marge"] / df_trend["Omzet"].where(df_trend["Omzet"] != 0)) * 100
+                fig = px.bar(df_trend, x="Jaar", y=series, color="Bedrijf", barmode="group",
+                             title=f"{series} per jaar en bedrijf")
+                fig.update_layout(height=350, xaxis=dict(dtick=1))
+                st.plotly_chart(fig, use_container_width=True)
+                st.dataframe(
+                    df_trend.style.format({"Omzet": "€{:,.0f}", "Kosten": "€{:,.0f}", "Marge": "€{:,.0f}",
+                                           "Marge %": "{:.1f}%"}, na_rep="-"),
+                    use_container_width=True,
+                    hide_index=True
+                )
+            else:
+                st.info("Geen meerjarendata beschikbaar")
+
     # =========================================================================
     # TAB 2: BANK
     # =========================================================================
-    with tabs[1]:
+    with tabs[1], lab_metrics.section("Bank"):
         st.header("🏦 Banksaldi per Rekening")
         
         bank_data = get_bank_balances()
@@ -978,7 +399,7 @@ def main():
     # =========================================================================
     # TAB 3: FACTUREN
     # =========================================================================
-    with tabs[2]:
+    with tabs[2], lab_metrics.section("Facturen"):
         st.header("📄 Facturen")
         
         # Filters
@@ -996,11 +417,16 @@ def main():
         with col3:
             search = st.text_input("🔍 Zoeken (nummer/klant/referentie)", key="inv_search")
         
-        invoices = get_invoices(selected_year, company_id, inv_type_filter, state_filter, 
-                               search if search else None)
+        invoice_filter = (selected_year, company_id, inv_type_filter, state_filter, search if search else None)
+        invoices = get_invoices(*invoice_filter)
+        # De tabel toont hoogstens INVOICE_LIMIT facturen; de ZIP haalt het hele filter op
+        capped = len(invoices) >= INVOICE_LIMIT
         
         if invoices:
-            st.write(f"📋 {len(invoices)} facturen gevonden")
+            if capped:
+                st.write(f"📋 Eerste {INVOICE_LIMIT} facturen getoond - verfijn het filter voor de rest")
+            else:
+                st.write(f"📋 {len(invoices)} facturen gevonden")
             
             # Maak DataFrame
             df_inv = pd.DataFrame([
@@ -1027,7 +453,42 @@ def main():
                 use_container_width=True,
                 hide_index=True
             )
-            
+
+            # Alle PDF's van het huidige filter in één ZIP op schijf (lab_export.py)
+            with st.expander("📦 Alle PDF's downloaden (ZIP)"):
+                pdf_name = lab_export.invoice_pdf_filename(selected_year, company_id)
+                # Eén bestand per filter: sessies met een ander filter overschrijven elkaars ZIP niet
+                filter_key = hashlib.sha1(repr(invoice_filter).encode()).hexdigest()[:12]
+                pdf_path = os.path.join(EXPORT_DIR, f"{filter_key}_{pdf_name}")
+                invoice_ids = tuple(inv["id"] for inv in invoices)
+                label = (f"ZIP maken (alle facturen van dit filter, meer dan {INVOICE_LIMIT})" if capped
+                         else f"ZIP maken ({len(invoices)} facturen)")
+                if st.button(label, key="invoice_pdf_export"):
+                    os.makedirs(EXPORT_DIR, exist_ok=True)
+                    bar = st.progress(0.0, text="Bijlagen zoeken...")
+
+                    def pdf_progress(done, total):
+                        bar.progress(min(done / total, 1.0) if total else 1.0,
+                                     text=f"{done:,} / {total:,} PDF's")
+
+                    try:
+                        selected = invoice_numbers(*invoice_filter) if capped else invoices
+                        stats = lab_export.export_invoice_pdfs(pdf_path, selected, pdf_progress)
+                        stats["invoices"] = len(selected)
+                        st.session_state["invoice_pdf_file"] = (pdf_path, invoice_ids, stats)
+                    except Exception as e:
+                        st.error(f"Export mislukt: {e}")
+                exported = st.session_state.get("invoice_pdf_file")
+                # Alleen aanbieden als de ZIP bij het huidige filter hoort
+                if exported and exported[:2] == (pdf_path, invoice_ids) and os.path.exists(pdf_path):
+                    stats = exported[2]
+                    st.caption(f"{stats['invoices']} facturen, {stats['pdfs']} PDF's; "
+                               f"{stats['duplicates']} facturen met een PDF die al "
+                               f"in de ZIP zit, {stats['missing']} zonder PDF (zie manifest.csv)")
+                    with open(pdf_path, "rb") as f:
+                        st.download_button(f"📥 Download {pdf_name}", f, file_name=pdf_name,
+                                           mime="application/zip")
+
             # Detail sectie
             st.markdown("---")
             st.subheader("🔍 Factuurdetails")
@@ -1099,7 +560,7 @@ def main():
     # =========================================================================
     # TAB 4: PRODUCTEN (met subtabs)
     # =========================================================================
-    with tabs[3]:
+    with tabs[3], lab_metrics.section("Producten"):
         st.header("🏆 Productanalyse")
         
         # Subtabs voor producten
@@ -1114,33 +575,10 @@ def main():
             
             if is_conceptstore:
                 st.caption("📍 Data uit POS orders (Conceptstore)")
-                pos_sales = get_pos_product_sales(selected_year, company_id)
-                product_cats = get_product_categories()
-                product_sales = pos_sales  # Voor compatibiliteit
-            else:
-                product_sales = get_product_sales(selected_year, company_id)
-                product_cats = get_product_categories()
             
-            if product_sales:
-                # Groepeer per categorie
-                cat_data = {}
-                for p in product_sales:
-                    prod = p.get("product_id")
-                    if prod:
-                        prod_id = prod[0]
-                        cat = product_cats.get(prod_id, [None, "Onbekend"])
-                        cat_name = cat[1] if cat else "Onbekend"
-                        if cat_name not in cat_data:
-                            cat_data[cat_name] = {"Omzet": 0, "Aantal": 0}
-                        # POS gebruikt qty, account.move.line gebruikt quantity
-                        qty_field = "qty" if is_conceptstore else "quantity"
-                        cat_data[cat_name]["Omzet"] += p.get("price_subtotal", 0)
-                        cat_data[cat_name]["Aantal"] += p.get(qty_field, 0)
-                
-                df_cat = pd.DataFrame([
-                    {"Categorie": k, "Omzet": v["Omzet"], "Aantal": v["Aantal"]}
-                    for k, v in sorted(cat_data.items(), key=lambda x: -x[1]["Omzet"])
-                ])
+            category_totals = product_category_totals(selected_year, company_id)
+            if category_totals:
+                df_cat = pd.DataFrame(category_totals)
                 
                 if not df_cat.empty:
                     col1, col2 = st.columns(2)
@@ -1174,34 +612,8 @@ def main():
             
             if is_conceptstore:
                 st.caption("📍 Data uit POS orders (Conceptstore)")
-                pos_sales = get_pos_product_sales(selected_year, company_id)
-                
-                if pos_sales:
-                    # Aggregeer POS data per product
-                    prod_data = {}
-                    for p in pos_sales:
-                        prod = p.get("product_id")
-                        if prod:
-                            prod_name = prod[1]
-                            if prod_name not in prod_data:
-                                prod_data[prod_name] = {"Omzet": 0, "Aantal": 0}
-                            prod_data[prod_name]["Omzet"] += p.get("price_subtotal", 0)
-                            prod_data[prod_name]["Aantal"] += p.get("qty", 0)
-                    
-                    top_list = sorted(prod_data.items(), key=lambda x: -x[1]["Omzet"])[:20]
-                    df_top = pd.DataFrame([
-                        {"Product": k, "Omzet": v["Omzet"], "Aantal": v["Aantal"]}
-                        for k, v in top_list
-                    ])
-                else:
-                    df_top = pd.DataFrame()
-            else:
-                top_products = get_top_products(selected_year, company_id, limit=20)
-                if top_products:
-                    df_top = pd.DataFrame(top_products)
-                    df_top.columns = ["Product", "Omzet", "Aantal"]
-                else:
-                    df_top = pd.DataFrame()
+            
+            df_top = pd.DataFrame(top_product_totals(selected_year, company_id, limit=20))
             
             if not df_top.empty:
                 col1, col2 = st.columns([2, 1])
@@ -1225,47 +637,46 @@ def main():
             if not company_id or company_id == 3:
                 st.subheader("🎨 LAB Projects: Verf vs Behang Analyse")
                 
-                # Hardcoded data from earlier analysis
-                verf_data = {"Omzet": 740383, "Materiaal": 181940, "Onderaannemers": 420721}
-                behang_data = {"Omzet": 261488, "Materiaal": 77974, "Onderaannemers": 117402}
-                
-                verf_marge = verf_data["Omzet"] - verf_data["Materiaal"] - verf_data["Onderaannemers"]
-                behang_marge = behang_data["Omzet"] - behang_data["Materiaal"] - behang_data["Onderaannemers"]
-                
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown("### 🖌️ Verfprojecten (73.9%)")
-                    st.metric("Omzet", f"€{verf_data['Omzet']:,}")
-                    st.metric("Materiaalkosten", f"€{verf_data['Materiaal']:,}")
-                    st.metric("Onderaannemers", f"€{verf_data['Onderaannemers']:,}")
-                    st.metric("Bruto Marge", f"€{verf_marge:,}", 
-                             delta=f"{verf_marge/verf_data['Omzet']*100:.1f}%")
-                
-                with col2:
-                    st.markdown("### 🎭 Behangprojecten (26.1%)")
-                    st.metric("Omzet", f"€{behang_data['Omzet']:,}")
-                    st.metric("Materiaalkosten", f"€{behang_data['Materiaal']:,}")
-                    st.metric("Onderaannemers", f"€{behang_data['Onderaannemers']:,}")
-                    st.metric("Bruto Marge", f"€{behang_marge:,}", 
-                             delta=f"{behang_marge/behang_data['Omzet']*100:.1f}%")
-                
-                st.warning("⚠️ **Let op:** Behangprojecten hebben een hogere marge (25.3%) dan verfprojecten (18.6%). "
-                          "Van de Fabriek vertegenwoordigt 52% van de verfonderaanneming - concentratierisico!")
-                
-                # Vergelijkingsgrafiek
-                st.markdown("---")
-                fig = go.Figure()
-                
-                categories = ["Omzet", "Materiaal", "Onderaannemers", "Marge"]
-                verf_values = [verf_data["Omzet"], verf_data["Materiaal"], verf_data["Onderaannemers"], verf_marge]
-                behang_values = [behang_data["Omzet"], behang_data["Materiaal"], behang_data["Onderaannemers"], behang_marge]
-                
-                fig.add_trace(go.Bar(name="Verf", x=categories, y=verf_values, marker_color="#1e3a5f"))
-                fig.add_trace(go.Bar(name="Behang", x=categories, y=behang_values, marker_color="#4682B4"))
-                
-                fig.update_layout(barmode="group", height=400, title="Vergelijking Verf vs Behang")
-                st.plotly_chart(fig, use_container_width=True)
+                # Live uit de analytische regels, per maand gecachet (lab_data.get_project_margins)
+                margins = project_margin_totals(period_start, period_end)
+                project_types = [t for t in ("Verf", "Behang") if t in margins]
+                total_revenue = sum(margins[t]["Omzet"] for t in project_types)
+
+                if project_types and total_revenue:
+                    icons = {"Verf": "🖌️ Verfprojecten", "Behang": "🎭 Behangprojecten"}
+                    cols = st.columns(len(project_types))
+                    for col, project_type in zip(cols, project_types):
+                        data = margins[project_type]
+                        with col:
+                            st.markdown(f"### {icons[project_type]} ({data['Omzet'] / total_revenue * 100:.1f}%)")
+                            st.metric("Omzet", f"€{data['Omzet']:,.0f}")
+                            st.metric("Materiaalkosten", f"€{data['Materiaal']:,.0f}")
+                            st.metric("Onderaannemers", f"€{data['Onderaannemers']:,.0f}")
+                            st.metric("Bruto Marge", f"€{data['Marge']:,.0f}",
+                                     delta=f"{data['Marge'] / data['Omzet'] * 100:.1f}%" if data["Omzet"] else None)
+
+                    rates = {t: margins[t]["Marge"] / margins[t]["Omzet"] * 100
+                             for t in project_types if margins[t]["Omzet"]}
+                    if len(rates) == 2:
+                        best, worst = sorted(rates, key=rates.get, reverse=True)
+                        st.info(f"💡 {best}projecten hebben een hogere marge ({rates[best]:.1f}%) dan "
+                                f"{worst.lower()}projecten ({rates[worst]:.1f}%).")
+                    if "Overig" in margins:
+                        st.caption(f"Niet toegewezen aan verf of behang: €{margins['Overig']['Omzet']:,.0f} omzet")
+
+                    # Vergelijkingsgrafiek
+                    st.markdown("---")
+                    fig = go.Figure()
+
+                    categories = ["Omzet", "Materiaal", "Onderaannemers", "Marge"]
+                    for project_type, color in zip(project_types, ["#1e3a5f", "#4682B4"]):
+                        fig.add_trace(go.Bar(name=project_type, x=categories,
+                                             y=[margins[project_type][c] for c in categories], marker_color=color))
+
+                    fig.update_layout(barmode="group", height=400, title="Vergelijking Verf vs Behang")
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("Geen verf- of behangboekingen in deze periode")
             else:
                 st.info("ℹ️ De Verf vs Behang analyse is alleen beschikbaar voor LAB Projects. "
                        "Selecteer 'LAB Projects' of 'Alle bedrijven' in de sidebar.")
@@ -1273,7 +684,7 @@ def main():
     # =========================================================================
     # TAB 5: KLANTENKAART (nieuw!)
     # =========================================================================
-    with tabs[4]:
+    with tabs[4], lab_metrics.section("Klantenkaart"):
         st.header("🗺️ Klantenkaart LAB Projects")
         
         if not company_id or company_id == 3:
@@ -1373,24 +784,21 @@ def main():
     # =========================================================================
     # TAB 6: KOSTEN
     # =========================================================================
-    with tabs[5]:
+    with tabs[5], lab_metrics.section("Kosten"):
         st.header("📉 Kostenanalyse")
         
-        cost_data = get_cost_data(selected_year, company_id)
+        # Zelfde kubus als het overzicht; alleen de kostenrekeningen
+        cube = financial_cube(*get_ledger_range(period_start, period_end, company_id))
+        cost_cube = cube.slice(accounts=lambda code: pnl_section(code) != "Omzet")
         
-        if cost_data:
+        if cost_cube:
+            
             # Groepeer per account
             account_costs = {}
             
-            for c in cost_data:
-                account = c.get("account_id")
-                if account:
-                    name = translate_account_name(account[1])
-                    balance = c.get("balance", 0)
-                    
-                    if name not in account_costs:
-                        account_costs[name] = 0
-                    account_costs[name] += balance
+            for _, account_name, balance in cost_cube.by_account():
+                name = translate_account_name(account_name)
+                account_costs[name] = account_costs.get(name, 0) + balance
             
             # Sorteer en toon
             sorted_accounts = sorted(account_costs.items(), key=lambda x: -x[1])
@@ -1413,34 +821,130 @@ def main():
                 fig2 = px.pie(df_pie, values="Bedrag", names="Kostensoort",
                              color_discrete_sequence=px.colors.sequential.Blues_r)
                 st.plotly_chart(fig2, use_container_width=True)
+
+            # Roll-up: categorie (2 cijfers) en W&V-sectie
+            st.markdown("---")
+            st.subheader("🗂️ Kosten per categorie")
+            categories = cost_cube.rollup(get_category_name)
+            df_categories = pd.DataFrame(
+                [{"Sectie": pnl_section(code), "Categorie": get_category_name(code)}
+                 for code in cost_cube.accounts]
+            ).drop_duplicates("Categorie")
+            df_categories["Bedrag"] = df_categories["Categorie"].map(categories)
+            st.dataframe(
+                df_categories.sort_values(["Sectie", "Bedrag"], ascending=[True, False]).style.format({
+                    "Bedrag": "€{:,.0f}"
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+
+            # Drill-down: categorie → rekening (uit de kubus) → boekingsregels (per pagina opgehaald)
+            st.markdown("---")
+            st.subheader("🔎 Drill-down")
+            account_totals = {code: (name, amount) for code, name, amount in cost_cube.by_account()}
+            account_counts = cost_cube.count_by_account()
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                drill_category = st.selectbox(
+                    "Categorie",
+                    sorted(categories, key=lambda c: -categories[c]),
+                    format_func=lambda c: f"{c} (€{categories[c]:,.0f})",
+                    key="cost_drill_category"
+                )
+            with col2:
+                drill_account = st.selectbox(
+                    "Rekening",
+                    sorted((code for code in account_totals if get_category_name(code) == drill_category),
+                           key=lambda code: -account_totals[code][1]),
+                    format_func=lambda code: f"{translate_account_name(account_totals[code][0])} "
+                                             f"(€{account_totals[code][1]:,.0f})",
+                    key="cost_drill_account"
+                )
             
+            if drill_account:
+                line_count = account_counts[drill_account]
+                pages = max(1, -(-line_count // ACCOUNT_LINES_PAGE))
+                page = st.number_input(
+                    f"Pagina (van {pages}, {line_count:,} regels)",
+                    min_value=1, max_value=pages, value=1,
+                    key=f"cost_drill_page_{drill_account}"
+                )
+                account_lines = get_account_lines(period_start, period_end, company_id, drill_account, page - 1)
+                df_lines = pd.DataFrame([
+                    {
+                        "Datum": l.get("date", ""),
+                        "Boeking": l["move_id"][1] if l.get("move_id") else "",
+                        "Relatie": l["partner_id"][1] if l.get("partner_id") else "",
+                        "Omschrijving": l.get("name") or "",
+                        "Bedrijf": COMPANIES.get(l["company_id"][0], "") if l.get("company_id") else "",
+                        "Bedrag": l.get("balance", 0)
+                    }
+                    for l in account_lines
+                ])
+                if not df_lines.empty:
+                    st.dataframe(
+                        df_lines.style.format({"Bedrag": "€{:,.2f}"}),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+
             # CSV Export
             st.markdown("---")
             df_all_costs = pd.DataFrame(sorted_accounts, columns=["Kostensoort", "Bedrag"])
             st.download_button(
                 "📥 Download alle kosten (CSV)",
                 df_all_costs.to_csv(index=False),
-                file_name=f"lab_kosten_{selected_year}.csv",
+                file_name=f"lab_kosten_{period_start}_{period_end}.csv",
                 mime="text/csv"
             )
         else:
             st.info("Geen kostendata beschikbaar")
-    
+
+        # Volledige regeldetail: pagina voor pagina naar een bestand op schijf (lab_export.py)
+        with st.expander("📒 Alle grootboekregels exporteren"):
+            formats = [f for f in lab_export.FORMATS
+                       if f not in lab_export.REQUIRES or importlib.util.find_spec(lab_export.REQUIRES[f])]
+            ledger_format = st.radio("Formaat", formats, horizontal=True, key="ledger_format",
+                                     format_func=lambda f: lab_export.FORMATS[f])
+            ledger_name = lab_export.ledger_filename(selected_year, company_id, ledger_format)
+            ledger_path = os.path.join(EXPORT_DIR, ledger_name)
+            if st.button("Export maken", key="ledger_export"):
+                os.makedirs(EXPORT_DIR, exist_ok=True)
+                bar = st.progress(0.0, text="Regels tellen...")
+
+                def ledger_progress(written, total):
+                    bar.progress(min(written / total, 1.0) if total else 1.0,
+                                 text=f"{written:,} / {total or 0:,} regels")
+
+                try:
+                    rows = lab_export.export_ledger(ledger_path, selected_year, company_id, ledger_format,
+                                                    ledger_progress)
+                    st.session_state["ledger_export_file"] = (ledger_path, rows)
+                except Exception as e:
+                    st.error(f"Export mislukt: {e}")
+            exported = st.session_state.get("ledger_export_file")
+            if exported and exported[0] == ledger_path and os.path.exists(ledger_path):
+                # Streamlit houdt het (gecomprimeerde) bestand vast voor de download, niet de regels
+                with open(ledger_path, "rb") as f:
+                    st.download_button(
+                        f"📥 Download {ledger_name} ({exported[1]:,} regels)",
+                        f,
+                        file_name=ledger_name,
+                        mime="application/gzip" if ledger_format == "csv" else "application/octet-stream"
+                    )
+
     # =========================================================================
     # TAB 7: CASHFLOW
     # =========================================================================
-    with tabs[6]:
+    with tabs[6], lab_metrics.section("Cashflow"):
         st.header("📈 Cashflow Prognose")
         
         st.info("💡 Dit is een vereenvoudigde 12-weken cashflow prognose gebaseerd op huidige saldi en gemiddelden.")
         
         # Huidige posities
-        bank_data = get_bank_balances()
-        receivables, payables = get_receivables_payables(company_id)
-        
-        current_bank = sum(b.get("current_statement_balance", 0) for b in bank_data)
-        current_rec = sum(r.get("amount_residual", 0) for r in receivables)
-        current_pay = abs(sum(p.get("amount_residual", 0) for p in payables))
+        current_bank, current_rec, current_pay = cash_positions(company_id)
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -1463,34 +967,11 @@ def main():
             payment_rate = st.slider("Betaling % crediteuren per week", 0, 100, 20)
         
         # Prognose berekenen
-        weeks = 12
-        forecast = []
-        balance = current_bank
-        remaining_rec = current_rec
-        remaining_pay = current_pay
-        
-        for week in range(1, weeks + 1):
-            # Ontvangsten
-            collections = remaining_rec * (collection_rate / 100)
-            remaining_rec -= collections
-            inflow = weekly_revenue + collections
-            
-            # Betalingen
-            payments = remaining_pay * (payment_rate / 100)
-            remaining_pay -= payments
-            outflow = weekly_costs + payments
-            
-            # Nieuw saldo
-            balance = balance + inflow - outflow
-            
-            forecast.append({
-                "Week": f"Week {week}",
-                "Ontvangsten": inflow,
-                "Betalingen": outflow,
-                "Banksaldo": balance
-            })
-        
-        df_forecast = pd.DataFrame(forecast)
+        df_forecast = pd.DataFrame(cashflow_forecast(
+            current_bank, current_rec, current_pay,
+            weekly_revenue=weekly_revenue, weekly_costs=weekly_costs,
+            collection_rate=collection_rate, payment_rate=payment_rate
+        ))
         
         # Grafiek
         fig = go.Figure()
@@ -1512,6 +993,10 @@ def main():
             }),
             use_container_width=True, hide_index=True
         )
+    
+    render_staleness_banner(staleness_banner, run_mark)
+    if show_debug:
+        render_debug_panel(run_mark)
 
 if __name__ == "__main__":
     main()
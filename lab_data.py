@@ -0,0 +1,1677 @@
+"""
+LAB Dashboard datalaag
+======================
+Configuratie, Odoo toegang en alle datafuncties van het dashboard, zonder
+Streamlit: bruikbaar vanuit de app (lab_dashboard.py), de headless
+rapportages (lab_report.py), de bench en de load test.
+
+Instellingen komen uit de omgeving, in de app uit Streamlit Secrets en
+headless uit .streamlit/secrets.toml. Odoo fouten gaan naar de handler
+uit set_error_handler() (in de app st.error, anders de log).
+"""
+
+import asyncio
+import calendar
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache, partial
+
+import requests
+
+import lab_metrics
+from lab_async import open_client, run_sync
+from lab_cassette import HttpTransport, open_transport
+from lab_governor import CircuitOpen, get_governor
+from lab_facts import FactTable, facts
+from lab_stream import BATCH_SIZE, CHUNK_SIZE, ResultStream, RpcErrorResponse, iter_batches
+from lab_split import (MAX_SPLIT_DEPTH, SPLIT_WORKERS, WindowMemory, bisect, find_date_range,
+                       id_chunks, parse_order, sort_records, split_windows, window_days,
+                       with_date_range)
+from lab_cache import (cached, configure_backend, configure_memory, in_background, note_error,
+                       single_flight, start_prewarmer)
+from lab_changes import start_change_feed
+
+# =============================================================================
+# CONFIGURATIE
+# =============================================================================
+
+@lru_cache(maxsize=1)
+def _secrets_file():
+    """secrets.toml zoals Streamlit die leest (project, dan home), zonder Streamlit runtime"""
+    try:
+        import tomllib
+    except ImportError:
+        return {}
+    values = {}
+    for path in (os.path.expanduser("~/.streamlit/secrets.toml"), os.path.join(".streamlit", "secrets.toml")):
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                values.update(tomllib.load(f))
+    return values
+
+def get_setting(name, default=None):
+    """Instelling uit de omgeving (benchmarks, mock server, batch jobs), anders uit
+    Streamlit Secrets (in de app) of secrets.toml (headless, zie lab_report.py)"""
+    if name in os.environ:
+        return os.environ[name]
+    streamlit = sys.modules.get("streamlit")
+    if streamlit is not None:
+        try:
+            return streamlit.secrets.get(name, default)
+        except FileNotFoundError:
+            return default
+    return _secrets_file().get(name, default)
+
+# Odoo configuratie (LAB_ODOO_URL wijst bv. naar de mock server uit lab_mock_odoo.py)
+ODOO_URL = get_setting("LAB_ODOO_URL", "https://lab.odoo.works/jsonrpc")
+ODOO_DB = "bluezebra-works-nl-vestingh-production-13415483"
+ODOO_UID = 37
+ODOO_API_KEY = get_setting("ODOO_API_KEY", "")
+
+# Record/replay van Odoo verkeer voor reproduceerbare benchmarks (zie lab_cassette.py)
+ODOO_TRANSPORT = open_transport(
+    record=get_setting("LAB_ODOO_RECORD", None),
+    replay=get_setting("LAB_ODOO_REPLAY", None),
+    latency=get_setting("LAB_REPLAY_LATENCY", None),
+    secret=get_setting("LAB_CASSETTE_SECRET", None),
+)
+
+# Jaren t/m dit jaar gelden altijd als afgesloten (naast de lock dates in Odoo)
+CLOSED_YEAR_CUTOFF = get_setting("CLOSED_YEAR_CUTOFF", None)
+
+# Gedeelde cache voor meerdere replica's, bv. "redis://cache:6379/0" (standaard: lokale map)
+CACHE_BACKEND = get_setting("LAB_CACHE_BACKEND", None)
+if CACHE_BACKEND:
+    configure_backend(CACHE_BACKEND)
+
+# Geheugenbudget van de cache in MB (standaard 512); daarboven worden entries verwijderd
+CACHE_MEMORY_MB = get_setting("LAB_CACHE_MEMORY_MB", None)
+if CACHE_MEMORY_MB:
+    configure_memory(int(CACHE_MEMORY_MB) * 2**20)
+
+COMPANIES = {
+    1: "LAB Conceptstore",
+    2: "LAB Shops",
+    3: "LAB Projects"
+}
+
+# =============================================================================
+# NEDERLANDSE VERTALINGEN (UITGEBREID)
+# =============================================================================
+
+# Categorie vertalingen (voor kostencategorieën 40-49)
+CATEGORY_TRANSLATIONS = {
+    "40": "Personeelskosten",
+    "41": "Huisvestingskosten",
+    "42": "Vervoerskosten",
+    "43": "Kantoorkosten",
+    "44": "Marketing & Reclame",
+    "45": "Algemene Kosten",
+    "46": "Overige Bedrijfskosten",
+    "47": "Financiële Lasten",
+    "48": "Afschrijvingen",
+    "49": "Overige Kosten",
+    "70": "Kostprijs Verkopen",
+    "71": "Kostprijs Verkopen",
+    "72": "Kostprijs Verkopen",
+    "73": "Kostprijs Verkopen",
+    "74": "Kostprijs Verkopen",
+    "75": "Kostprijs Verkopen",
+    "80": "Omzet",
+    "81": "Omzet",
+    "82": "Omzet",
+    "83": "Omzet",
+    "84": "Omzet",
+    "85": "Omzet"
+}
+
+# Uitgebreide rekening vertalingen
+ACCOUNT_TRANSLATIONS = {
+    # Personeelskosten (40)
+    "Gross wages": "Brutolonen",
+    "Bonuses and commissions": "Bonussen en provisies",
+    "Holiday allowance": "Vakantietoeslag",
+    "Royalty": "Tantièmes",
+    "Employee car contribution": "Eigen bijdrage auto",
+    "Healthcare Insurance Act (SVW) contribution": "ZVW-bijdrage",
+    "Employer's share of payroll taxes": "Werkgeverslasten loonheffing",
+    "Employer's share of pensions": "Pensioenpremie werkgever",
+    "Employer's share of social security contributions": "Sociale lasten werkgever",
+    "Provision for holidays": "Reservering vakantiedagen",
+    "Compensation for commuting": "Reiskostenvergoeding",
+    "Reimbursement of study costs": "Studiekostenvergoeding",
+    "Reimbursement of other travel expenses": "Overige reiskostenvergoeding",
+    "Reimbursement of other expenses": "Overige onkostenvergoeding",
+    "Management fees": "Managementvergoeding",
+    "Staff on loan": "Ingehuurd personeel",
+    "Working expenses scheme (WKR max 1.2% gross pay)": "Werkkostenregeling (WKR)",
+    "Travel costs of hired staff": "Reiskosten ingehuurd personeel",
+    "Recharge of direct labour costs": "Doorbelaste personeelskosten",
+    "Sick leave insurance": "Verzuimverzekering",
+    "Canteen costs": "Kantinekosten",
+    "Corporate clothing": "Bedrijfskleding",
+    "Other travel expenses": "Overige reiskosten",
+    "Conferences, seminars and symposia": "Congressen en seminars",
+    "Staff recruitment costs": "Wervingskosten personeel",
+    "Study and training costs": "Opleidingskosten",
+    "Other personnel costs": "Overige personeelskosten",
+    "Temporary staff": "Uitzendkrachten",
+    
+    # Huisvestingskosten (41)
+    "Property rental": "Huur bedrijfspand",
+    "Major property maintenance": "Groot onderhoud pand",
+    "Small property maintenance": "Klein onderhoud pand",
+    "Cleaning and window cleaning": "Schoonmaak en glazenwassen",
+    "Gas": "Gas",
+    "Electricity": "Elektriciteit",
+    "Water": "Water",
+    "Property insurance": "Opstalverzekering",
+    "Property taxes": "Onroerendezaakbelasting",
+    "Other property costs": "Overige huisvestingskosten",
+    
+    # Vervoerskosten (42)
+    "Car leasing": "Autoleasing",
+    "Fuel costs": "Brandstofkosten",
+    "Repair and maintenance": "Reparatie en onderhoud",
+    "Motor vehicle insurance": "Motorrijtuigenverzekering",
+    "Motor vehicle tax": "Motorrijtuigenbelasting",
+    "Transport costs": "Transportkosten",
+    "Other vehicle costs": "Overige autokosten",
+    "Parking costs": "Parkeerkosten",
+    
+    # Kantoorkosten (43)
+    "Office supplies": "Kantoorbenodigdheden",
+    "Printing and copying": "Drukwerk en kopieerkosten",
+    "Telephone and fax": "Telefoon en fax",
+    "Internet costs": "Internetkosten",
+    "Postage costs": "Portokosten",
+    "Software": "Software",
+    "Computer costs": "Computerkosten",
+    "Other office costs": "Overige kantoorkosten",
+    
+    # Marketing & Reclame (44)
+    "Advertising costs": "Advertentiekosten",
+    "Promotional material": "Promotiemateriaal",
+    "Trade fairs and exhibitions": "Beurzen en exposities",
+    "Website costs": "Websitekosten",
+    "Public relations": "Public relations",
+    "Sponsoring": "Sponsoring",
+    "Other marketing costs": "Overige marketingkosten",
+    
+    # Algemene Kosten (45)
+    "External advice": "Extern advies",
+    "Accountant costs": "Accountantskosten",
+    "Legal costs": "Juridische kosten",
+    "Audit fees": "Controlekosten",
+    "Consultancy fees": "Advieskosten",
+    "Administration costs": "Administratiekosten",
+    "Collection costs": "Incassokosten",
+    "Other external costs": "Overige externe kosten",
+    
+    # Overige Bedrijfskosten (46)
+    "Bank charges": "Bankkosten",
+    "Payment service charges": "Betalingsverkeerskosten",
+    "Insurance": "Verzekeringen",
+    "Subscriptions and memberships": "Abonnementen en lidmaatschappen",
+    "Gifts and donations": "Giften en donaties",
+    "Entertainment expenses": "Representatiekosten",
+    "Other operating costs": "Overige bedrijfskosten",
+    
+    # Financiële Lasten (47)
+    "Interest expenses": "Rentelasten",
+    "Bank interest": "Bankrente",
+    "Interest on loans": "Rente op leningen",
+    "Interest and similar charges": "Rente en soortgelijke kosten",
+    "Exchange differences": "Koersverschillen",
+    "Other financial costs": "Overige financiële kosten",
+    
+    # Afschrijvingen (48)
+    "Depreciation of buildings": "Afschrijving gebouwen",
+    "Depreciation of machines": "Afschrijving machines",
+    "Depreciation of passenger cars": "Afschrijving personenauto's",
+    "Depreciation of other transport equipment": "Afschrijving overig vervoer",
+    "Depreciation of trucks": "Afschrijving vrachtwagens",
+    "Depreciation of furniture and fixtures": "Afschrijving inventaris",
+    "Depreciation of computer equipment": "Afschrijving computers",
+    "Depreciation of intangible assets": "Afschrijving immateriële activa",
+    "Other depreciation": "Overige afschrijvingen",
+    "Depreciation of tools": "Afschrijving gereedschap",
+    
+    # Omzet (80)
+    "Product sales": "Productverkopen",
+    "Service revenue": "Omzet diensten",
+    "Other revenue": "Overige omzet",
+    "Revenue from goods": "Omzet goederen",
+    "Domestic sales": "Binnenlandse verkopen",
+    "Export sales": "Exportverkopen",
+    "Intercompany sales": "Intercompany verkopen",
+    
+    # Kostprijs verkopen (70)
+    "Cost of goods sold": "Kostprijs verkopen",
+    "Cost of materials": "Materiaalkosten",
+    "Direct labour costs": "Directe loonkosten",
+    "Production costs": "Productiekosten",
+    "Purchase costs": "Inkoopkosten",
+    "Subcontracting": "Uitbesteed werk",
+    
+    # Balansposten
+    "Accounts receivable": "Debiteuren",
+    "Accounts payable": "Crediteuren",
+    "Bank": "Bank",
+    "Cash": "Kas",
+    "Prepaid expenses": "Vooruitbetaalde kosten",
+    "Accrued expenses": "Nog te betalen kosten",
+    "VAT receivable": "Te vorderen BTW",
+    "VAT payable": "Af te dragen BTW",
+    "Inventory": "Voorraad",
+    "Fixed assets": "Vaste activa",
+    
+    # Intercompany
+    "Intercompany receivables": "Vordering groepsmaatschappijen",
+    "Intercompany payables": "Schuld groepsmaatschappijen",
+    "Current account": "Rekening-courant"
+}
+
+def translate_account_name(name):
+    """Vertaal Engelse rekeningnaam naar Nederlands indien beschikbaar"""
+    if not name:
+        return name
+    # Eerst exacte match proberen
+    if name in ACCOUNT_TRANSLATIONS:
+        return ACCOUNT_TRANSLATIONS[name]
+    # Dan gedeeltelijke match
+    for eng, nl in ACCOUNT_TRANSLATIONS.items():
+        if eng.lower() in name.lower():
+            return name.replace(eng, nl)
+    return name
+
+def get_category_name(account_code):
+    """Haal Nederlandse categorienaam op basis van rekeningcode"""
+    if not account_code or len(str(account_code)) < 2:
+        return "Overig"
+    prefix = str(account_code)[:2]
+    return CATEGORY_TRANSLATIONS.get(prefix, f"Categorie {prefix}")
+
+# =============================================================================
+# ODOO API HELPERS
+# =============================================================================
+
+class OdooError(Exception):
+    """Odoo call mislukt tijdens een achtergrond-refresh"""
+
+_error_handler = logging.getLogger("lab_data").error
+
+def set_error_handler(handler):
+    """Waar Odoo fouten getoond worden: st.error in de app, standaard de log (headless)"""
+    global _error_handler
+    _error_handler = handler
+
+def report_odoo_error(message, show=True):
+    """Toon een Odoo fout; in een achtergrond-refresh een exceptie zodat de cache de oude waarde houdt
+
+    show=False: niet als melding tonen (de staleness banner dekt het al)
+    """
+    note_error()
+    if in_background():
+        raise OdooError(message)
+    if show:
+        _error_handler(message)
+
+class OdooFault(Exception):
+    """Odoo gaf een foutmelding terug in plaats van een resultaat"""
+
+# Begrenst gelijktijdige RPCs (AIMD) en stopt calls als Odoo uitvalt (zie lab_governor.py)
+ODOO_GOVERNOR = get_governor("odoo", failure_types=(requests.exceptions.RequestException,))
+
+# Maximaal aantal gelijktijdige requests van de asyncio client (odoo_gather)
+ODOO_ASYNC_CONCURRENCY = int(get_setting("LAB_ODOO_ASYNC_CONCURRENCY", 16))
+
+def _rpc_payload(model, method, domain, fields=None, limit=None, options=None):
+    """options: extra keyword-argumenten voor de methode (offset, order, groupby, lazy)"""
+    args = [ODOO_DB, ODOO_UID, ODOO_API_KEY, model, method, [domain]]
+    kwargs = {}
+    if fields is not None:
+        kwargs["fields"] = fields
+    if limit:
+        kwargs["limit"] = limit
+    kwargs.update(options or {})
+    args.append(kwargs)
+    return {
+        "jsonrpc": "2.0",
+        "method": "call",
+        "params": {
+            "service": "object",
+            "method": "execute_kw",
+            "args": args
+        },
+        "id": 1
+    }
+
+def odoo_stream(model, domain, fields=None, limit=None, timeout=120, owner=None, batch_size=BATCH_SIZE,
+                options=None):
+    """search_read als generator van batches records; Timeout en OdooFault gaan door naar de aanroeper
+
+    Het antwoord wordt incrementeel uit de HTTP stream gedecodeerd (lab_stream.py):
+    de volledige body of resultaatlijst staat nooit in één keer in het geheugen.
+    owner: thread waaraan de meting wordt toegeschreven (bij opgesplitste calls)
+    """
+    payload = _rpc_payload(model, "search_read", domain, fields, limit, options)
+    started = time.perf_counter()
+    rows = 0
+    stream = None
+    try:
+        with ODOO_GOVERNOR.slot():
+            response = ODOO_TRANSPORT.post(ODOO_URL, payload, timeout, stream=True)
+            try:
+                stream = ResultStream(response.iter_content(CHUNK_SIZE))
+                for batch in iter_batches(stream, batch_size):
+                    rows += len(batch)
+                    yield batch
+            finally:
+                response.close()
+    except CircuitOpen:
+        lab_metrics.record_rpc(model, "search_read", 0.0, error="circuit_open", thread=owner)
+        raise
+    except RpcErrorResponse as e:
+        lab_metrics.record_rpc(model, "search_read", time.perf_counter() - started,
+                               stream.nbytes, error="odoo", thread=owner)
+        raise OdooFault(e.error)
+    except requests.exceptions.Timeout:
+        lab_metrics.record_rpc(model, "search_read", time.perf_counter() - started, error="timeout",
+                               thread=owner)
+        raise
+    except Exception as e:
+        lab_metrics.record_rpc(model, "search_read", time.perf_counter() - started, error=type(e).__name__,
+                               thread=owner)
+        raise
+    lab_metrics.record_rpc(model, "search_read", time.perf_counter() - started, stream.nbytes,
+                           rows=rows, limit=limit, thread=owner)
+
+def odoo_request(model, method, domain, fields=None, limit=None, timeout=120, owner=None, options=None):
+    """Eén JSON-RPC request naar Odoo; Timeout en OdooFault gaan door naar de aanroeper
+
+    owner: thread waaraan de meting wordt toegeschreven (bij opgesplitste calls)
+    """
+    if method == "search_read":
+        return _collect(odoo_stream(model, domain, fields, limit, timeout, owner, options=options))
+    payload = _rpc_payload(model, method, domain, fields, limit, options)
+    started = time.perf_counter()
+    try:
+        with ODOO_GOVERNOR.slot():
+            response = ODOO_TRANSPORT.post(ODOO_URL, payload, timeout)
+        result = response.json()
+    except CircuitOpen:
+        lab_metrics.record_rpc(model, method, 0.0, error="circuit_open", thread=owner)
+        raise
+    except requests.exceptions.Timeout:
+        lab_metrics.record_rpc(model, method, time.perf_counter() - started, error="timeout", thread=owner)
+        raise
+    except Exception as e:
+        lab_metrics.record_rpc(model, method, time.perf_counter() - started, error=type(e).__name__,
+                               thread=owner)
+        raise
+    if "error" in result:
+        lab_metrics.record_rpc(model, method, time.perf_counter() - started,
+                               len(response.content), error="odoo", thread=owner)
+        raise OdooFault(result["error"])
+    records = result.get("result", [])
+    lab_metrics.record_rpc(model, method, time.perf_counter() - started, len(response.content),
+                           rows=len(records) if isinstance(records, list) else None, limit=limit,
+                           thread=owner)
+    return records
+
+def _collect(batches):
+    """Batches samenvoegen tot één lijst records (standaard 'build' van split_call)"""
+    return [record for batch in batches for record in batch]
+
+# Per model de datumvenstergrootte die zonder timeout lukte (zie lab_split.py)
+SPLIT_WINDOWS = WindowMemory()
+
+def _fetch_parts(model, domains, fields, timeout, owner, depth, limit=None, order=None):
+    """Haal deel-domeinen gelijktijdig op en voeg de resultaten samen
+
+    Met limit of order worden de delen samen gesorteerd (zonder order: op id) en
+    geldt de limit pas voor het samengevoegde resultaat; elk deel haalt er
+    hooguit limit op, dus de eerste limit van het geheel zitten er altijd bij.
+    """
+    with ThreadPoolExecutor(max_workers=min(SPLIT_WORKERS, len(domains)),
+                            thread_name_prefix="lab-split") as pool:
+        parts = list(pool.map(
+            lambda part: split_call(model, part, fields, timeout, owner, depth, limit, order), domains
+        ))
+    records = [record for part in parts for record in part]
+    if limit or order:
+        sort_records(records, order)
+    return records[:limit] if limit else records
+
+def split_call(model, domain, fields, timeout=120, owner=None, depth=0, limit=None, order=None,
+               build=_collect):
+    """search_read die zichzelf bij een timeout opsplitst in datumvensters of id-blokken
+
+    limit en order gelden voor het geheel (zie _fetch_parts).
+    build: maakt het resultaat uit een iterable van batches records (bv.
+    FactTable.from_batches); een request dat niet opgesplitst hoeft te worden
+    gaat batch voor batch uit de stream de builder in.
+    """
+    if depth == 0 and fields and (limit or order):
+        # Voor het samenvoegen moeten de sorteervelden in de records zitten
+        missing = [f for f, _ in parse_order(order) if f not in fields and f != "id"]
+        if missing:
+            def without_missing(batches):
+                return build([{k: v for k, v in r.items() if k not in missing} for r in batch]
+                             for batch in batches)
+            return split_call(model, domain, list(fields) + missing, timeout, owner, depth, limit, order,
+                              without_missing)
+    
+    date_range = find_date_range(domain)
+    if date_range and depth == 0:
+        field, start, end, is_datetime = date_range
+        windows = split_windows(start, end, SPLIT_WINDOWS.get(model))
+        if len(windows) > 1:
+            domains = [with_date_range(domain, field, a, b, is_datetime) for a, b in windows]
+            return build([_fetch_parts(model, domains, fields, timeout, owner, depth + 1, limit, order)])
+    
+    options = {"order": order} if order else None
+    started = time.perf_counter()
+    try:
+        records = build(odoo_stream(model, domain, fields, limit, timeout, owner, options=options))
+    except requests.exceptions.Timeout:
+        if depth >= MAX_SPLIT_DEPTH:
+            raise
+        if date_range:
+            field, start, end, is_datetime = date_range
+            halves = bisect(start, end)
+            if not halves:
+                raise
+            SPLIT_WINDOWS.shrink(model, window_days(*halves[0]))
+            domains = [with_date_range(domain, field, a, b, is_datetime) for a, b in halves]
+        else:
+            if len(domain) == 1 and domain[0][:2] == ["id", "in"]:
+                ids = domain[0][2]
+            else:
+                ids = odoo_request(model, "search", domain, limit=limit, timeout=timeout, owner=owner,
+                                   options={"order": order or "id"} if limit or order else None)
+            if len(ids) < 2:
+                raise
+            domains = [[["id", "in", chunk]] for chunk in id_chunks(ids)]
+        return build([_fetch_parts(model, domains, fields, timeout, owner, depth + 1, limit, order)])
+    
+    if date_range and depth > 0:
+        SPLIT_WINDOWS.succeeded(model, window_days(date_range[1], date_range[2]),
+                                time.perf_counter() - started, timeout)
+    return records
+
+def _report_call_error(error):
+    """Meld een mislukte Odoo call op de manier die bij de fout past"""
+    if isinstance(error, requests.exceptions.Timeout):
+        report_odoo_error("⏱️ Timeout, ook na automatisch opsplitsen - probeer een kortere periode "
+                          "of specifieke entiteit")
+    elif isinstance(error, CircuitOpen):
+        report_odoo_error(f"🔌 {error}", show=False)
+    elif isinstance(error, OdooFault):
+        report_odoo_error(f"Odoo error: {error}")
+    else:
+        report_odoo_error(f"Connection error: {error}")
+
+def odoo_call(model, method, domain, fields, limit=None, timeout=120, build=_collect, **options):
+    """Generieke Odoo JSON-RPC call; search_read wordt bij een timeout opgesplitst
+
+    options: extra keyword-argumenten voor Odoo, bv. offset/order (paging) of groupby (read_group).
+    Opsplitsen kan met limit en order, niet met offset of andere opties.
+    build: voor search_read, zie split_call
+    """
+    if not ODOO_API_KEY:
+        report_odoo_error("⚠️ ODOO_API_KEY niet geconfigureerd in Streamlit Secrets")
+        return []
+    
+    try:
+        if method == "search_read" and set(options) <= {"order"}:
+            return split_call(model, domain, fields, timeout, owner=threading.get_ident(), limit=limit,
+                              order=options.get("order"), build=build)
+        if method == "search_read":
+            return build(odoo_stream(model, domain, fields, limit, timeout, options=options))
+        return odoo_request(model, method, domain, fields, limit, timeout, options=options)
+    except OdooError:
+        raise
+    except Exception as e:
+        _report_call_error(e)
+        return []
+
+def odoo_facts(model, domain, fields, limit=None, timeout=120, **options):
+    """search_read als FactTable (lab_facts.py); de batches uit de stream gaan één voor één de kolommen in
+
+    Het volledige resultaat staat zo nooit als lijst van dicts in het geheugen.
+    Fouten zoals bij odoo_call (gemeld, lege tabel).
+    """
+    return facts(odoo_call(model, "search_read", domain, fields, limit, timeout,
+                           build=partial(FactTable.from_batches, model), **options), model)
+
+async def odoo_call_async(model, method, domain, fields=None, limit=None, timeout=120, owner=None, **options):
+    """Async tegenhanger van odoo_request (lab_async.py): zelfde payload, metingen en excepties
+
+    Bij record/replay (lab_cassette) gaat de call via het sync transport in een thread.
+    """
+    if not isinstance(ODOO_TRANSPORT, HttpTransport):
+        return await asyncio.to_thread(odoo_request, model, method, domain, fields, limit, timeout, owner,
+                                       options)
+    payload = _rpc_payload(model, method, domain, fields, limit, options)
+    started = time.perf_counter()
+    try:
+        # Client per URL (de bench wisselt ODOO_URL); deelt limiet en circuit breaker met het sync pad
+        client = open_client(ODOO_URL, ODOO_ASYNC_CONCURRENCY, governor=ODOO_GOVERNOR)
+        records, nbytes = await client.post(payload, timeout)
+    except RpcErrorResponse as e:
+        lab_metrics.record_rpc(model, method, time.perf_counter() - started, error="odoo", thread=owner)
+        raise OdooFault(e.error)
+    except CircuitOpen:
+        lab_metrics.record_rpc(model, method, 0.0, error="circuit_open", thread=owner)
+        raise
+    except requests.exceptions.Timeout:
+        lab_metrics.record_rpc(model, method, time.perf_counter() - started, error="timeout", thread=owner)
+        raise
+    except Exception as e:
+        lab_metrics.record_rpc(model, method, time.perf_counter() - started, error=type(e).__name__,
+                               thread=owner)
+        raise
+    lab_metrics.record_rpc(model, method, time.perf_counter() - started, nbytes,
+                           rows=len(records) if isinstance(records, list) else None, limit=limit,
+                           thread=owner)
+    return records
+
+def odoo_gather(calls, timeout=120):
+    """Voer Odoo calls gelijktijdig uit via de asyncio client; resultaten in dezelfde volgorde
+
+    calls: (model, method, domain, fields) of (model, method, domain, fields, {limit/offset/order/...}).
+    Fouten worden per call gemeld zoals bij odoo_call; die call geeft dan [].
+    """
+    if not ODOO_API_KEY:
+        report_odoo_error("⚠️ ODOO_API_KEY niet geconfigureerd in Streamlit Secrets")
+        return [[] for _ in calls]
+    owner = threading.get_ident()
+
+    async def gather():
+        return await asyncio.gather(
+            *(odoo_call_async(*call[:4], timeout=timeout, owner=owner, **(call[4] if len(call) > 4 else {}))
+              for call in calls),
+            return_exceptions=True
+        )
+
+    results = []
+    for result in run_sync(gather()):
+        if isinstance(result, OdooError):
+            raise result
+        if isinstance(result, Exception):
+            _report_call_error(result)
+            result = []
+        results.append(result)
+    return results
+
+def odoo_batches(model, domain, fields, limit=None, timeout=120, batch_size=BATCH_SIZE):
+    """search_read als batches voor functies die aggregeren: het geheugen blijft
+    begrensd door batch_size in plaats van de resultaatgrootte. Fouten worden
+    gemeld zoals bij odoo_call (er komen dan geen of niet alle batches)."""
+    if not ODOO_API_KEY:
+        report_odoo_error("⚠️ ODOO_API_KEY niet geconfigureerd in Streamlit Secrets")
+        return
+    
+    try:
+        yield from odoo_stream(model, domain, fields, limit, timeout, batch_size=batch_size)
+    except OdooError:
+        raise
+    except Exception as e:
+        _report_call_error(e)
+
+# =============================================================================
+# DATA FUNCTIES
+# =============================================================================
+
+# Ververs veelgebruikte datasets vóór ze verlopen (één thread per proces)
+start_prewarmer()
+
+# Move lines lezen ook de status van hun boeking (parent_state, move_id.*)
+LEDGER_SOURCES = ("account.move", "account.move.line")
+
+# Modellen zonder (bruikbaar) bedrijfsveld: een wijziging raakt alle bedrijven
+CHANGE_UNSCOPED = {"res.company", "res.partner", "product.product"}
+
+def change_marks(models):
+    """{model: {company_id of None: (laatste write_date, aantal)}} voor de change feed
+
+    Eén read_group per model, gelijktijdig via de asyncio client. Mislukte
+    modellen ontbreken in het resultaat (geen melding: achtergrondthread).
+    """
+    owner = threading.get_ident()
+
+    async def gather():
+        return await asyncio.gather(
+            *(odoo_call_async(model, "read_group", [], ["write_date:max"], timeout=30, owner=owner,
+                              groupby=[] if model in CHANGE_UNSCOPED else ["company_id"], lazy=False)
+              for model in models),
+            return_exceptions=True
+        )
+
+    marks = {}
+    for model, groups in zip(models, run_sync(gather())):
+        if isinstance(groups, Exception):
+            continue
+        marks[model] = {
+            (g["company_id"][0] if g.get("company_id") else None): (g.get("write_date"), g.get("__count"))
+            for g in groups
+        }
+    return marks
+
+@cached(ttl=3600, sources=("res.company",))
+def get_lock_dates():
+    """Haal de boekjaar-afsluitdatum (fiscalyear_lock_date) per bedrijf op"""
+    companies = odoo_call(
+        "res.company", "search_read",
+        [["id", "in", list(COMPANIES.keys())]],
+        ["id", "fiscalyear_lock_date"]
+    )
+    return {c["id"]: c.get("fiscalyear_lock_date") or "" for c in companies}
+
+def _locked_through(last_day, company_id=None):
+    """True als alle betrokken bedrijven t/m last_day ("JJJJ-MM-DD") zijn afgesloten"""
+    lock_dates = get_lock_dates()
+    company_ids = [company_id] if company_id else list(COMPANIES.keys())
+    return all(lock_dates.get(cid, "") >= last_day for cid in company_ids)
+
+def is_closed_year(year, company_id=None):
+    """Een jaar is afgesloten als het t/m CLOSED_YEAR_CUTOFF valt of voor alle
+    betrokken bedrijven vóór de lock date ligt"""
+    if CLOSED_YEAR_CUTOFF and year <= int(CLOSED_YEAR_CUTOFF):
+        return True
+    if year >= datetime.now().year:
+        return False
+    return _locked_through(f"{year}-12-31", company_id)
+
+def is_closed_month(month, company_id=None):
+    """Idem voor één maand ("JJJJ-MM"); de lock date kan ook midden in het jaar liggen"""
+    if CLOSED_YEAR_CUTOFF and int(month[:4]) <= int(CLOSED_YEAR_CUTOFF):
+        return True
+    if month >= datetime.now().strftime("%Y-%m"):
+        return False
+    return _locked_through(month_bounds(month)[1], company_id)
+
+def closed_period(args):
+    """Periode-classificatie voor @cached: afgesloten jaren worden permanent bewaard"""
+    return is_closed_year(args["year"], args.get("company_id"))
+
+def closed_months(args):
+    """Idem voor functies met een maand of maandreeks (month, of start t/m end)"""
+    return is_closed_month(args.get("month") or args["end"], args.get("company_id"))
+
+# =============================================================================
+# PERIODES
+# =============================================================================
+
+PERIODS = {
+    "year": "Kalenderjaar",
+    "rolling12": "Laatste 12 maanden",
+    "ytd": "Jaar tot nu",
+    "qtd": "Kwartaal tot nu",
+}
+
+def month_bounds(month):
+    """Eerste en laatste dag van een maand ("JJJJ-MM")"""
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{month}-01", f"{month}-{calendar.monthrange(year, number)[1]:02d}"
+
+def month_range(start, end):
+    """Maanden "JJJJ-MM" van start t/m end"""
+    year, number = int(start[:4]), int(start[5:7])
+    months = []
+    while f"{year:04d}-{number:02d}" <= end[:7]:
+        months.append(f"{year:04d}-{number:02d}")
+        year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return months
+
+def period_months(period, year, today=None):
+    """(eerste, laatste maand) voor een periodekeuze uit PERIODS; year geldt alleen voor "year" """
+    today = today or datetime.now()
+    if period == "year":
+        return f"{year}-01", f"{year}-12"
+    current = today.strftime("%Y-%m")
+    if period == "rolling12":
+        back = today.year * 12 + today.month - 12
+        return f"{back // 12:04d}-{back % 12 + 1:02d}", current
+    if period == "ytd":
+        return f"{today.year}-01", current
+    if period == "qtd":
+        return f"{today.year}-{(today.month - 1) // 3 * 3 + 1:02d}", current
+    raise ValueError(f"onbekende periode: {period}")
+
+@cached(ttl=300, sources=("account.journal", "account.move.line"))
+def get_bank_balances():
+    """Haal alle banksaldi op per rekening (excl. R/C intercompany)"""
+    journals = odoo_call(
+        "account.journal", "search_read",
+        [["type", "=", "bank"]],
+        ["name", "company_id", "default_account_id", "current_statement_balance", "code"]
+    )
+    
+    # Haal account codes op voor de journals om R/C te kunnen filteren
+    account_ids = [j.get("default_account_id", [None])[0] for j in journals if j.get("default_account_id")]
+    accounts = {}
+    if account_ids:
+        account_data = odoo_call(
+            "account.account", "search_read",
+            [["id", "in", account_ids]],
+            ["id", "code", "name"]
+        )
+        accounts = {a["id"]: a for a in account_data}
+    
+    # Filter: echte bankrekeningen vs R/C intercompany
+    bank_only = []
+    for j in journals:
+        name = j.get("name", "")
+        account_id = j.get("default_account_id", [None])[0]
+        account_code = accounts.get(account_id, {}).get("code", "") if account_id else ""
+        
+        # R/C detectie: naam bevat R/C OF rekeningcode begint met 12 of 14
+        is_rc = (
+            "R/C" in name or 
+            "RC " in name or
+            str(account_code).startswith("12") or  # Vorderingen op groepsmaatschappijen
+            str(account_code).startswith("14")     # Schulden aan groepsmaatschappijen
+        )
+        
+        if not is_rc:
+            bank_only.append(j)
+    
+    return bank_only
+
+@cached(ttl=300, sources=("account.journal", "account.move.line"))
+def get_rc_balances():
+    """Haal R/C (Rekening Courant) intercompany saldi op"""
+    journals = odoo_call(
+        "account.journal", "search_read",
+        [["type", "=", "bank"]],
+        ["name", "company_id", "default_account_id", "current_statement_balance", "code"]
+    )
+    
+    # Haal account codes op voor de journals
+    account_ids = [j.get("default_account_id", [None])[0] for j in journals if j.get("default_account_id")]
+    accounts = {}
+    if account_ids:
+        account_data = odoo_call(
+            "account.account", "search_read",
+            [["id", "in", account_ids]],
+            ["id", "code", "name"]
+        )
+        accounts = {a["id"]: a for a in account_data}
+    
+    # Filter: alleen R/C rekeningen
+    rc_only = []
+    for j in journals:
+        name = j.get("name", "")
+        account_id = j.get("default_account_id", [None])[0]
+        account_code = accounts.get(account_id, {}).get("code", "") if account_id else ""
+        
+        # R/C detectie
+        is_rc = (
+            "R/C" in name or 
+            "RC " in name or
+            str(account_code).startswith("12") or
+            str(account_code).startswith("14")
+        )
+        
+        if is_rc:
+            # Voeg account code toe aan journal voor weergave
+            j["account_code"] = account_code
+            j["account_type"] = "Vordering" if str(account_code).startswith("12") else "Schuld"
+            rc_only.append(j)
+    
+    return rc_only
+
+@cached(ttl=300, closed=closed_period, sources=LEDGER_SOURCES)
+def get_revenue_data(year, company_id=None):
+    """Haal omzetdata op van 8* rekeningen"""
+    domain = [
+        ["account_id.code", ">=", "800000"],
+        ["account_id.code", "<", "900000"],
+        ["date", ">=", f"{year}-01-01"],
+        ["date", "<=", f"{year}-12-31"],
+        ["parent_state", "=", "posted"]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    
+    return odoo_facts(
+        "account.move.line",
+        domain,
+        ["date", "account_id", "company_id", "balance", "name"],
+        limit=10000
+    )
+
+@cached(ttl=300, closed=closed_period, sources=LEDGER_SOURCES)
+def get_cost_data(year, company_id=None):
+    """Haal kostendata op van 4* en 7* rekeningen"""
+    domain = [
+        "|",
+        "&", ["account_id.code", ">=", "400000"], ["account_id.code", "<", "500000"],
+        "&", ["account_id.code", ">=", "700000"], ["account_id.code", "<", "800000"],
+        ["date", ">=", f"{year}-01-01"],
+        ["date", "<=", f"{year}-12-31"],
+        ["parent_state", "=", "posted"]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    
+    return odoo_facts(
+        "account.move.line",
+        domain,
+        ["date", "account_id", "company_id", "balance", "name"],
+        limit=15000
+    )
+
+def _ledger_rollup_domain(date_from, date_to, company_id=None):
+    """Geboekte regels op omzet- (8*) en kostenrekeningen (4*, 7*) in de periode"""
+    domain = [
+        "|", "|",
+        "&", ["account_id.code", ">=", "400000"], ["account_id.code", "<", "500000"],
+        "&", ["account_id.code", ">=", "700000"], ["account_id.code", "<", "800000"],
+        "&", ["account_id.code", ">=", "800000"], ["account_id.code", "<", "900000"],
+        ["date", ">=", date_from],
+        ["date", "<=", date_to],
+        ["parent_state", "=", "posted"]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    return domain
+
+LEDGER_ROLLUP_GROUPBY = {"groupby": ["account_id", "date:month", "company_id"], "lazy": False}
+
+def _rollup_rows(groups):
+    return [
+        {
+            "account_id": g["account_id"],
+            "date": g["__range"]["date:month"]["from"],
+            "company_id": g["company_id"],
+            "balance": g["balance"] or 0.0,
+            "count": g["__count"],
+        }
+        for g in groups
+    ]
+
+@cached(ttl=300, closed=closed_months, sources=LEDGER_SOURCES)
+def get_ledger_month(month, company_id=None):
+    """Saldi van omzet- (8*) en kostenrekeningen (4*, 7*) in één maand ("JJJJ-MM") per rekening × bedrijf
+
+    De cachepartitie onder get_ledger_range: elke periode wordt uit maanden
+    samengesteld. Odoo telt zelf op (read_group), dus geen losse regels over
+    de lijn. Het resultaat heeft de kolommen van de move lines (date = eerste
+    dag van de maand) plus count, zodat de kubus (lab_cube.py) er direct uit bouwt.
+    """
+    groups = odoo_call(
+        "account.move.line", "read_group",
+        _ledger_rollup_domain(*month_bounds(month), company_id),
+        ["balance:sum"],
+        **LEDGER_ROLLUP_GROUPBY
+    )
+    return facts(_rollup_rows(groups), "account.move.line")
+
+def _month_runs(months):
+    """Aaneengesloten reeksen uit een gesorteerde lijst maanden"""
+    runs = []
+    for month in months:
+        if runs and month_range(runs[-1][-1], month)[1:] == [month]:
+            runs[-1].append(month)
+        else:
+            runs.append([month])
+    return runs
+
+def _month_partitions(partition, fetch_run, start, end, *args):
+    """Maandpartities van start t/m end als tuple: partition(maand, *args) per maand
+
+    Maanden in de cache (ook verlopen waarden, die de partitie op de
+    achtergrond ververst) worden hergebruikt; ontbrekende maanden komen met
+    één query per aaneengesloten reeks: fetch_run(maanden, *args) geeft
+    {maand: resultaat} en elke maand wordt apart opgeslagen (afgesloten
+    maanden permanent). Mislukt die query, dan haalt partition per maand op.
+    """
+    months = month_range(start, end)
+    missing = [m for m in months if partition.peek(m, *args, stale=True) is None]
+    for run in _month_runs(missing) if ODOO_API_KEY else []:
+        if len(run) == 1:
+            continue
+        try:
+            per_month = fetch_run(run, *args)
+        except OdooError:
+            raise
+        except Exception:
+            # Per maand ophalen; de partitie meldt de fout en valt terug op de cache
+            continue
+        for month in run:
+            partition.prime(per_month[month], month, *args)
+    return tuple(partition(m, *args) for m in months)
+
+def _ledger_run(months, company_id=None):
+    groups = odoo_request(
+        "account.move.line", "read_group",
+        _ledger_rollup_domain(month_bounds(months[0])[0], month_bounds(months[-1])[1], company_id),
+        ["balance:sum"],
+        options=LEDGER_ROLLUP_GROUPBY
+    )
+    per_month = {m: [] for m in months}
+    for row in _rollup_rows(groups):
+        per_month[row["date"][:7]].append(row)
+    return {month: facts(rows, "account.move.line") for month, rows in per_month.items()}
+
+def get_ledger_range(start, end, company_id=None):
+    """Maandpartities van get_ledger_month voor start t/m end ("JJJJ-MM") als tuple
+
+    Een rollend venster haalt zo meestal alleen de nieuwe maand op (zie
+    _month_partitions). Bouw de kubus met financial_cube(*resultaat).
+    """
+    return _month_partitions(get_ledger_month, _ledger_run, start, end, company_id)
+
+def get_ledger_rollup(year, company_id=None):
+    """Saldi per rekening × maand × bedrijf voor een kalenderjaar (12 maandpartities)"""
+    return get_ledger_range(f"{year}-01", f"{year}-12", company_id)
+
+def get_ledger_trend(years, company_id=None):
+    """get_ledger_rollup voor meerdere jaren: {jaar: resultaat}
+
+    Ontbrekende maanden van alle jaren samen komen uit één read_group
+    (zie get_ledger_range); daarna is een trend van vier jaar hooguit één
+    query voor de open maanden.
+    """
+    years = sorted(years)
+    months = get_ledger_range(f"{years[0]}-01", f"{years[-1]}-12", company_id)
+    return {y: months[(y - years[0]) * 12:(y - years[0] + 1) * 12] for y in years}
+
+ACCOUNT_LINES_PAGE = 100
+
+@cached(ttl=300, closed=closed_months, sources=LEDGER_SOURCES)
+def get_account_lines(start, end, company_id=None, account_code=None, page=0):
+    """Eén pagina move lines van één rekening in de maanden start t/m end (drill-down in Kosten), nieuwste eerst"""
+    domain = [
+        ["account_id.code", "=", account_code],
+        ["date", ">=", month_bounds(start)[0]],
+        ["date", "<=", month_bounds(end)[1]],
+        ["parent_state", "=", "posted"]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+
+    return odoo_facts(
+        "account.move.line",
+        domain,
+        ["date", "move_id", "partner_id", "name", "company_id", "balance"],
+        limit=ACCOUNT_LINES_PAGE, offset=page * ACCOUNT_LINES_PAGE, order="date desc, id desc"
+    )
+
+LEDGER_PAGE = 5000
+LEDGER_FIELDS = ["id", "date", "move_id", "account_id", "partner_id", "name", "company_id", "balance"]
+
+def ledger_domain(year, company_id=None):
+    domain = [
+        ["date", ">=", f"{year}-01-01"],
+        ["date", "<=", f"{year}-12-31"],
+        ["parent_state", "=", "posted"]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    return domain
+
+def count_ledger_lines(year, company_id=None):
+    """Aantal geboekte move lines in het jaar (voortgang van de export); fouten gaan door"""
+    return odoo_request("account.move.line", "search_count", ledger_domain(year, company_id))
+
+def iter_ledger_lines(year, company_id=None, page_size=LEDGER_PAGE):
+    """Alle geboekte move lines van het jaar als pagina's van hoogstens page_size regels
+
+    Bewust niet gecachet: bedoeld voor exports die pagina voor pagina
+    wegschrijven. Er wordt op id gepagineerd (id > laatste id) in plaats van
+    met offset, zodat ook de laatste pagina's van een groot jaar snel zijn en
+    tussentijds geboekte regels niets verschuiven. Fouten gaan door naar de
+    aanroeper: een halve export mag niet als geslaagd gelden.
+    """
+    if not ODOO_API_KEY:
+        raise OdooError("ODOO_API_KEY niet geconfigureerd")
+    domain = ledger_domain(year, company_id)
+    last_id = 0
+    while True:
+        page = odoo_request("account.move.line", "search_read", domain + [["id", ">", last_id]],
+                            LEDGER_FIELDS, limit=page_size, options={"order": "id"})
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_id = page[-1]["id"]
+
+@cached(ttl=300, sources=LEDGER_SOURCES)
+def get_receivables_payables(company_id=None):
+    """Haal debiteuren en crediteuren saldi op"""
+    # Debiteuren
+    rec_domain = [
+        ["account_id.account_type", "=", "asset_receivable"],
+        ["parent_state", "=", "posted"],
+        ["amount_residual", "!=", 0]
+    ]
+    if company_id:
+        rec_domain.append(["company_id", "=", company_id])
+    
+    # Crediteuren
+    pay_domain = [
+        ["account_id.account_type", "=", "liability_payable"],
+        ["parent_state", "=", "posted"],
+        ["amount_residual", "!=", 0]
+    ]
+    if company_id:
+        pay_domain.append(["company_id", "=", company_id])
+    
+    # Beide tegelijk via de asyncio client
+    fields = ["company_id", "amount_residual", "partner_id"]
+    receivables, payables = odoo_gather([
+        ("account.move.line", "search_read", rec_domain, fields, {"limit": 5000}),
+        ("account.move.line", "search_read", pay_domain, fields, {"limit": 5000}),
+    ])
+    
+    return facts(receivables, "account.move.line"), facts(payables, "account.move.line")
+
+# Maximaal aantal facturen in het Facturen tab (de PDF export haalt ze allemaal op)
+INVOICE_LIMIT = 500
+
+def _invoice_domain(year, company_id=None, invoice_type=None, state=None, search_term=None):
+    domain = [
+        ["invoice_date", ">=", f"{year}-01-01"],
+        ["invoice_date", "<=", f"{year}-12-31"]
+    ]
+    
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    
+    if invoice_type == "verkoop":
+        domain.append(["move_type", "in", ["out_invoice", "out_refund"]])
+    elif invoice_type == "inkoop":
+        domain.append(["move_type", "in", ["in_invoice", "in_refund"]])
+    else:
+        domain.append(["move_type", "in", ["out_invoice", "out_refund", "in_invoice", "in_refund"]])
+    
+    if state:
+        domain.append(["state", "=", state])
+    
+    if search_term:
+        domain = ["&"] + domain + ["|", "|",
+            ["name", "ilike", search_term],
+            ["partner_id.name", "ilike", search_term],
+            ["ref", "ilike", search_term]
+        ]
+    return domain
+
+@cached(ttl=300, sources=("account.move",))
+def get_invoices(year, company_id=None, invoice_type=None, state=None, search_term=None):
+    """Haal facturen op met filters (hoogstens INVOICE_LIMIT)"""
+    return odoo_facts(
+        "account.move",
+        _invoice_domain(year, company_id, invoice_type, state, search_term),
+        ["name", "partner_id", "invoice_date", "amount_total", "amount_residual", 
+         "state", "move_type", "company_id", "ref"],
+        limit=INVOICE_LIMIT
+    )
+
+@cached(ttl=300, closed=closed_period, sources=LEDGER_SOURCES)
+def get_product_sales(year, company_id=None):
+    """Haal verkopen per productcategorie op"""
+    domain = [
+        ["move_id.move_type", "=", "out_invoice"],
+        ["move_id.state", "=", "posted"],
+        ["move_id.invoice_date", ">=", f"{year}-01-01"],
+        ["move_id.invoice_date", "<=", f"{year}-12-31"],
+        ["product_id", "!=", False]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    
+    return odoo_facts(
+        "account.move.line",
+        domain,
+        ["product_id", "price_subtotal", "quantity", "company_id"],
+        limit=10000
+    )
+
+@cached(ttl=300, sources=("product.product",))
+def get_product_categories():
+    """Haal alle producten op met hun categorie"""
+    products = odoo_call(
+        "product.product", "search_read",
+        [],
+        ["id", "name", "categ_id"],
+        limit=5000
+    )
+    return {p["id"]: p.get("categ_id", [None, "Onbekend"]) for p in products}
+
+@cached(ttl=300, closed=closed_period, sources=("pos.order", "pos.order.line"))
+def get_pos_product_sales(year, company_id=None):
+    """Haal POS verkopen op met productinfo (voor LAB Conceptstore)"""
+    # Haal POS orders op voor het jaar
+    domain = [
+        ["state", "in", ["paid", "done", "invoiced"]],
+        ["date_order", ">=", f"{year}-01-01"],
+        ["date_order", "<=", f"{year}-12-31 23:59:59"]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    
+    orders = odoo_call(
+        "pos.order", "search_read",
+        domain,
+        ["id", "name", "date_order", "amount_total"],
+        limit=50000
+    )
+    
+    if not orders:
+        return facts([], "pos.order.line")
+    
+    order_ids = [o["id"] for o in orders]
+    
+    # Haal orderregels op met product en categorie
+    return odoo_facts(
+        "pos.order.line",
+        [["order_id", "in", order_ids]],
+        ["product_id", "price_subtotal_incl", "price_subtotal", "qty", "order_id"],
+        limit=100000
+    )
+
+@cached(ttl=300, closed=closed_period, sources=LEDGER_SOURCES)
+def get_top_products(year, company_id=None, limit=20):
+    """Haal top producten op met omzet"""
+    domain = [
+        ["move_id.move_type", "=", "out_invoice"],
+        ["move_id.state", "=", "posted"],
+        ["move_id.invoice_date", ">=", f"{year}-01-01"],
+        ["move_id.invoice_date", "<=", f"{year}-12-31"],
+        ["product_id", "!=", False]
+    ]
+    if company_id:
+        domain.append(["company_id", "=", company_id])
+    
+    batches = odoo_batches(
+        "account.move.line",
+        domain,
+        ["product_id", "price_subtotal", "quantity"],
+        limit=15000
+    )
+    
+    # Groepeer per product (per batch, zodat niet alle regels tegelijk in het geheugen staan)
+    products = {}
+    for lines in batches:
+        for line in lines:
+            prod = line.get("product_id")
+            if prod:
+                prod_id = prod[0]
+                prod_name = prod[1]
+                if prod_id not in products:
+                    products[prod_id] = {"name": prod_name, "omzet": 0, "aantal": 0}
+                products[prod_id]["omzet"] += line.get("price_subtotal", 0)
+                products[prod_id]["aantal"] += line.get("quantity", 0)
+    
+    # Sorteer en return top N
+    sorted_products = sorted(products.values(), key=lambda x: -x["omzet"])
+    return sorted_products[:limit]
+
+@cached(ttl=300, sources=("account.move", "res.partner"))
+def get_customer_locations(company_id=3):
+    """Haal klantlocaties op voor LAB Projects (of andere entiteit)"""
+    # Haal alle klanten met adressen op die facturen hebben gehad
+    invoices = odoo_call(
+        "account.move", "search_read",
+        [
+            ["company_id", "=", company_id],
+            ["move_type", "=", "out_invoice"],
+            ["state", "=", "posted"]
+        ],
+        ["partner_id", "amount_total"],
+        limit=5000
+    )
+    
+    # Verzamel unieke klant IDs met omzet
+    customer_revenue = {}
+    for inv in invoices:
+        partner = inv.get("partner_id")
+        if partner:
+            pid = partner[0]
+            if pid not in customer_revenue:
+                customer_revenue[pid] = {"name": partner[1], "omzet": 0, "facturen": 0}
+            customer_revenue[pid]["omzet"] += inv.get("amount_total", 0)
+            customer_revenue[pid]["facturen"] += 1
+    
+    if not customer_revenue:
+        return []
+    
+    # Haal adresgegevens op
+    partner_ids = list(customer_revenue.keys())
+    partners = odoo_call(
+        "res.partner", "search_read",
+        [["id", "in", partner_ids]],
+        ["id", "name", "street", "zip", "city", "country_id"]
+    )
+    
+    # Combineer data
+    result = []
+    for p in partners:
+        pid = p["id"]
+        if pid in customer_revenue:
+            result.append({
+                "id": pid,
+                "name": customer_revenue[pid]["name"],
+                "street": p.get("street", ""),
+                "zip": p.get("zip", ""),
+                "city": p.get("city", ""),
+                "country": p.get("country_id", ["", ""])[1] if p.get("country_id") else "",
+                "omzet": customer_revenue[pid]["omzet"],
+                "facturen": customer_revenue[pid]["facturen"]
+            })
+    
+    return result
+
+# Verf vs Behang (LAB Projects): omzet en directe kosten per projectsoort uit de analytische regels
+PROJECTS_COMPANY_ID = 3
+
+# Projectsoort = analytische rekening waarvan de naam het woord bevat; de rest is "Overig"
+PROJECT_TYPES = {"Verf": "verf", "Behang": "behang"}
+# Kostensoorten die het dashboard toont (project_margin_totals)
+MARGIN_COST_LABELS = ("Omzet", "Materiaal", "Onderaannemers")
+
+
+def _margin_cost_types(setting):
+    """(prefix, kostensoort) paren, langste prefix eerst, uit een tabel in
+    secrets.toml of "8=Omzet,700=Materiaal,..." uit de omgeving"""
+    if isinstance(setting, str):
+        setting = dict(part.split("=", 1) for part in setting.split(",") if part.strip())
+    pairs = {str(prefix).strip(): label.strip() for prefix, label in setting.items()}
+    unknown = set(pairs.values()) - set(MARGIN_COST_LABELS)
+    if unknown:
+        raise ValueError(f"onbekende kostensoort in LAB_MARGIN_COST_TYPES: {', '.join(sorted(unknown))}")
+    return tuple(sorted(pairs.items(), key=lambda pair: (-len(pair[0]), pair[0])))
+
+
+# Kostensoort per rekeningcode-prefix (langste prefix wint); finance past dit aan via LAB_MARGIN_COST_TYPES.
+# Als argument van de maandfuncties zit de indeling in de cachekey: na een correctie vervallen ook afgesloten maanden
+MARGIN_COST_TYPES = _margin_cost_types(get_setting("LAB_MARGIN_COST_TYPES", {
+    "8": "Omzet", "700": "Materiaal", "701": "Materiaal", "702": "Onderaannemers",
+}))
+PROJECT_MARGIN_GROUPBY = {"groupby": ["account_id", "general_account_id", "date:month"], "lazy": False}
+
+
+def _project_margin_domain(date_from, date_to, company_id, cost_types):
+    # Per prefix een codebereik: "700" <= code < "701" zijn precies de codes die met 700 beginnen
+    prefixes = [prefix for prefix, _ in cost_types]
+    accounts = ["|"] * (len(prefixes) - 1)
+    for prefix in prefixes:
+        accounts += [
+            "&", ["general_account_id.code", ">=", prefix],
+            ["general_account_id.code", "<", prefix[:-1] + chr(ord(prefix[-1]) + 1)],
+        ]
+    return accounts + [
+        ["date", ">=", date_from],
+        ["date", "<=", date_to],
+        ["company_id", "=", company_id]
+    ]
+
+
+def _project_type(analytic_account):
+    name = (analytic_account[1] if analytic_account else "").lower()
+    return next((label for label, word in PROJECT_TYPES.items() if word in name), "Overig")
+
+
+def _cost_type(code, cost_types):
+    return next((label for prefix, label in cost_types if code.startswith(prefix)), None)
+
+
+def _account_codes(groups):
+    """Rekeningcode per grootboekrekening van de groepen (één query)"""
+    account_ids = sorted({g["general_account_id"][0] for g in groups if g["general_account_id"]})
+    if not account_ids:
+        return {}
+    accounts = odoo_call(
+        "account.account", "search_read",
+        [["id", "in", account_ids]],
+        ["id", "code"]
+    )
+    return {a["id"]: a["code"] or "" for a in accounts}
+
+
+def _margin_rows(groups, cost_types):
+    codes = _account_codes(groups)
+    rows = []
+    for g in groups:
+        account = g["general_account_id"]
+        cost_type = _cost_type(codes.get(account[0], "") if account else "", cost_types)
+        if cost_type is None:
+            continue
+        amount = g["amount"] or 0.0
+        rows.append({
+            "project_type": _project_type(g["account_id"]),
+            "cost_type": cost_type,
+            "date": g["__range"]["date:month"]["from"],
+            # Analytisch is omzet positief en een kost negatief; hier beide als positief bedrag
+            "amount": amount if cost_type == "Omzet" else -amount,
+            "count": g["__count"],
+        })
+    return rows
+
+
+@cached(ttl=300, closed=closed_months, sources=("account.analytic.line", "account.account"))
+def get_project_margin_month(month, company_id=PROJECTS_COMPANY_ID, cost_types=MARGIN_COST_TYPES):
+    """Omzet, materiaal en onderaannemers per projectsoort in één maand (read_group op de analytische regels)"""
+    groups = odoo_call(
+        "account.analytic.line", "read_group",
+        _project_margin_domain(*month_bounds(month), company_id, cost_types),
+        ["amount:sum"],
+        **PROJECT_MARGIN_GROUPBY
+    )
+    return facts(_margin_rows(groups, cost_types), "account.analytic.line")
+
+
+def _project_margin_run(months, company_id=PROJECTS_COMPANY_ID, cost_types=MARGIN_COST_TYPES):
+    groups = odoo_request(
+        "account.analytic.line", "read_group",
+        _project_margin_domain(month_bounds(months[0])[0], month_bounds(months[-1])[1], company_id, cost_types),
+        ["amount:sum"],
+        options=PROJECT_MARGIN_GROUPBY
+    )
+    per_month = {m: [] for m in months}
+    for row in _margin_rows(groups, cost_types):
+        per_month[row["date"][:7]].append(row)
+    return {month: facts(rows, "account.analytic.line") for month, rows in per_month.items()}
+
+
+def get_project_margins(start, end, company_id=PROJECTS_COMPANY_ID, cost_types=MARGIN_COST_TYPES):
+    """Maandpartities van get_project_margin_month voor start t/m end (zie _month_partitions)"""
+    return _month_partitions(get_project_margin_month, _project_margin_run, start, end, company_id, cost_types)
+
+
+@single_flight
+def get_invoice_lines(invoice_id):
+    """Haal factuurregels op voor een specifieke factuur"""
+    return odoo_call(
+        "account.move.line", "search_read",
+        [
+            ["move_id", "=", invoice_id],
+            ["display_type", "in", ["product", False]],
+            ["exclude_from_invoice_tab", "=", False]
+        ],
+        ["product_id", "name", "quantity", "price_unit", "price_subtotal", "tax_ids"]
+    )
+
+@single_flight
+def get_invoice_pdf(invoice_id):
+    """Haal PDF bijlage op voor een factuur (indien beschikbaar)"""
+    attachments = odoo_call(
+        "ir.attachment", "search_read",
+        [
+            ["res_model", "=", "account.move"],
+            ["res_id", "=", invoice_id],
+            ["mimetype", "=", "application/pdf"]
+        ],
+        ["name", "datas"]
+    )
+    return attachments[0] if attachments else None
+
+# Bijlagen per read call bij de bulk PDF export (elke PDF komt base64 over de lijn)
+INVOICE_PDF_BATCH = 10
+
+def invoice_numbers(year, company_id=None, invoice_type=None, state=None, search_term=None):
+    """Alle facturen van een get_invoices filter als [{"id", "name"}], zonder INVOICE_LIMIT
+
+    Voor de PDF export; fouten gaan door naar de aanroeper.
+    """
+    return split_call("account.move", _invoice_domain(year, company_id, invoice_type, state, search_term),
+                      ["name"], owner=threading.get_ident(), order="id")
+
+def invoice_attachments(invoice_ids):
+    """PDF bijlagen van facturen zonder inhoud (res_id, name, checksum); fouten gaan door naar de aanroeper"""
+    return odoo_request(
+        "ir.attachment", "search_read",
+        [
+            ["res_model", "=", "account.move"],
+            ["res_id", "in", list(invoice_ids)],
+            ["mimetype", "=", "application/pdf"]
+        ],
+        ["res_id", "name", "checksum"],
+        options={"order": "id"}
+    )
+
+def iter_attachment_datas(attachment_ids, batch_size=INVOICE_PDF_BATCH):
+    """Inhoud van bijlagen als pagina's [{"id", "datas"}], gelijktijdig via de asyncio client
+
+    Per ronde ODOO_ASYNC_CONCURRENCY read calls van batch_size bijlagen (hoeveel
+    er echt tegelijk bij Odoo liggen bepaalt ODOO_GOVERNOR); de volgende ronde start pas als de aanroeper de vorige pagina's verwerkt
+    heeft, zodat er nooit meer dan één ronde PDF's in het geheugen staat.
+    Fouten gaan door naar de aanroeper.
+    """
+    ids = list(attachment_ids)
+    batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+    owner = threading.get_ident()
+    for start in range(0, len(batches), ODOO_ASYNC_CONCURRENCY):
+        async def gather(part=batches[start:start + ODOO_ASYNC_CONCURRENCY]):
+            return await asyncio.gather(*(
+                odoo_call_async("ir.attachment", "read", batch, ["datas"], owner=owner) for batch in part
+            ))
+        yield from run_sync(gather())
+
+# Ververs alleen wat in Odoo gewijzigd is (lab_changes.py); 0 = uit, dan gelden de ttl's.
+# Pas hier starten: de bewaakte modellen komen uit de @cached functies hierboven
+CHANGE_POLL = int(get_setting("LAB_CHANGE_POLL", 60))
+if CHANGE_POLL and ODOO_API_KEY and isinstance(ODOO_TRANSPORT, HttpTransport):
+    start_change_feed(change_marks, CHANGE_POLL)
+
+# =============================================================================
+# AGGREGATIES (gedeeld door de app en lab_report.py)
+# =============================================================================
+
+def _product_sales(year, company_id):
+    """(regels, aantal-veld): LAB Conceptstore (ID 1) verkoopt via POS, de rest via facturen"""
+    if company_id == 1:
+        return get_pos_product_sales(year, company_id), "qty"
+    return get_product_sales(year, company_id), "quantity"
+
+def product_category_totals(year, company_id=None):
+    """[{Categorie, Omzet, Aantal}] per productcategorie, hoogste omzet eerst"""
+    product_sales, qty_field = _product_sales(year, company_id)
+    product_cats = get_product_categories()
+    cat_data = {}
+    for prod, subtotal, qty in zip(product_sales.column("product_id"),
+                                   product_sales.column("price_subtotal", 0),
+                                   product_sales.column(qty_field, 0)):
+        if prod:
+            cat = product_cats.get(prod[0], [None, "Onbekend"])
+            cat_name = cat[1] if cat else "Onbekend"
+            if cat_name not in cat_data:
+                cat_data[cat_name] = {"Omzet": 0, "Aantal": 0}
+            cat_data[cat_name]["Omzet"] += subtotal
+            cat_data[cat_name]["Aantal"] += qty
+    return [
+        {"Categorie": k, "Omzet": v["Omzet"], "Aantal": v["Aantal"]}
+        for k, v in sorted(cat_data.items(), key=lambda x: -x[1]["Omzet"])
+    ]
+
+def top_product_totals(year, company_id=None, limit=20):
+    """[{Product, Omzet, Aantal}] voor de best verkopende producten"""
+    if company_id != 1:
+        return [{"Product": p["name"], "Omzet": p["omzet"], "Aantal": p["aantal"]}
+                for p in get_top_products(year, company_id, limit=limit)]
+    # POS data per product optellen
+    pos_sales = get_pos_product_sales(year, company_id)
+    prod_data = {}
+    for prod, subtotal, qty in zip(pos_sales.column("product_id"),
+                                   pos_sales.column("price_subtotal", 0),
+                                   pos_sales.column("qty", 0)):
+        if prod:
+            if prod[1] not in prod_data:
+                prod_data[prod[1]] = {"Omzet": 0, "Aantal": 0}
+            prod_data[prod[1]]["Omzet"] += subtotal
+            prod_data[prod[1]]["Aantal"] += qty
+    top_list = sorted(prod_data.items(), key=lambda x: -x[1]["Omzet"])[:limit]
+    return [{"Product": k, "Omzet": v["Omzet"], "Aantal": v["Aantal"]} for k, v in top_list]
+
+def project_margin_totals(start, end, company_id=PROJECTS_COMPANY_ID):
+    """{projectsoort: {"Omzet", "Materiaal", "Onderaannemers", "Marge"}} over de maanden start t/m end"""
+    totals = {}
+    for month in get_project_margins(start, end, company_id):
+        for row in month:
+            per_type = totals.setdefault(row["project_type"], dict.fromkeys(MARGIN_COST_LABELS, 0.0))
+            per_type[row["cost_type"]] += row["amount"]
+    for per_type in totals.values():
+        per_type["Marge"] = per_type["Omzet"] - per_type["Materiaal"] - per_type["Onderaannemers"]
+    return totals
+
+def bank_total(bank_data, company_id=None):
+    """Som van de banksaldi, eventueel alleen van één bedrijf"""
+    if company_id:
+        return sum(b.get("current_statement_balance", 0) for b in bank_data
+                   if b.get("company_id", [None])[0] == company_id)
+    return sum(b.get("current_statement_balance", 0) for b in bank_data)
+
+def cash_positions(company_id=None):
+    """(banksaldo, te ontvangen, te betalen) op dit moment"""
+    bank_data = get_bank_balances()
+    receivables, payables = get_receivables_payables(company_id)
+    return (sum(b.get("current_statement_balance", 0) for b in bank_data),
+            sum(receivables.column("amount_residual", 0)),
+            abs(sum(payables.column("amount_residual", 0))))
+
+def cashflow_forecast(current_bank, current_rec, current_pay, weekly_revenue=50000, weekly_costs=45000,
+                      collection_rate=25, payment_rate=20, weeks=12):
+    """Vereenvoudigde cashflow prognose per week: [{Week, Ontvangsten, Betalingen, Banksaldo}]"""
+    forecast = []
+    balance = current_bank
+    remaining_rec = current_rec
+    remaining_pay = current_pay
+    
+    for week in range(1, weeks + 1):
+        # Ontvangsten
+        collections = remaining_rec * (collection_rate / 100)
+        remaining_rec -= collections
+        inflow = weekly_revenue + collections
+        
+        # Betalingen
+        payments = remaining_pay * (payment_rate / 100)
+        remaining_pay -= payments
+        outflow = weekly_costs + payments
+        
+        # Nieuw saldo
+        balance = balance + inflow - outflow
+        
+        forecast.append({
+            "Week": f"Week {week}",
+            "Ontvangsten": inflow,
+            "Betalingen": outflow,
+            "Banksaldo": balance
+        })
+    return forecast
+
+# =============================================================================
+# GEOCODING HELPER (voor klantenkaart)
+# =============================================================================
+
+# Nederlandse postcodes naar lat/lon (vereenvoudigd - eerste 2 cijfers)
+POSTCODE_COORDS = {
+    "10": (52.3676, 4.9041),   # Amsterdam
+    "11": (52.3676, 4.9041),   # Amsterdam
+    "12": (52.0907, 5.1214),   # Utrecht
+    "13": (52.1561, 4.4858),   # Leiden
+    "14": (52.0116, 4.3571),   # Den Haag
+    "15": (52.0116, 4.3571),   # Den Haag
+    "16": (52.0116, 4.3571),   # Den Haag
+    "17": (51.9225, 4.4792),   # Rotterdam
+    "18": (51.9225, 4.4792),   # Rotterdam
+    "19": (51.9225, 4.4792),   # Rotterdam
+    "20": (51.9225, 4.4792),   # Rotterdam
+    "21": (51.9225, 4.4792),   # Rotterdam
+    "22": (51.9225, 4.4792),   # Rotterdam
+    "23": (51.9225, 4.4792),   # Rotterdam
+    "24": (51.9225, 4.4792),   # Rotterdam
+    "25": (51.9851, 5.8987),   # Nijmegen
+    "26": (51.9851, 5.8987),   # Nijmegen
+    "27": (52.2215, 6.8937),   # Enschede
+    "28": (52.5168, 6.0830),   # Zwolle
+    "29": (52.5168, 6.0830),   # Zwolle
+    "30": (52.0907, 5.1214),   # Utrecht
+    "31": (52.0907, 5.1214),   # Utrecht
+    "32": (52.2215, 6.0833),   # Amersfoort
+    "33": (52.2215, 6.0833),   # Amersfoort
+    "34": (52.0907, 5.1214),   # Utrecht
+    "35": (52.1561, 4.4858),   # Hilversum
+    "36": (52.0907, 5.1214),   # Utrecht
+    "37": (52.2215, 6.0833),   # Amersfoort
+    "38": (52.5200, 5.4700),   # Lelystad
+    "39": (52.2215, 6.0833),   # Amersfoort
+    "40": (51.4416, 5.4697),   # Eindhoven
+    "41": (51.4416, 5.4697),   # Eindhoven
+    "42": (51.4416, 5.4697),   # Eindhoven
+    "43": (51.5555, 5.0913),   # Tilburg
+    "44": (51.5890, 4.7756),   # Breda
+    "45": (51.5890, 4.7756),   # Breda
+    "46": (51.5890, 4.7756),   # Breda
+    "47": (51.5890, 4.7756),   # Breda
+    "48": (51.4416, 5.4697),   # Eindhoven
+    "49": (51.5555, 5.0913),   # Tilburg
+    "50": (51.4416, 5.4697),   # Eindhoven
+    "51": (51.4416, 5.4697),   # Eindhoven
+    "52": (51.4416, 5.4697),   # Eindhoven
+    "53": (51.4416, 5.4697),   # Eindhoven
+    "54": (51.4416, 5.4697),   # Eindhoven
+    "55": (51.4416, 5.4697),   # Eindhoven
+    "56": (51.4416, 5.4697),   # Eindhoven
+    "57": (51.4416, 5.4697),   # Eindhoven
+    "58": (51.4416, 5.4697),   # Eindhoven
+    "59": (51.5555, 5.0913),   # Tilburg
+    "60": (50.8514, 5.6910),   # Maastricht
+    "61": (50.8514, 5.6910),   # Maastricht
+    "62": (50.8514, 5.6910),   # Maastricht
+    "63": (50.8514, 5.6910),   # Maastricht
+    "64": (50.8514, 5.6910),   # Maastricht
+    "65": (51.4427, 6.0608),   # Roermond
+    "66": (51.4427, 6.0608),   # Roermond
+    "67": (51.9851, 5.8987),   # Nijmegen
+    "68": (51.9851, 5.8987),   # Nijmegen
+    "69": (51.9225, 6.0833),   # Arnhem
+    "70": (51.9225, 6.0833),   # Arnhem
+    "71": (51.9851, 5.8987),   # Nijmegen
+    "72": (52.0116, 6.0833),   # Apeldoorn
+    "73": (52.0116, 6.0833),   # Apeldoorn
+    "74": (52.0116, 6.0833),   # Apeldoorn
+    "75": (52.2215, 6.8937),   # Enschede
+    "76": (52.2215, 6.8937),   # Enschede
+    "77": (52.2215, 6.8937),   # Enschede
+    "78": (52.5168, 6.0830),   # Zwolle
+    "79": (52.5168, 6.0830),   # Zwolle
+    "80": (52.5168, 6.0830),   # Zwolle
+    "81": (52.5168, 6.0830),   # Zwolle
+    "82": (52.7792, 6.9004),   # Emmen
+    "83": (52.7792, 6.9004),   # Emmen
+    "84": (53.2194, 6.5665),   # Groningen
+    "85": (53.2194, 6.5665),   # Groningen
+    "86": (53.2194, 6.5665),   # Groningen
+    "87": (53.2194, 6.5665),   # Groningen
+    "88": (53.0000, 5.7500),   # Leeuwarden
+    "89": (53.0000, 5.7500),   # Leeuwarden
+    "90": (53.0000, 5.7500),   # Leeuwarden
+    "91": (53.0000, 5.7500),   # Leeuwarden
+    "92": (53.0000, 5.7500),   # Leeuwarden
+    "93": (53.2194, 6.5665),   # Groningen
+    "94": (53.2194, 6.5665),   # Groningen
+    "95": (53.2194, 6.5665),   # Groningen
+    "96": (53.2194, 6.5665),   # Groningen
+    "97": (53.2194, 6.5665),   # Groningen
+    "98": (53.2194, 6.5665),   # Groningen
+    "99": (53.2194, 6.5665),   # Groningen
+}
+
+def get_coords_from_postcode(postcode):
+    """Haal lat/lon op basis van postcode (eerste 2 cijfers)"""
+    if not postcode:
+        return None, None
+    prefix = str(postcode).strip()[:2]
+    if prefix in POSTCODE_COORDS:
+        return POSTCODE_COORDS[prefix]
+    return None, None
@@ -0,0 +1,229 @@
+"""
+LAB Dashboard exports
+=====================
+Alle geboekte move lines van een jaar (en eventueel één bedrijf) naar een
+gecomprimeerde CSV (.csv.gz) of Parquet bestand, voor accountants die de
+volledige regeldetail willen.
+
+De regels worden per pagina opgehaald (lab_data.iter_ledger_lines, LEDGER_PAGE
+regels per request) en elke pagina wordt direct weggeschreven: in CSV als
+gzip stroom, in Parquet als één row group. Het geheugengebruik hangt dus af
+van de paginagrootte, niet van het aantal regels in het jaar.
+
+Er wordt eerst naar een unieke <tijdelijk>.part in dezelfde map geschreven;
+pas na de laatste pagina krijgt het bestand zijn naam (os.replace). Een
+mislukte export laat geen half bestand achter dat voor compleet kan
+doorgaan, en gelijktijdige exports (andere sessies) zitten elkaar niet in
+de weg.
+
+Parquet vereist pyarrow.
+
+export_invoice_pdfs zet de PDF's van een lijst facturen (het huidige filter
+in het Facturen tab) in één ZIP voor audits. Eerst één call voor de
+bijlagen zonder inhoud; identieke PDF's (zelfde checksum) worden één keer
+opgehaald en opgeslagen. De inhoud komt gelijktijdig binnen via de asyncio
+client (lab_data.iter_attachment_datas) en elke PDF gaat direct de ZIP op
+schijf in. manifest.csv in de ZIP koppelt elke factuur aan zijn bestand.
+"""
+
+import base64
+import csv
+import gzip
+import io
+import os
+import tempfile
+import zipfile
+
+import lab_data
+
+FORMATS = {"csv": ".csv.gz", "parquet": ".parquet"}
+# Optionele packages per formaat
+REQUIRES = {"parquet": "pyarrow"}
+
+COLUMNS = ["Id", "Datum", "Boeking", "Rekening", "Rekeningnaam", "Relatie", "Omschrijving",
+           "Bedrijf", "Debet", "Credit", "Saldo"]
+
+
+def _name(value):
+    return value[1] if value else ""
+
+
+def ledger_rows(page):
+    """Platte exportrijen (lijsten in COLUMNS volgorde) voor één pagina move lines"""
+    for line in page:
+        account = _name(line.get("account_id"))
+        code, _, account_name = account.partition(" ")
+        balance = line.get("balance") or 0.0
+        company = line.get("company_id")
+        yield [
+            line["id"],
+            line.get("date") or "",
+            _name(line.get("move_id")),
+            code,
+            account_name,
+            _name(line.get("partner_id")),
+            line.get("name") or "",
+            lab_data.COMPANIES.get(company[0], company[1]) if company else "",
+            round(max(balance, 0.0), 2),
+            round(max(-balance, 0.0), 2),
+            balance,
+        ]
+
+
+class CsvSink:
+    """gzip CSV, pagina voor pagina"""
+
+    def __init__(self, path):
+        self.file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Parquet met één row group per pagina (pyarrow)"""
+
+    def __init__(self, path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("Id", pa.int64()), ("Datum", pa.string()), ("Boeking", pa.string()),
+            ("Rekening", pa.string()), ("Rekeningnaam", pa.string()), ("Relatie", pa.string()),
+            ("Omschrijving", pa.string()), ("Bedrijf", pa.string()),
+            ("Debet", pa.float64()), ("Credit", pa.float64()), ("Saldo", pa.float64()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        if columns:
+            self.writer.write_table(self.pa.Table.from_arrays(
+                [self.pa.array(c, type=f.type) for c, f in zip(columns, self.schema)], schema=self.schema
+            ))
+
+    def close(self):
+        self.writer.close()
+
+
+SINKS = {"csv": CsvSink, "parquet": ParquetSink}
+
+
+def _partial_file(path):
+    """Nieuw, uniek tijdelijk bestand in de map van path (voor os.replace na afloop)"""
+    fd, partial = tempfile.mkstemp(dir=os.path.dirname(path) or None, suffix=".part")
+    os.close(fd)
+    return partial
+
+
+def ledger_filename(year, company_id=None, fmt="csv"):
+    suffix = f"{year}_{company_id}" if company_id else str(year)
+    return f"lab_grootboek_{suffix}{FORMATS[fmt]}"
+
+
+def export_ledger(path, year, company_id=None, fmt="csv", progress=None, page_size=lab_data.LEDGER_PAGE):
+    """Schrijf alle move lines van het jaar naar path; geeft het aantal regels terug
+
+    progress(geschreven, totaal) wordt na elke pagina aangeroepen (totaal is
+    de telling vooraf; kan afwijken als er tussentijds geboekt wordt).
+    Odoo fouten gaan door naar de aanroeper; er blijft dan geen bestand staan.
+    """
+    total = lab_data.count_ledger_lines(year, company_id) if progress else None
+    partial = _partial_file(path)
+    try:
+        sink = SINKS[fmt](partial)
+    except BaseException:
+        os.remove(partial)
+        raise
+    written = 0
+    try:
+        for page in lab_data.iter_ledger_lines(year, company_id, page_size):
+            sink.write(list(ledger_rows(page)))
+            written += len(page)
+            if progress:
+                progress(written, total)
+        sink.close()
+    except BaseException:
+        sink.close()
+        os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return written
+
+
+def invoice_pdf_filename(year, company_id=None):
+    suffix = f"{year}_{company_id}" if company_id else str(year)
+    return f"lab_facturen_{suffix}.zip"
+
+
+def _pdf_name(name, taken):
+    """Bestandsnaam in de ZIP: geen mappen (INV/2025/0001) en uniek"""
+    base = (name or "factuur").replace("/", "_").replace("\\", "_")
+    stem, ext = os.path.splitext(base)
+    ext = ext if ext.lower() == ".pdf" else ext + ".pdf"
+    candidate, n = stem + ext, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    taken.add(candidate)
+    return candidate
+
+
+def export_invoice_pdfs(path, invoices, progress=None):
+    """ZIP met de PDF bijlagen van invoices (records met id en name, bv. lab_data.invoice_numbers) naar path
+
+    Geeft {"pdfs": opgeslagen bestanden, "duplicates": facturen met een PDF
+    die al in de ZIP stond, "missing": facturen zonder PDF} terug.
+    progress(opgehaald, totaal) na elke ronde PDF's. Odoo fouten gaan door
+    naar de aanroeper; er blijft dan geen bestand staan.
+    """
+    numbers = {inv["id"]: inv.get("name") or str(inv["id"]) for inv in invoices}
+    attachments = lab_data.invoice_attachments(numbers) if numbers else []
+
+    # Eén PDF per factuur (de eerste bijlage), één bestand per checksum
+    per_invoice = {}
+    for attachment in attachments:
+        per_invoice.setdefault(attachment["res_id"], attachment)
+    files, taken, manifest = {}, set(), []
+    for invoice_id, number in numbers.items():
+        attachment = per_invoice.get(invoice_id)
+        if attachment is None:
+            manifest.append([number, "", ""])
+            continue
+        checksum = attachment.get("checksum") or f"bijlage-{attachment['id']}"
+        if checksum not in files:
+            files[checksum] = (attachment["id"], _pdf_name(attachment.get("name"), taken))
+        manifest.append([number, files[checksum][1], checksum])
+    names = dict(files.values())
+
+    partial = _partial_file(path)
+    done = written = 0
+    try:
+        # PDF's zijn al gecomprimeerd: opslaan zonder deflate
+        with zipfile.ZipFile(partial, "w", zipfile.ZIP_STORED) as archive:
+            for page in lab_data.iter_attachment_datas(names):
+                for record in page:
+                    if record.get("datas"):
+                        archive.writestr(names[record["id"]], base64.b64decode(record["datas"]))
+                        written += 1
+                done += len(page)
+                if progress:
+                    progress(done, len(names))
+            text = io.StringIO()
+            csv.writer(text).writerows([["Factuur", "Bestand", "Checksum"]] + manifest)
+            archive.writestr("manifest.csv", text.getvalue(), compress_type=zipfile.ZIP_DEFLATED)
+    except BaseException:
+        os.remove(partial)
+        raise
+    os.replace(partial, path)
+    return {
+        "pdfs": written,
+        "duplicates": len(per_invoice) - len(names),
+        "missing": len(numbers) - len(per_invoice),
+    }
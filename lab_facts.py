@@ -0,0 +1,367 @@
+"""
+LAB Dashboard compacte feitentabellen
+=====================================
+Odoo records herhalen in elke rij het volledige many2one paar, bv.
+account_id: [812, "800000 Product sales"] en company_id: [1, "LAB Conceptstore"].
+In de cache betekent dat miljoenen dubbele lists en strings.
+
+FactTable slaat een resultaat kolomsgewijs op:
+- many2one velden als integer-id kolom (array "q"; 0 = leeg); de namen
+  staan één keer in een gedeelde dimensietabel per (model, veld), want
+  hetzelfde veld kan per model naar een andere relatie wijzen
+  (account.analytic.line.account_id is een analytische rekening)
+- getallen als packed array, herhaalde strings (datums, states)
+  dictionary-encoded, overige waarden als gewone lijst
+
+FactTable.from_batches vult de kolommen batch voor batch uit een stream
+(lab_data.odoo_facts); de records staan dus nooit allemaal tegelijk als
+dicts in het geheugen.
+
+Namen worden pas opgezocht als een rij wordt gelezen; het resultaat
+gedraagt zich als een read-only lijst van dicts, dus bestaande code
+(for r in data: r.get("account_id")[1]) werkt ongewijzigd. Bij pickle
+(cache-backend, warm start) gaan alleen de gebruikte dimensie-entries mee.
+
+Elke FactTable telt als referentie voor de ids in zijn many2one kolommen;
+verdwijnt de laatste tabel die een id gebruikt (bv. na eviction uit de
+cache), dan verdwijnt ook de naam uit de dimensietabel.
+"""
+
+import sys
+import threading
+import weakref
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+# Geschatte bytes per id naast de naam zelf (sleutel plus plek in names en refs)
+ID_OVERHEAD = 120
+
+_dimensions = {}
+_dimensions_lock = threading.Lock()
+
+
+class Dimension:
+    """Gedeelde id → naam tabel voor één many2one veld van één model"""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.names = {}
+        self.refs = Counter()
+        self.nbytes = 0         # geschatte geheugenomvang, bijgehouden bij retain/release
+        self._lock = threading.Lock()
+
+    def retain(self, names):
+        """Neem {id: naam} op en tel één referentie per id"""
+        with self._lock:
+            for record_id, name in names.items():
+                previous = self.names.get(record_id)
+                if previous is None:
+                    self.nbytes += ID_OVERHEAD + sys.getsizeof(name)
+                elif previous != name:
+                    self.nbytes += sys.getsizeof(name) - sys.getsizeof(previous)
+                self.names[record_id] = name
+            self.refs.update(names.keys())
+
+    def release(self, ids):
+        """Eén referentie per id minder; namen zonder referenties verdwijnen"""
+        with self._lock:
+            for record_id in ids:
+                self.refs[record_id] -= 1
+                if self.refs[record_id] <= 0:
+                    del self.refs[record_id]
+                    name = self.names.pop(record_id, None)
+                    if name is not None:
+                        self.nbytes -= ID_OVERHEAD + sys.getsizeof(name)
+
+    def pair(self, record_id):
+        return [record_id, self.names.get(record_id, "")] if record_id else False
+
+
+def dimension(model, field):
+    """De (proces-brede) dimensietabel voor een many2one veld van een model"""
+    key = (model, field)
+    with _dimensions_lock:
+        dim = _dimensions.get(key)
+        if dim is None:
+            dim = _dimensions[key] = Dimension(model, field)
+    return dim
+
+
+def dimensions_nbytes():
+    """Geschatte geheugenomvang van alle dimensietabellen samen (goedkoop: bijgehouden tellers)"""
+    with _dimensions_lock:
+        dims = list(_dimensions.values())
+    return sum(dim.nbytes for dim in dims)
+
+
+def _release(references):
+    for dim, ids in references:
+        dim.release(ids)
+
+
+def _is_many2one(value):
+    return (isinstance(value, list) and len(value) == 2
+            and type(value[0]) is int and isinstance(value[1], str))
+
+
+def _classify(values):
+    """(soort, data) voor één batch van een kolom; strings nog niet dictionary-encoded"""
+    if all(v is False for v in values):
+        return "empty", len(values)
+    if all(v is False or _is_many2one(v) for v in values):
+        ids = array("q")
+        names = {}
+        for v in values:
+            if v is False:
+                ids.append(0)
+            else:
+                ids.append(v[0])
+                names[v[0]] = v[1]
+        return "m2o", (ids, names)
+    if all(type(v) is int for v in values):
+        try:
+            return "int", array("q", values)
+        except OverflowError:
+            return "list", list(values)
+    if all(type(v) in (int, float) for v in values):
+        return "float", array("d", values)
+    if all(type(v) is str for v in values):
+        return "str", values
+    return "list", list(values)
+
+
+def _decode(kind, data):
+    """Waarden van één batch terug als lijst (voor een kolom die een gewone lijst wordt)"""
+    if kind == "empty":
+        return [False] * data
+    if kind == "m2o":
+        ids, names = data
+        return [[i, names[i]] if i else False for i in ids]
+    if kind in ("int", "float"):
+        return data.tolist()
+    return list(data)
+
+
+class _Column:
+    """Kolombuffer voor FactTable.from_batches: elke batch gaat direct in compacte vorm erbij
+
+    Past een batch niet bij de soort tot nu toe, dan wordt de kolom breder:
+    int → float, anders een gewone lijst.
+    """
+
+    def __init__(self):
+        self.kind = "empty"         # tot nu toe alleen False
+        self.data = None
+        self.names = {}
+        self.uniques = {}
+        self.length = 0
+
+    def _to_list(self):
+        if self.kind == "m2o":
+            self.data = [[i, self.names[i]] if i else False for i in self.data]
+        elif self.kind == "str":
+            uniques = list(self.uniques)
+            self.data = [uniques[c] for c in self.data]
+        elif self.kind in ("int", "float"):
+            self.data = self.data.tolist()
+        elif self.kind == "empty":
+            self.data = [False] * self.length
+        self.kind, self.names, self.uniques = "list", {}, {}
+
+    def extend(self, values):
+        kind, data = _classify(values)
+        if self.kind == "empty" and not self.length and kind != "empty":
+            self.kind = kind
+            self.data = {"m2o": array("q"), "int": array("q"), "float": array("d"), "str": array("I")}.get(kind, [])
+        if kind == "empty" and self.kind == "m2o":
+            kind, data = "m2o", (array("q", bytes(8 * data)), {})
+        elif kind == "m2o" and self.kind == "empty":
+            self.kind, self.data = "m2o", array("q", bytes(8 * self.length))
+        elif kind == "float" and self.kind == "int":
+            self.kind, self.data = "float", array("d", self.data)
+        elif kind == "int" and self.kind == "float":
+            kind, data = "float", array("d", data)
+        if kind != self.kind:
+            self._to_list()
+            kind, data = "list", _decode(kind, data)
+
+        if kind == "m2o":
+            ids, names = data
+            self.data.extend(ids)
+            self.names.update(names)
+        elif kind == "str":
+            self.data.extend(self.uniques.setdefault(v, len(self.uniques)) for v in data)
+        elif kind != "empty":
+            self.data.extend(data)
+        self.length += len(values)
+
+    def finish(self):
+        """(soort, data) zoals FactTable ze bewaart"""
+        if self.kind == "str" and len(self.uniques) >= self.length // 2:
+            self._to_list()         # weinig herhaling: dictionary-encoding levert niets op
+        if self.kind == "empty":
+            return "list", [False] * self.length
+        if self.kind == "str":
+            return "str", (list(self.uniques), self.data)
+        return self.kind, self.data
+
+
+class FactTable(Sequence):
+    """Read-only, kolomsgewijze lijst van Odoo records (zie module docstring)"""
+
+    def __init__(self, model, fields, columns, length, names=None):
+        """names: {veld: {id: naam}} voor de many2one kolommen"""
+        self.model = model
+        self.fields = fields
+        self._columns = columns
+        self._length = length
+        self._dimensions = {}
+        references = []
+        for field, field_names in (names or {}).items():
+            dim = self._dimensions[field] = dimension(model, field)
+            dim.retain(field_names)
+            references.append((dim, list(field_names)))
+        if references:
+            weakref.finalize(self, _release, references)
+
+    @classmethod
+    def from_records(cls, model, records):
+        return cls.from_batches(model, [list(records)])
+
+    @classmethod
+    def from_batches(cls, model, batches):
+        """Bouw de tabel batch voor batch (bv. uit lab_data.odoo_stream)
+
+        Alleen de batch die binnenkomt staat als dicts in het geheugen; de
+        kolommen groeien in hun compacte vorm mee.
+        """
+        fields, buffers, length = None, {}, 0
+        for batch in batches:
+            if not batch:
+                continue
+            if fields is None:
+                fields = list(batch[0].keys())
+                buffers = {f: _Column() for f in fields}
+            for f, buffer in buffers.items():
+                buffer.extend([r.get(f, False) for r in batch])
+            length += len(batch)
+        if fields is None:
+            return cls(model, [], {}, 0)
+        columns, names = {}, {}
+        for f, buffer in buffers.items():
+            columns[f] = buffer.finish()
+            if columns[f][0] == "m2o":
+                names[f] = buffer.names
+        return cls(model, fields, columns, length, names)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def nbytes(self):
+        """Geschatte geheugenomvang van de kolommen (de gedeelde dimensietabellen: dimensions_nbytes)"""
+        total = sys.getsizeof(self) + sys.getsizeof(self._columns)
+        for kind, data in self._columns.values():
+            if kind == "str":
+                uniques, codes = data
+                total += sys.getsizeof(codes) + sum(sys.getsizeof(u) for u in uniques)
+            elif kind == "list":
+                total += sys.getsizeof(data) + sum(sys.getsizeof(v) for v in data)
+            else:
+                total += sys.getsizeof(data)
+        return total
+
+    def _decoded(self, field):
+        kind, data = self._columns[field]
+        if kind == "m2o":
+            # Eén (gedeeld) [id, naam] paar per unieke id i.p.v. één per rij
+            pair = self._dimensions[field].pair
+            pairs = {i: pair(i) for i in set(data)}
+            return [pairs[i] for i in data]
+        if kind == "str":
+            uniques, codes = data
+            return [uniques[c] for c in codes]
+        if kind == "list":
+            return data
+        return data.tolist()
+
+    def __iter__(self):
+        columns = [self._decoded(f) for f in self.fields]
+        for values in zip(*columns):
+            yield dict(zip(self.fields, values))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(index)
+        row = {}
+        for field in self.fields:
+            kind, data = self._columns[field]
+            if kind == "m2o":
+                row[field] = self._dimensions[field].pair(data[index])
+            elif kind == "str":
+                row[field] = data[0][data[1][index]]
+            else:
+                row[field] = data[index]
+        return row
+
+    def column(self, field, default=False):
+        """Eén kolom als lijst (many2one als gedeelde [id, naam] paren); default als het veld ontbreekt
+
+        Veel sneller dan over de rijen itereren als je maar een paar velden nodig hebt.
+        """
+        if field not in self._columns:
+            return [default] * self._length
+        return self._decoded(field)
+
+    def ids(self, field):
+        """Ruwe id-kolom van een many2one veld (0 = leeg), zonder namen op te zoeken"""
+        kind, data = self._columns[field]
+        if kind != "m2o":
+            raise KeyError(f"{field} is geen many2one kolom")
+        return data
+
+    def to_frame(self):
+        """DataFrame met many2one velden als id-kolom plus <veld>_name"""
+        import pandas as pd
+
+        frame = {}
+        for field in self.fields:
+            kind, data = self._columns[field]
+            if kind == "m2o":
+                ids = pd.Series(data.tolist() if data else [], dtype="int64")
+                frame[field] = ids
+                frame[f"{field}_name"] = ids.map(self._dimensions[field].names).fillna("")
+            elif kind == "str":
+                uniques, codes = data
+                frame[field] = pd.Categorical.from_codes(list(codes), categories=uniques)
+            else:
+                frame[field] = data.tolist() if isinstance(data, array) else data
+        return pd.DataFrame(frame)
+
+    def __getstate__(self):
+        used = {}
+        for field, dim in self._dimensions.items():
+            names = dim.names
+            used[field] = {i: names[i] for i in set(self._columns[field][1]) if i in names}
+        return {"model": self.model, "fields": self.fields, "columns": self._columns,
+                "length": self._length, "dimensions": used}
+
+    def __setstate__(self, state):
+        self.__init__(state.get("model"), state["fields"], state["columns"], state["length"],
+                      state["dimensions"])
+
+    def __repr__(self):
+        return f"<FactTable {self.model} {self._length} rijen: {', '.join(self.fields)}>"
+
+
+def facts(records, model):
+    """Zet een search_read resultaat van model om naar een FactTable (andere waarden ongewijzigd)"""
+    if isinstance(records, list) and all(isinstance(r, dict) for r in records[:1]):
+        return FactTable.from_records(model, records)
+    return records
@@ -0,0 +1,216 @@
+"""
+LAB Dashboard begrenzing van de belasting op Odoo
+=================================================
+De productie-database van Odoo wordt door het hele bedrijf gebruikt; met
+parallel ophalen (opgesplitste queries, prewarmer, meerdere sessies) mag
+het dashboard die niet overbelasten.
+
+- AdaptiveLimiter: maximaal aantal gelijktijdige RPCs, AIMD-stijl bijgestuurd.
+  Elke call die goed en binnen de latency-grens gaat verhoogt de limiet
+  met 1/limiet (dus +1 per 'ronde'); een timeout, verbindingsfout of te
+  trage call halveert de limiet (hoogstens één keer per DECREASE_INTERVAL).
+- CircuitBreaker: na FAILURE_THRESHOLD fouten binnen FAILURE_WINDOW seconden
+  gaat de breaker open en falen calls direct (CircuitOpen) in plaats van
+  Odoo verder te belasten. Na RESET_AFTER seconden mag één proefcall door;
+  lukt die, dan gaat de breaker weer dicht.
+
+Het dashboard serveert bij een open breaker de laatst bekende cachewaarden
+met een banner over de ouderdom (zie lab_cache), in plaats van nullen.
+
+Governor.slot() is voor gewone (thread) code, Governor.async_slot() voor de
+asyncio client (lab_async.py); beide delen dezelfde limiet en breaker.
+
+De state staat in deze module zodat hij Streamlit reruns overleeft; de
+begrenzing geldt per proces.
+"""
+
+import asyncio
+import collections
+import contextlib
+import threading
+import time
+
+INITIAL_LIMIT = 4
+MIN_LIMIT = 1
+MAX_LIMIT = 16
+LATENCY_LIMIT = 30.0        # seconden; tragere calls gelden als overbelasting
+DECREASE_INTERVAL = 1.0     # gelijktijdige fouten halveren de limiet maar één keer
+QUEUE_TIMEOUT = 120.0       # maximale wachttijd op een vrije plek
+ASYNC_POLL = 0.01           # seconden tussen pogingen van async_slot (blokkeert de event loop niet)
+
+FAILURE_THRESHOLD = 5
+FAILURE_WINDOW = 60.0
+RESET_AFTER = 30.0
+
+
+class CircuitOpen(Exception):
+    """Odoo is (tijdelijk) gemarkeerd als niet beschikbaar; call niet uitgevoerd"""
+
+
+class AdaptiveLimiter:
+    """Begrens het aantal gelijktijdige calls; limiet via additive increase / multiplicative decrease"""
+
+    def __init__(self, initial=INITIAL_LIMIT, minimum=MIN_LIMIT, maximum=MAX_LIMIT,
+                 latency_limit=LATENCY_LIMIT):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_limit = latency_limit
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._decreased_at = 0.0
+
+    def acquire(self, timeout=QUEUE_TIMEOUT):
+        """Wacht op een vrije plek; False na timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, latency, ok=True):
+        """ok=None: plek vrijgeven zonder de limiet bij te sturen (geannuleerde call)"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if ok is None:
+                pass
+            elif ok and latency <= self.latency_limit:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif now - self._decreased_at >= DECREASE_INTERVAL:
+                self.limit = max(self.minimum, self.limit / 2)
+                self._decreased_at = now
+            self._cond.notify_all()
+
+
+class CircuitBreaker:
+    """Closed → open na te veel fouten → half open (één proefcall) → closed"""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, window=FAILURE_WINDOW, reset_after=RESET_AFTER):
+        self.threshold = threshold
+        self.window = window
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._failures = collections.deque()
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """CircuitOpen als de call niet door mag"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open" and time.time() - self.opened_at >= self.reset_after:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpen(f"Odoo niet beschikbaar sinds {time.strftime('%H:%M:%S', time.localtime(self.opened_at))}")
+
+    def record(self, ok):
+        now = time.time()
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+                if ok:
+                    self.state = "closed"
+                    self._failures.clear()
+                else:
+                    self.state, self.opened_at = "open", now
+                return
+            if ok:
+                return
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window:
+                self._failures.popleft()
+            if len(self._failures) >= self.threshold:
+                self.state, self.opened_at = "open", now
+
+
+class Governor:
+    """Limiter + breaker rond elke call naar één upstream
+
+    failure_types: excepties die als overbelasting/uitval tellen (andere
+    excepties, bv. een Odoo validatiefout, tellen als geslaagde call).
+    """
+
+    def __init__(self, failure_types=(), limiter=None, breaker=None):
+        self.failure_types = tuple(failure_types)
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+
+    @contextlib.contextmanager
+    def slot(self, timeout=QUEUE_TIMEOUT):
+        self.breaker.before_call()
+        if not self.limiter.acquire(timeout):
+            self.breaker.record(False)
+            raise CircuitOpen("geen vrije plek binnen de wachttijd")
+        started = time.monotonic()
+        ok = True
+        try:
+            yield
+        except self.failure_types:
+            ok = False
+            raise
+        finally:
+            self.limiter.release(time.monotonic() - started, ok)
+            self.breaker.record(ok)
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self, timeout=QUEUE_TIMEOUT):
+        """slot() voor coroutines: wacht op een vrije plek zonder de event loop te blokkeren
+
+        Een geannuleerde call geeft zijn plek vrij zonder de limiet bij te
+        sturen; alleen als proefcall telt hij als fout (anders blijft de breaker hangen).
+        """
+        self.breaker.before_call()
+        deadline = time.monotonic() + timeout
+        while not self.limiter.acquire(0):
+            if time.monotonic() >= deadline:
+                self.breaker.record(False)
+                raise CircuitOpen("geen vrije plek binnen de wachttijd")
+            try:
+                await asyncio.sleep(ASYNC_POLL)
+            except asyncio.CancelledError:
+                if self.breaker.state == "half_open":
+                    self.breaker.record(False)
+                raise
+        started = time.monotonic()
+        ok = True
+        try:
+            yield
+        except self.failure_types:
+            ok = False
+            raise
+        except asyncio.CancelledError:
+            ok = None
+            raise
+        finally:
+            self.limiter.release(time.monotonic() - started, ok)
+            if ok is not None or self.breaker.state == "half_open":
+                self.breaker.record(bool(ok))
+
+    def snapshot(self):
+        return {
+            "limit": round(self.limiter.limit, 1),
+            "in_flight": self.limiter.in_flight,
+            "circuit": self.breaker.state,
+        }
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(name, failure_types=()):
+    """Governor per upstream; één instantie per proces (overleeft reruns)"""
+    with _governors_lock:
+        governor = _governors.get(name)
+        if governor is None:
+            governor = _governors[name] = Governor(failure_types)
+    return governor
@@ -0,0 +1,223 @@
+"""
+LAB Dashboard load test
+=======================
+Simuleert N gelijktijdige gebruikerssessies die het echte script draaien
+(Streamlit AppTest) tegen de lokale mock Odoo (lab_mock_odoo.py) en meet
+per scenario:
+
+- p50/p95/p99 en maximale rendertijd per scriptrun
+- aantal upstream requests naar Odoo
+- piek RSS van het proces
+- aantal runs met een fout
+
+Bruikbaar als regressie-gate: met --max-p95, --max-requests en/of
+--baseline (+ --tolerance) eindigt het script met exit code 1 als een
+scenario slechter is dan toegestaan.
+
+Gebruik:
+    python lab_loadtest.py --sessions 20 --size 100k --latency-ms 30
+    python lab_loadtest.py --json base.json
+    python lab_loadtest.py --baseline base.json --tolerance 0.25
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+from lab_bench import SCRIPT, _prepare_environment, _print_table
+
+# Scenario's: lege of warme cache, spreiding van de aankomsten (ramp, seconden)
+# en interacties na de eerste run ("entity": andere entiteit, "year": vorig jaar)
+SCENARIOS = {
+    "monday-cold": {"cold": True, "ramp": 0.0, "steps": []},
+    "warm": {"cold": False, "ramp": 0.0, "steps": []},
+    "filters": {"cold": False, "ramp": 2.0, "steps": ["entity", "year"]},
+}
+
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def _rss_bytes():
+    """Huidig resident geheugen; valt terug op de piek sinds start (ru_maxrss)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+class RssSampler:
+    """Meet de piek RSS tijdens een scenario in een achtergrondthread"""
+
+    def __init__(self):
+        self.peak = _rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lab-rss", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def percentile(values, pct):
+    """Percentiel met lineaire interpolatie (zoals numpy's standaard)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _session(index, steps, timeout, samples, errors, lock):
+    """Eén gebruiker: eerste scriptrun plus de interacties uit het scenario"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(SCRIPT, default_timeout=timeout)
+    actions = [None] + steps
+    for action in actions:
+        try:
+            if action == "entity":
+                entity = app.sidebar.selectbox(key="entity")
+                entity.set_value(entity.options[index % len(entity.options)])
+            elif action == "year":
+                year = app.sidebar.selectbox(key="year")
+                year.set_value(int(year.options[min(1, len(year.options) - 1)]))
+            started = time.perf_counter()
+            app.run()
+            elapsed = time.perf_counter() - started
+            failed = bool(app.exception)
+        except Exception:
+            elapsed, failed = None, True
+        with lock:
+            if elapsed is not None:
+                samples.append(elapsed)
+            errors[0] += failed
+        if elapsed is None:
+            return
+
+
+def run_scenario(name, spec, odoo, sessions, timeout):
+    import lab_cache
+
+    samples, errors, lock = [], [0], threading.Lock()
+    if spec["cold"]:
+        lab_cache.clear_all(closed=True)
+    else:
+        _session(0, [], timeout, [], [0], lock)     # opwarmen, niet gemeten
+    requests_before = odoo.stats["__requests"]
+    threads = [
+        threading.Thread(target=_session, name=f"lab-session-{i}",
+                         args=(i, spec["steps"], timeout, samples, errors, lock))
+        for i in range(sessions)
+    ]
+    started = time.perf_counter()
+    with RssSampler() as rss:
+        for i, thread in enumerate(threads):
+            if spec["ramp"] and i:
+                time.sleep(spec["ramp"] / sessions)
+            thread.start()
+        for thread in threads:
+            thread.join()
+    ms = [s * 1000 for s in samples]
+    return {
+        "scenario": name,
+        "sessions": sessions,
+        "runs": len(samples),
+        "errors": errors[0],
+        "p50_ms": round(percentile(ms, 50), 1),
+        "p95_ms": round(percentile(ms, 95), 1),
+        "p99_ms": round(percentile(ms, 99), 1),
+        "max_ms": round(max(ms, default=0.0), 1),
+        "wall_s": round(time.perf_counter() - started, 2),
+        "requests": odoo.stats["__requests"] - requests_before,
+        "peak_rss_mb": round(rss.peak / 2**20, 1),
+    }
+
+
+def check_gates(results, max_p95=None, max_requests=None, baseline=None, tolerance=0.2):
+    """Lijst van overschrijdingen; leeg betekent geslaagd"""
+    failures = []
+    previous = {r["scenario"]: r for r in (baseline or [])}
+    for r in results:
+        name = r["scenario"]
+        if r["errors"]:
+            failures.append(f"{name}: {r['errors']} runs met een fout")
+        if max_p95 is not None and r["p95_ms"] > max_p95:
+            failures.append(f"{name}: p95 {r['p95_ms']} ms > {max_p95} ms")
+        if max_requests is not None and r["requests"] > max_requests:
+            failures.append(f"{name}: {r['requests']} upstream requests > {max_requests}")
+        base = previous.get(name)
+        if not base:
+            continue
+        for metric in ("p95_ms", "requests", "peak_rss_mb"):
+            limit = base[metric] * (1 + tolerance)
+            if r[metric] > limit:
+                failures.append(f"{name}: {metric} {r[metric]} > baseline {base[metric]} (+{tolerance:.0%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test: N gelijktijdige dashboard sessies tegen de mock Odoo")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--size", default="100k", help="aantal boekingsregels in de mock")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--row-latency-us", type=float, default=0.0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="komma-gescheiden scenario namen")
+    parser.add_argument("--timeout", type=float, default=600, help="maximale duur van één scriptrun (s)")
+    parser.add_argument("--max-p95", type=float, help="gate: maximale p95 rendertijd (ms)")
+    parser.add_argument("--max-requests", type=int, help="gate: maximaal aantal upstream requests per scenario")
+    parser.add_argument("--baseline", help="gate: eerdere --json uitvoer om tegen te vergelijken")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="toegestane verslechtering t.o.v. baseline")
+    parser.add_argument("--json", help="schrijf resultaten als JSON naar dit bestand")
+    args = parser.parse_args()
+
+    _prepare_environment()
+    from lab_mock_odoo import MockOdoo, generate_dataset, parse_size, serve
+
+    odoo = MockOdoo(generate_dataset(parse_size(args.size), seed=args.seed), latency_ms=args.latency_ms,
+                    row_latency_us=args.row_latency_us, seed=args.seed)
+    server, url = serve(odoo)
+    os.environ["LAB_ODOO_URL"] = url
+    results = []
+    try:
+        for name in args.scenarios.split(","):
+            results.append(run_scenario(name, SCENARIOS[name], odoo, args.sessions, args.timeout))
+            print(f"{name}: p95 {results[-1]['p95_ms']} ms", file=sys.stderr)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    failures = check_gates(results, args.max_p95, args.max_requests, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+LAB Dashboard instrumentatie
+============================
+Meet elke Odoo RPC (latency, bytes, rijen, afgekapt op limit) en elke
+gecachte datafunctie (hit/stale/miss, rekentijd). De cijfers zijn zichtbaar
+in het debug paneel in de sidebar en worden als JSON regels gelogd op de
+logger "lab.perf" (naar een bestand via LAB_PERF_LOG=/pad/naar/perf.jsonl).
+"""
+
+import collections
+import contextlib
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+RECENT_MAX = 500
+
+logger = logging.getLogger("lab.perf")
+
+_lock = threading.Lock()
+_seq = itertools.count(1)
+_recent = collections.deque(maxlen=RECENT_MAX)
+_rpc_totals = {}
+_cache_totals = {}
+
+
+def _emit(event):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(event, default=str))
+
+
+def configure_log(path):
+    """Schrijf de structured log (JSON lines) naar path"""
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def mark():
+    """Volgnummer om 'events sinds nu' op te vragen (bv. het begin van een rerun)"""
+    with _lock:
+        return next(_seq)
+
+
+def record_rpc(model, method, duration, nbytes=0, rows=None, limit=None, error=None, thread=None):
+    """Registreer één Odoo RPC (thread: toeschrijven aan een andere thread, bv. bij opgesplitste calls)"""
+    truncated = bool(limit and rows is not None and rows >= limit)
+    event = {
+        "type": "rpc", "ts": time.time(), "thread": thread or threading.get_ident(),
+        "model": model, "method": method, "ms": round(duration * 1000, 1),
+        "bytes": nbytes, "rows": rows, "limit": limit, "truncated": truncated,
+        "error": error,
+    }
+    with _lock:
+        event["seq"] = next(_seq)
+        _recent.append(event)
+        totals = _rpc_totals.setdefault(f"{model}.{method}", {
+            "calls": 0, "errors": 0, "truncated": 0, "ms": 0.0, "max_ms": 0.0,
+            "bytes": 0, "rows": 0,
+        })
+        totals["calls"] += 1
+        totals["errors"] += bool(error)
+        totals["truncated"] += truncated
+        totals["ms"] += event["ms"]
+        totals["max_ms"] = max(totals["max_ms"], event["ms"])
+        totals["bytes"] += nbytes
+        totals["rows"] += rows or 0
+    _emit(event)
+
+
+def record_cache(name, outcome, duration=None, age=None):
+    """Registreer een cache lookup: hit, stale, shared, closed, miss, refresh, fallback
+    (oude waarde na een mislukte fetch), unavailable (mislukt, geen oude waarde),
+    prime (waarde opgeslagen uit een gecombineerde query) of evict (uit het
+    geheugen verwijderd vanwege het geheugenbudget)
+
+    age: leeftijd in seconden van de geserveerde waarde (stale/fallback)
+    """
+    event = {
+        "type": "cache", "ts": time.time(), "thread": threading.get_ident(),
+        "function": name, "outcome": outcome,
+        "ms": round(duration * 1000, 1) if duration is not None else None,
+        "age": round(age, 1) if age is not None else None,
+    }
+    with _lock:
+        event["seq"] = next(_seq)
+        _recent.append(event)
+        totals = _cache_totals.setdefault(name, collections.Counter())
+        totals[outcome] += 1
+        if duration is not None:
+            totals["compute_ms"] += event["ms"]
+    _emit(event)
+
+
+@contextlib.contextmanager
+def section(name):
+    """Meet de rendertijd van een deel van de pagina (bv. één tab)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        event = {
+            "type": "render", "ts": time.time(), "thread": threading.get_ident(),
+            "section": name, "ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        with _lock:
+            event["seq"] = next(_seq)
+            _recent.append(event)
+        _emit(event)
+
+
+def recent(since=None, thread=None):
+    """Recente events, optioneel alleen na mark() en/of van één thread"""
+    with _lock:
+        events = list(_recent)
+    return [e for e in events
+            if (since is None or e["seq"] > since) and (thread is None or e["thread"] == thread)]
+
+
+def rpc_summary():
+    """Totalen per model.method, gesorteerd op totale tijd"""
+    with _lock:
+        rows = [dict(call=k, **v) for k, v in _rpc_totals.items()]
+    for r in rows:
+        r["avg_ms"] = round(r["ms"] / r["calls"], 1) if r["calls"] else 0.0
+    return sorted(rows, key=lambda r: -r["ms"])
+
+
+def cache_summary():
+    """Hit/miss tellingen per gecachte functie"""
+    with _lock:
+        rows = [dict(function=k, **v) for k, v in _cache_totals.items()]
+    for r in rows:
+        served = sum(r.get(k, 0) for k in ("hit", "stale", "shared", "closed", "fallback"))
+        lookups = served + r.get("miss", 0)
+        r["hit_ratio"] = round(served / lookups, 3) if lookups else 0.0
+    return sorted(rows, key=lambda r: r["function"])
+
+
+def reset():
+    with _lock:
+        _recent.clear()
+        _rpc_totals.clear()
+        _cache_totals.clear()
+
+
+if os.environ.get("LAB_PERF_LOG"):
+    configure_log(os.environ["LAB_PERF_LOG"])
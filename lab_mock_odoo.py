@@ -0,0 +1,811 @@
+"""
+LAB Dashboard mock Odoo server
+==============================
+Lokale JSON-RPC server die het /jsonrpc execute_kw protocol spreekt voor de
+modellen die het dashboard gebruikt, met een seeded generator voor
+synthetische grootboeken van 10k tot 5M regels. Bedoeld voor benchmarks en
+load tests zonder de productie-Odoo te belasten.
+
+Ondersteund:
+- search_read, search, search_count, read, read_group
+- write (zet write_date; om wijzigingen voor de change feed te simuleren)
+- domeinen met &, |, ! en gepunte paden (account_id.code, move_id.move_type)
+- offset/limit/order (paging)
+- configureerbare latency: vast + jitter + per teruggegeven rij
+
+Gebruik:
+    python lab_mock_odoo.py --lines 100000 --port 8069 --latency-ms 40
+    LAB_ODOO_URL=http://127.0.0.1:8069/jsonrpc ODOO_API_KEY=mock streamlit run lab_dashboard.py
+"""
+
+import argparse
+import base64
+import collections
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# SCHEMA
+# =============================================================================
+
+# Veldtypes: char, int, float, bool, date, datetime, m2o:<model>, m2m
+SCHEMA = {
+    "res.company": {
+        "name": "char", "fiscalyear_lock_date": "date",
+    },
+    "res.country": {
+        "name": "char",
+    },
+    "res.partner": {
+        "name": "char", "street": "char", "zip": "char", "city": "char",
+        "country_id": "m2o:res.country",
+    },
+    "account.account": {
+        "code": "char", "name": "char", "account_type": "char",
+        "company_id": "m2o:res.company",
+    },
+    "account.journal": {
+        "name": "char", "code": "char", "type": "char",
+        "company_id": "m2o:res.company", "default_account_id": "m2o:account.account",
+        "current_statement_balance": "float",
+    },
+    "product.category": {
+        "name": "char",
+    },
+    "product.product": {
+        "name": "char", "categ_id": "m2o:product.category",
+    },
+    "account.move": {
+        "name": "char", "ref": "char", "move_type": "char", "state": "char",
+        "date": "date", "invoice_date": "date", "partner_id": "m2o:res.partner",
+        "company_id": "m2o:res.company", "amount_total": "float",
+        "amount_residual": "float", "write_date": "datetime",
+    },
+    "account.move.line": {
+        "name": "char", "date": "date", "move_id": "m2o:account.move",
+        "account_id": "m2o:account.account", "company_id": "m2o:res.company",
+        "partner_id": "m2o:res.partner", "product_id": "m2o:product.product",
+        "balance": "float", "amount_residual": "float", "quantity": "float",
+        "price_unit": "float", "price_subtotal": "float", "parent_state": "char",
+        "display_type": "char", "exclude_from_invoice_tab": "bool",
+        "tax_ids": "m2m", "write_date": "datetime",
+    },
+    "account.analytic.account": {
+        "name": "char", "company_id": "m2o:res.company",
+    },
+    "account.analytic.line": {
+        "name": "char", "date": "date", "account_id": "m2o:account.analytic.account",
+        "general_account_id": "m2o:account.account", "move_line_id": "m2o:account.move.line",
+        "partner_id": "m2o:res.partner", "product_id": "m2o:product.product",
+        "amount": "float", "company_id": "m2o:res.company",
+    },
+    "pos.order": {
+        "name": "char", "date_order": "datetime", "amount_total": "float",
+        "state": "char", "company_id": "m2o:res.company",
+    },
+    "pos.order.line": {
+        "order_id": "m2o:pos.order", "product_id": "m2o:product.product",
+        "qty": "float", "price_subtotal": "float", "price_subtotal_incl": "float",
+        "company_id": "m2o:res.company",
+    },
+    "ir.attachment": {
+        "name": "char", "res_model": "char", "res_id": "int", "mimetype": "char",
+        "datas": "char", "checksum": "char",
+    },
+}
+
+COMPANY_NAMES = {1: "LAB Conceptstore", 2: "LAB Shops", 3: "LAB Projects"}
+
+# Analytische rekeningen (projectsoorten) van LAB Projects en hun aandeel in de boekingen
+PROJECT_ACCOUNTS = [("Verfprojecten", 0.74), ("Behangprojecten", 0.26)]
+
+ACCOUNTS = [
+    # (code, name, account_type, soort)
+    ("400000", "Gross wages", "expense", "cost"),
+    ("400100", "Holiday allowance", "expense", "cost"),
+    ("403000", "Employer's share of pensions", "expense", "cost"),
+    ("410000", "Property rental", "expense", "cost"),
+    ("411000", "Electricity", "expense", "cost"),
+    ("420000", "Car leasing", "expense", "cost"),
+    ("421000", "Fuel costs", "expense", "cost"),
+    ("430000", "Office supplies", "expense", "cost"),
+    ("431000", "Software", "expense", "cost"),
+    ("440000", "Advertising costs", "expense", "cost"),
+    ("450000", "Accountant costs", "expense", "cost"),
+    ("460000", "Bank charges", "expense", "cost"),
+    ("470000", "Interest expenses", "expense", "cost"),
+    ("480000", "Depreciation of computer equipment", "expense", "cost"),
+    ("700000", "Cost of goods sold", "expense_direct_cost", "cost"),
+    ("701000", "Cost of materials", "expense_direct_cost", "cost"),
+    ("702000", "Subcontracting", "expense_direct_cost", "cost"),
+    ("800000", "Product sales", "income", "revenue"),
+    ("801000", "Service revenue", "income", "revenue"),
+    ("802000", "Other revenue", "income", "revenue"),
+    ("110000", "Bank", "asset_cash", "bank"),
+    ("110100", "Bank", "asset_cash", "bank"),
+    ("120000", "Intercompany receivables", "asset_current", "rc"),
+    ("140000", "Intercompany payables", "liability_current", "rc"),
+    ("130000", "Accounts receivable", "asset_receivable", "receivable"),
+    ("160000", "Accounts payable", "liability_payable", "payable"),
+]
+
+PRODUCT_CATEGORIES = ["Verf", "Behang", "Accessoires", "Gereedschap", "Meubels",
+                      "Verlichting", "Textiel", "Diensten"]
+
+CITIES = [("1012", "Amsterdam"), ("3011", "Rotterdam"), ("2511", "Den Haag"),
+          ("3511", "Utrecht"), ("5611", "Eindhoven"), ("9711", "Groningen"),
+          ("6811", "Arnhem"), ("4811", "Breda"), ("8011", "Zwolle"), ("6211", "Maastricht")]
+
+MONTHS = ["January", "February", "March", "April", "May", "June", "July",
+          "August", "September", "October", "November", "December"]
+
+
+class OdooFault(Exception):
+    """Fout die als JSON-RPC error teruggaat (zoals Odoo's 'Odoo Server Error')"""
+
+
+# =============================================================================
+# GENERATOR
+# =============================================================================
+
+def _frame(columns):
+    df = pd.DataFrame(columns)
+    df.index = df["id"].to_numpy()
+    return df
+
+
+def generate_dataset(n_lines=10_000, seed=42, start_year=2023, today=None):
+    """Genereer een reproduceerbaar grootboek met n_lines boekingsregels"""
+    rng = np.random.default_rng(seed)
+    today = pd.Timestamp(today or date.today()).normalize()
+    start = pd.Timestamp(f"{start_year}-01-01")
+    span_days = max(1, (today - start).days + 1)
+    tables = {}
+
+    company_ids = np.array(list(COMPANY_NAMES.keys()), dtype=np.int32)
+    tables["res.company"] = _frame({
+        "id": company_ids,
+        "name": list(COMPANY_NAMES.values()),
+        "fiscalyear_lock_date": pd.to_datetime([f"{today.year - 1}-12-31"] * len(company_ids)),
+    })
+    tables["res.country"] = _frame({"id": [166], "name": ["Netherlands"]})
+
+    # Rekeningen: per bedrijf een eigen set (id = bedrijf * 1000 + volgnummer)
+    acc_rows = []
+    for cid in company_ids:
+        for i, (code, name, acc_type, kind) in enumerate(ACCOUNTS):
+            acc_rows.append((int(cid) * 1000 + i, code, name, acc_type, int(cid), kind))
+    accounts = pd.DataFrame(acc_rows, columns=["id", "code", "name", "account_type", "company_id", "kind"])
+    accounts.index = accounts["id"].to_numpy()
+    tables["account.account"] = accounts
+
+    journal_rows = []
+    jid = 1
+    for cid in company_ids:
+        for code, name, kind in (("110000", "Bank", "bank"), ("110100", "ING Zakelijk", "bank"),
+                                 ("120000", f"R/C {COMPANY_NAMES[(cid % 3) + 1]}", "rc"),
+                                 ("140000", f"R/C {COMPANY_NAMES[((cid + 1) % 3) + 1]}", "rc")):
+            acc = accounts[(accounts["company_id"] == cid) & (accounts["code"] == code)]["id"].iloc[0]
+            journal_rows.append((jid, name, f"BNK{jid}", "bank", int(cid), int(acc),
+                                 round(float(rng.normal(50_000, 40_000)), 2)))
+            jid += 1
+    tables["account.journal"] = _frame(dict(zip(
+        ["id", "name", "code", "type", "company_id", "default_account_id", "current_statement_balance"],
+        zip(*journal_rows))))
+
+    n_partners = int(min(50_000, max(200, n_lines // 100)))
+    city_idx = rng.integers(0, len(CITIES), n_partners)
+    tables["res.partner"] = _frame({
+        "id": np.arange(1, n_partners + 1, dtype=np.int32),
+        "name": [f"{'Klant' if i % 4 else 'Leverancier'} {i:05d}" for i in range(1, n_partners + 1)],
+        "street": [f"Dorpsstraat {i % 200 + 1}" for i in range(n_partners)],
+        "zip": [f"{CITIES[c][0][:2]}{rng.integers(10, 99)} AB" for c in city_idx],
+        "city": [CITIES[c][1] for c in city_idx],
+        "country_id": np.full(n_partners, 166, dtype=np.int32),
+    })
+
+    tables["product.category"] = _frame({
+        "id": np.arange(1, len(PRODUCT_CATEGORIES) + 1, dtype=np.int32),
+        "name": PRODUCT_CATEGORIES,
+    })
+    n_products = 500
+    categ = rng.integers(1, len(PRODUCT_CATEGORIES) + 1, n_products).astype(np.int32)
+    tables["product.product"] = _frame({
+        "id": np.arange(1, n_products + 1, dtype=np.int32),
+        "name": [f"{PRODUCT_CATEGORIES[c - 1]} artikel {i:03d}" for i, c in enumerate(categ, 1)],
+        "categ_id": categ,
+    })
+
+    # Facturen / boekingen
+    n_moves = int(max(100, n_lines // 4))
+    move_ids = np.arange(1, n_moves + 1, dtype=np.int32)
+    move_type = rng.choice(np.array(["out_invoice", "in_invoice", "out_refund", "in_refund"]),
+                           n_moves, p=[0.55, 0.35, 0.05, 0.05])
+    move_company = rng.choice(company_ids, n_moves, p=[0.5, 0.2, 0.3]).astype(np.int32)
+    move_date = start + pd.to_timedelta(rng.integers(0, span_days, n_moves), unit="D")
+    move_state = np.where(rng.random(n_moves) < 0.92, "posted", "draft")
+    amount_total = np.round(rng.lognormal(6.5, 1.0, n_moves), 2)
+    open_mask = rng.random(n_moves) < 0.2
+    prefix = np.where(np.char.startswith(move_type.astype(str), "out"), "INV", "BILL")
+    years = move_date.year.to_numpy()
+    tables["account.move"] = _frame({
+        "id": move_ids,
+        "name": [f"{p}/{y}/{i:06d}" for p, y, i in zip(prefix, years, move_ids)],
+        "ref": np.where(rng.random(n_moves) < 0.3, "PO-" + pd.Series(move_ids).astype(str), ""),
+        "move_type": move_type,
+        "state": move_state,
+        "date": move_date,
+        "invoice_date": move_date,
+        "partner_id": rng.integers(1, n_partners + 1, n_moves).astype(np.int32),
+        "company_id": move_company,
+        "amount_total": amount_total,
+        "amount_residual": np.where(open_mask, amount_total, 0.0),
+        "write_date": move_date + pd.to_timedelta(rng.integers(8 * 3600, 20 * 3600, n_moves), unit="s"),
+    })
+
+    # Boekingsregels: omzet, kosten, debiteuren, crediteuren
+    kinds = np.array(["revenue", "cost", "receivable", "payable"])
+    line_kind = rng.choice(kinds, n_lines, p=[0.35, 0.40, 0.125, 0.125])
+    out_moves = np.flatnonzero(np.char.startswith(move_type.astype(str), "out"))
+    in_moves = np.flatnonzero(~np.char.startswith(move_type.astype(str), "out"))
+    is_out = (line_kind == "revenue") | (line_kind == "receivable")
+    move_idx = np.where(is_out,
+                        out_moves[rng.integers(0, len(out_moves), n_lines)],
+                        in_moves[rng.integers(0, len(in_moves), n_lines)])
+    line_company = move_company[move_idx]
+
+    account_local = np.zeros(n_lines, dtype=np.int32)
+    for kind in kinds:
+        options = np.array([i for i, a in enumerate(ACCOUNTS) if a[3] == kind])
+        mask = line_kind == kind
+        account_local[mask] = options[rng.integers(0, len(options), int(mask.sum()))]
+    amount = np.round(rng.lognormal(5.0, 1.1, n_lines), 2)
+    sign = np.select([line_kind == "revenue", line_kind == "payable"], [-1.0, -1.0], 1.0)
+    balance = amount * sign
+    has_product = line_kind == "revenue"
+    quantity = np.where(has_product | (line_kind == "cost"), rng.integers(1, 10, n_lines), 1).astype(np.float64)
+    is_counterpart = (line_kind == "receivable") | (line_kind == "payable")
+    residual = np.where(is_counterpart & (rng.random(n_lines) < 0.2), balance, 0.0)
+    line_date = move_date[move_idx]
+    tables["account.move.line"] = _frame({
+        "id": np.arange(1, n_lines + 1, dtype=np.int32),
+        "date": line_date,
+        "move_id": move_ids[move_idx],
+        "account_id": (line_company * 1000 + account_local).astype(np.int32),
+        "company_id": line_company,
+        "partner_id": tables["account.move"]["partner_id"].to_numpy()[move_idx],
+        "product_id": np.where(has_product, rng.integers(1, n_products + 1, n_lines), 0).astype(np.int32),
+        "balance": balance,
+        "amount_residual": residual,
+        "quantity": quantity,
+        "price_subtotal": np.where(is_counterpart, 0.0, amount),
+        "parent_state": pd.Categorical(move_state[move_idx]),
+        "display_type": pd.Categorical(np.where(is_counterpart, "payment_term", "product")),
+        "exclude_from_invoice_tab": is_counterpart,
+        "write_date": line_date + pd.to_timedelta(rng.integers(8 * 3600, 20 * 3600, n_lines), unit="s"),
+    })
+
+    # Analytische regels: LAB Projects boekt omzet en directe kosten (70*, 8*) per projectsoort
+    tables["account.analytic.account"] = _frame({
+        "id": np.arange(1, len(PROJECT_ACCOUNTS) + 1, dtype=np.int32),
+        "name": [name for name, _ in PROJECT_ACCOUNTS],
+        "company_id": np.full(len(PROJECT_ACCOUNTS), 3, dtype=np.int32),
+    })
+    lines = tables["account.move.line"]
+    codes = accounts["code"].reindex(lines["account_id"].to_numpy()).to_numpy()
+    analytic = lines[(lines["company_id"].to_numpy() == 3) & (lines["parent_state"] == "posted").to_numpy()
+                     & (np.char.startswith(codes.astype(str), "70") | np.char.startswith(codes.astype(str), "8"))]
+    # Eén projectsoort per boeking
+    move_project = rng.choice(np.arange(1, len(PROJECT_ACCOUNTS) + 1, dtype=np.int32), n_moves + 1,
+                              p=[share for _, share in PROJECT_ACCOUNTS])
+    tables["account.analytic.line"] = _frame({
+        "id": np.arange(1, len(analytic) + 1, dtype=np.int32),
+        "date": analytic["date"].to_numpy(),
+        "account_id": move_project[analytic["move_id"].to_numpy()],
+        "general_account_id": analytic["account_id"].to_numpy(),
+        "move_line_id": analytic["id"].to_numpy(),
+        "partner_id": analytic["partner_id"].to_numpy(),
+        "product_id": analytic["product_id"].to_numpy(),
+        "amount": -analytic["balance"].to_numpy(),
+        "company_id": analytic["company_id"].to_numpy(),
+    })
+    tables["account.analytic.line"]["name"] = pd.Series(
+        tables["account.move"]["name"].reindex(analytic["move_id"].to_numpy()).to_numpy(),
+        index=tables["account.analytic.line"].index)
+
+    # Kassa (alleen LAB Conceptstore)
+    n_pos = int(max(50, n_lines // 20))
+    pos_ids = np.arange(1, n_pos + 1, dtype=np.int32)
+    pos_dates = start + pd.to_timedelta(rng.integers(0, span_days * 86400, n_pos), unit="s")
+    pos_amount = np.round(rng.lognormal(3.5, 0.8, n_pos), 2)
+    tables["pos.order"] = _frame({
+        "id": pos_ids,
+        "name": [f"POS/{i:07d}" for i in pos_ids],
+        "date_order": pos_dates,
+        "amount_total": pos_amount,
+        "state": rng.choice(np.array(["paid", "done", "invoiced"]), n_pos, p=[0.2, 0.7, 0.1]),
+        "company_id": np.ones(n_pos, dtype=np.int32),
+    })
+    n_pos_lines = n_pos * 2
+    order_of_line = np.repeat(pos_ids, 2)
+    subtotal = np.round(np.repeat(pos_amount, 2) / 2 / 1.21, 2)
+    tables["pos.order.line"] = _frame({
+        "id": np.arange(1, n_pos_lines + 1, dtype=np.int32),
+        "order_id": order_of_line,
+        "product_id": rng.integers(1, n_products + 1, n_pos_lines).astype(np.int32),
+        "qty": rng.integers(1, 4, n_pos_lines).astype(np.float64),
+        "price_subtotal": subtotal,
+        "price_subtotal_incl": np.round(subtotal * 1.21, 2),
+        "company_id": np.ones(n_pos_lines, dtype=np.int32),
+    })
+
+    # PDF bijlagen: één per factuur, ~5% met dezelfde inhoud als een andere factuur
+    content_id = np.where(rng.random(n_moves) < 0.05, rng.integers(1, n_moves + 1, n_moves), move_ids)
+    tables["ir.attachment"] = _frame({
+        "id": move_ids,
+        "res_model": pd.Categorical(["account.move"] * n_moves),
+        "res_id": move_ids,
+        "mimetype": pd.Categorical(["application/pdf"] * n_moves),
+        "content_id": content_id.astype(np.int32),
+    })
+
+    return tables
+
+
+# =============================================================================
+# MOCK ODOO
+# =============================================================================
+
+def _fake_pdf(content_id):
+    return (b"%PDF-1.4\n1 0 obj << /Type /Catalog >> endobj\n"
+            + f"% LAB mock factuur {content_id}\n".encode() + b"%%EOF\n")
+
+
+class MockOdoo:
+    """In-memory Odoo met execute_kw semantiek op pandas tabellen"""
+
+    def __init__(self, tables, latency_ms=0.0, jitter_ms=0.0, row_latency_us=0.0, seed=0):
+        self.tables = tables
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.row_latency_us = row_latency_us
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+        # write_date voor records die niet (meer) in de generator zitten: laadmoment
+        self.loaded_at = pd.Timestamp.now().floor("s")
+        self.computed = {
+            ("account.account", "display_name"): lambda df: df["code"] + " " + df["name"],
+            ("account.move.line", "name"): lambda df: self._related(df["move_id"], "account.move", "name"),
+            ("account.move.line", "price_unit"): lambda df: (df["price_subtotal"] / df["quantity"]).round(2),
+            ("ir.attachment", "name"): lambda df: self._related(df["res_id"], "account.move", "name") + ".pdf",
+            ("ir.attachment", "datas"): lambda df: df["content_id"].map(
+                lambda c: base64.b64encode(_fake_pdf(c)).decode()),
+            ("ir.attachment", "checksum"): lambda df: df["content_id"].map(
+                lambda c: hashlib.sha1(_fake_pdf(c)).hexdigest()),
+        }
+
+    # -------------------------------------------------------------------------
+    # Velden en domeinen
+    # -------------------------------------------------------------------------
+
+    def _table(self, model):
+        if model not in self.tables:
+            raise OdooFault(f"Object {model} doesn't exist")
+        return self.tables[model]
+
+    def _field_type(self, model, field):
+        if field == "id":
+            return "int"
+        if field == "display_name":
+            return "char"
+        if field == "write_date":
+            return "datetime"
+        try:
+            return SCHEMA[model][field]
+        except KeyError:
+            raise OdooFault(f"Invalid field {field!r} on model {model!r}")
+
+    def _column(self, model, df, field):
+        """Kolom (als Series op df.index) voor een veld, incl. computed velden"""
+        self._field_type(model, field)
+        if field in df.columns:
+            return df[field]
+        if (model, field) in self.computed:
+            return pd.Series(self.computed[(model, field)](df), index=df.index)
+        if field == "display_name":
+            return df["name"]
+        if field == "write_date":
+            return pd.Series(self.loaded_at, index=df.index)
+        raise OdooFault(f"Field {field!r} on {model!r} is not stored in the mock")
+
+    def _related(self, ids, model, field):
+        """Waarde van model.field voor een Series met ids (0 = leeg)"""
+        table = self._table(model)
+        values = self._column(model, table, field)
+        return pd.Series(values.reindex(ids.to_numpy()).to_numpy(), index=ids.index)
+
+    def _resolve(self, model, df, path):
+        """Volg een gepunt pad (account_id.code) en geef (Series, veldtype)"""
+        parts = path.split(".")
+        series = None
+        current_model = model
+        for i, part in enumerate(parts):
+            ftype = self._field_type(current_model, part)
+            if series is None:
+                series = self._column(current_model, df, part)
+            else:
+                series = self._related(series, current_model, part)
+            if i < len(parts) - 1:
+                if not ftype.startswith("m2o:"):
+                    raise OdooFault(f"Cannot traverse non-relational field {part!r}")
+                current_model = ftype[4:]
+        return series, ftype
+
+    def _coerce(self, ftype, value):
+        if isinstance(value, (list, tuple)):
+            return [self._coerce(ftype, v) for v in value]
+        if value is False or value is None:
+            if ftype.startswith("m2o:") or ftype == "int":
+                return 0
+            if ftype in ("date", "datetime"):
+                return pd.NaT
+            if ftype == "char":
+                return ""
+            return value
+        if ftype in ("date", "datetime"):
+            return pd.Timestamp(value)
+        return value
+
+    def _leaf(self, model, df, leaf):
+        path, op, value = leaf
+        series, ftype = self._resolve(model, df, path)
+        value = self._coerce(ftype, value)
+        if op == "=":
+            return series.isna() if value is pd.NaT else series == value
+        if op == "!=":
+            return series.notna() if value is pd.NaT else series != value
+        if op in ("<", "<=", ">", ">="):
+            return {"<": series.lt, "<=": series.le, ">": series.gt, ">=": series.ge}[op](value)
+        if op in ("in", "not in"):
+            mask = series.isin(list(value))
+            return ~mask if op == "not in" else mask
+        if op in ("like", "ilike", "not ilike"):
+            mask = series.astype(str).str.contains(str(value), case=(op == "like"), regex=False)
+            return ~mask if op == "not ilike" else mask
+        raise OdooFault(f"Invalid operator {op!r}")
+
+    def _mask(self, model, df, domain):
+        """Evalueer een Odoo domein (prefix notatie) tot een boolean Series"""
+        stack = []
+        for token in reversed(domain or []):
+            if token == "&":
+                stack.append(stack.pop() & stack.pop())
+            elif token == "|":
+                stack.append(stack.pop() | stack.pop())
+            elif token == "!":
+                stack.append(~stack.pop())
+            else:
+                stack.append(self._leaf(model, df, token))
+        mask = pd.Series(True, index=df.index)
+        for part in stack:
+            mask &= part
+        return mask
+
+    def _filter(self, model, domain):
+        df = self._table(model)
+        return df[self._mask(model, df, domain)] if domain else df
+
+    def _order(self, model, df, order):
+        if not order:
+            return df.sort_index()
+        keys, ascending = [], []
+        for part in order.split(","):
+            bits = part.strip().split()
+            keys.append(bits[0])
+            ascending.append(len(bits) < 2 or bits[1].lower() != "desc")
+        columns = {k: self._column(model, df, k) if k != "id" else pd.Series(df.index, index=df.index)
+                   for k in keys}
+        order_df = pd.DataFrame(columns)
+        return df.loc[order_df.sort_values(keys, ascending=ascending, kind="stable").index]
+
+    def _records(self, model, df, fields):
+        """Zet rijen om naar Odoo records (many2one als [id, naam], leeg als False)"""
+        fields = list(fields or [f for f in SCHEMA[model] if f != "datas"])
+        columns = {"id": df.index.tolist()}
+        for field in fields:
+            if field == "id":
+                continue
+            ftype = self._field_type(model, field)
+            if ftype == "m2m":
+                columns[field] = [[] for _ in range(len(df))]
+                continue
+            series = self._column(model, df, field)
+            if ftype.startswith("m2o:"):
+                related = ftype[4:]
+                label_field = "display_name"
+                names = self._related(series, related, label_field).tolist()
+                columns[field] = [[int(i), n] if i else False for i, n in zip(series.tolist(), names)]
+            elif ftype == "date":
+                columns[field] = [v if isinstance(v, str) else False
+                                  for v in series.dt.strftime("%Y-%m-%d").tolist()]
+            elif ftype == "datetime":
+                columns[field] = [v if isinstance(v, str) else False
+                                  for v in series.dt.strftime("%Y-%m-%d %H:%M:%S").tolist()]
+            elif ftype == "char":
+                columns[field] = [v if v else False for v in series.astype(object).tolist()]
+            else:
+                columns[field] = series.tolist()
+        names = list(columns.keys())
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    # -------------------------------------------------------------------------
+    # ORM methodes
+    # -------------------------------------------------------------------------
+
+    def search_read(self, model, domain=None, fields=None, offset=0, limit=None, order=None):
+        df = self._order(model, self._filter(model, domain), order)
+        df = df.iloc[offset:offset + limit] if limit else df.iloc[offset:]
+        return self._records(model, df, fields)
+
+    def search(self, model, domain=None, offset=0, limit=None, order=None):
+        df = self._order(model, self._filter(model, domain), order)
+        df = df.iloc[offset:offset + limit] if limit else df.iloc[offset:]
+        return df.index.tolist()
+
+    def search_count(self, model, domain=None):
+        return int(len(self._filter(model, domain)))
+
+    def read(self, model, ids, fields=None):
+        df = self._table(model)
+        return self._records(model, df.loc[df.index.intersection(list(ids))], fields)
+
+    def write(self, model, ids, values):
+        """Werk records bij (alleen opgeslagen kolommen) en zet write_date op nu"""
+        df = self._table(model)
+        ids = df.index.intersection(list(ids))
+        for field, value in values.items():
+            ftype = self._field_type(model, field)
+            if field not in df.columns:
+                raise OdooFault(f"Field {field!r} on {model!r} is not stored in the mock")
+            if isinstance(value, (list, tuple)) and ftype.startswith("m2o:"):
+                value = value[0]
+            df.loc[ids, field] = self._coerce(ftype, value)
+        if "write_date" not in df.columns:
+            df["write_date"] = self.loaded_at
+        # De generator zet write_dates tot een paar uur na vandaag; een wijziging is altijd de laatste
+        df.loc[ids, "write_date"] = max(pd.Timestamp.now().floor("s"), df["write_date"].max() + pd.Timedelta(seconds=1))
+        return True
+
+    def read_group(self, model, domain, fields, groupby, offset=0, limit=None, orderby=None, lazy=True):
+        df = self._filter(model, domain)
+        groupby = [groupby] if isinstance(groupby, str) else list(groupby)
+        if lazy:
+            groupby = groupby[:1]
+
+        keys, key_types = {}, {}
+        for spec in groupby:
+            field, _, granularity = spec.partition(":")
+            series, ftype = self._resolve(model, df, field)
+            if ftype in ("date", "datetime"):
+                freq = {"day": "D", "week": "W", "month": "M", "quarter": "Q", "year": "Y"}[granularity or "month"]
+                series = series.dt.to_period(freq)
+            keys[spec] = series
+            key_types[spec] = ftype
+
+        aggregates = {}
+        for spec in fields:
+            name, _, func = spec.partition(":")
+            if name == "__count" or name in groupby:
+                continue
+            field = name
+            if func and "(" in func:
+                func, field = func.rstrip(")").split("(")
+            func = func or "sum"
+            if field == "id" and func == "count":
+                aggregates[name] = ("id", "count")
+                continue
+            self._field_type(model, field)
+            aggregates[name] = (field, {"count_distinct": "nunique"}.get(func, func))
+
+        frame = pd.DataFrame({f"k{i}": s for i, s in enumerate(keys.values())}, index=df.index)
+        for name, (field, _) in aggregates.items():
+            frame[name] = df.index if field == "id" else self._column(model, df, field)
+        count_key = "__count" if not lazy or not groupby else f"{groupby[0].split(':')[0]}_count"
+        if not keys:
+            row = {name: getattr(frame[name], func)() for name, (_, func) in aggregates.items()}
+            row[count_key] = len(frame)
+            return [self._plain(row)]
+        grouped = frame.groupby(list(frame.columns[:len(keys)]), sort=True, dropna=False, observed=True)
+        result = grouped.agg(**{name: (name, func) for name, (_, func) in aggregates.items()}) \
+            if aggregates else grouped.size().to_frame("__size")
+        sizes = grouped.size()
+
+        # display_name per many2one groep één keer opzoeken (niet per rij)
+        m2o_names = {}
+        for i, spec in enumerate(keys):
+            if key_types[spec].startswith("m2o:"):
+                values = result.index.get_level_values(i) if len(keys) > 1 else result.index
+                unique = pd.Series(pd.unique(values)).dropna()
+                unique = unique[unique.astype(bool)]
+                names = self._related(unique, key_types[spec][4:], "display_name")
+                m2o_names[spec] = dict(zip(unique.tolist(), names.tolist()))
+
+        rows = []
+        for group_key, values in result.iterrows():
+            group_key = group_key if isinstance(group_key, tuple) else (group_key,)
+            row = {"__range": {}}
+            for spec, value in zip(keys, group_key):
+                ftype = key_types[spec]
+                if isinstance(value, pd.Period):
+                    label = f"{MONTHS[value.month - 1]} {value.year}" if value.freqstr.startswith("M") else str(value)
+                    row[spec] = label
+                    row["__range"][spec] = {"from": value.start_time.strftime("%Y-%m-%d"),
+                                            "to": (value + 1).start_time.strftime("%Y-%m-%d")}
+                elif ftype.startswith("m2o:"):
+                    row[spec] = [int(value), m2o_names[spec][value]] if value else False
+                else:
+                    row[spec] = value
+            for name in aggregates:
+                row[name] = values[name]
+            row[count_key] = int(sizes.loc[group_key if len(group_key) > 1 else group_key[0]])
+            rows.append(self._plain(row))
+        rows = rows[offset:offset + limit] if limit else rows[offset:]
+        return rows
+
+    @staticmethod
+    def _plain(row):
+        """numpy scalars naar JSON-vriendelijke Python waarden"""
+        clean = {}
+        for k, v in row.items():
+            if isinstance(v, np.generic):
+                v = v.item()
+            if isinstance(v, float) and np.isnan(v):
+                v = False
+            if isinstance(v, pd.Timestamp):
+                v = v.strftime("%Y-%m-%d %H:%M:%S")
+            clean[k] = v
+        return clean
+
+    # -------------------------------------------------------------------------
+    # JSON-RPC
+    # -------------------------------------------------------------------------
+
+    def execute_kw(self, model, method, args, kwargs=None):
+        kwargs = dict(kwargs or {})
+        kwargs.pop("context", None)
+        handlers = {
+            "search_read": self.search_read,
+            "search": self.search,
+            "search_count": self.search_count,
+            "read": self.read,
+            "read_group": self.read_group,
+            "write": self.write,
+        }
+        if method not in handlers:
+            raise OdooFault(f"Method {method!r} not supported by the mock")
+        with self._lock:
+            self.stats[f"{model}.{method}"] += 1
+            self.stats["__requests"] += 1
+        return handlers[method](model, *args, **kwargs)
+
+    def handle(self, payload):
+        """Verwerk één JSON-RPC payload; geeft het response dict terug"""
+        request_id = payload.get("id")
+        started = time.perf_counter()
+        try:
+            params = payload["params"]
+            if params.get("service") != "object" or params.get("method") != "execute_kw":
+                raise OdooFault("Only object.execute_kw is supported")
+            db, uid, password, model, method, *rest = params["args"]
+            if not password:
+                raise OdooFault("Access Denied")
+            result = self.execute_kw(model, method, rest[0] if rest else [], rest[1] if len(rest) > 1 else {})
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+            rows = len(result) if isinstance(result, list) else 1
+        except OdooFault as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {
+                "code": 200, "message": "Odoo Server Error",
+                "data": {"name": "odoo.exceptions.ValidationError", "message": str(e)}}}
+            rows = 0
+        self._sleep(rows, time.perf_counter() - started)
+        return response
+
+    def _sleep(self, rows, spent):
+        delay = self.latency_ms / 1000
+        if self.jitter_ms:
+            delay += self._random.uniform(0, self.jitter_ms) / 1000
+        delay += rows * self.row_latency_us / 1e6
+        if delay > spent:
+            time.sleep(delay - spent)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers en body gaan in twee writes; zonder TCP_NODELAY kost dat bij
+    # keep-alive verbindingen ~40 ms per request (Nagle + delayed ACK)
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Invalid JSON")
+            return
+        data = json.dumps(self.server.odoo.handle(payload), default=str).encode("utf-8")
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True    # client gaf op (timeout)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self.send_error(404)
+            return
+        data = json.dumps(dict(self.server.odoo.stats)).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(odoo, host="127.0.0.1", port=0):
+    """Start de mock server in een achtergrondthread; geeft (server, url) terug"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.odoo = odoo
+    thread = threading.Thread(target=server.serve_forever, name="lab-mock-odoo", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/jsonrpc"
+
+
+def parse_size(text):
+    """'10k' / '1m' / '5000000' -> int"""
+    text = str(text).strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Odoo JSON-RPC server voor het LAB dashboard")
+    parser.add_argument("--lines", default="100k", help="aantal boekingsregels (bv. 10k, 1m, 5m)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8069)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="vaste latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="willekeurige extra latency")
+    parser.add_argument("--row-latency-us", type=float, default=0.0, help="extra latency per teruggegeven rij")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tables = generate_dataset(parse_size(args.lines), seed=args.seed)
+    odoo = MockOdoo(tables, args.latency_ms, args.jitter_ms, args.row_latency_us, seed=args.seed)
+    print(f"Dataset: {len(tables['account.move.line']):,} regels in {time.perf_counter() - started:.1f}s")
+    server, url = serve(odoo, args.host, args.port)
+    print(f"Mock Odoo luistert op {url}  (statistieken: GET /stats)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
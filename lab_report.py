@@ -0,0 +1,267 @@
+"""
+LAB Dashboard rapportages (headless)
+====================================
+Maakt de overzicht-, kosten-, product- en cashflowrapportages van het
+dashboard zonder browser of Streamlit, bv. als batch job bij de
+maandafsluiting. Gebruikt dezelfde datalaag en cache als de app
+(lab_data.py), dus afgesloten jaren komen uit de permanente cache.
+
+Gebruik:
+    python lab_report.py --year 2025
+    python lab_report.py --year 2025 --company "LAB Projects" --format xlsx --output rapporten/
+    python lab_report.py --year 2025 --reports kosten,cashflow --format parquet
+    python lab_report.py --year 2025 --reports "" --ledger       alleen de grootboekregels
+
+Instellingen (ODOO_API_KEY, LAB_ODOO_URL, ...) uit de omgeving of uit
+.streamlit/secrets.toml. De datasets worden gelijktijdig opgehaald en elk
+rapport wordt weggeschreven zodra zijn data binnen is; CSV rij voor rij.
+Parquet vereist pyarrow, XLSX vereist openpyxl.
+
+--ledger schrijft daarnaast alle geboekte move lines van het jaar, pagina
+voor pagina (lab_export.py): als .csv.gz, of als .parquet bij --format parquet.
+
+Exit code 1 als een Odoo call mislukte (het rapport is dan onvolledig).
+"""
+
+import argparse
+import csv
+import importlib.util
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+
+# Eenmalige run: geen change feed (lab_changes.py) nodig
+os.environ.setdefault("LAB_CHANGE_POLL", "0")
+
+import lab_data  # noqa: E402
+import lab_export  # noqa: E402
+from lab_cube import financial_cube, pnl_section  # noqa: E402
+
+FORMATS = ("csv", "parquet", "xlsx")
+# Optionele packages per formaat
+REQUIRES = {"parquet": "pyarrow", "xlsx": "openpyxl"}
+
+
+# =============================================================================
+# RAPPORTEN: (bestandsnaam, kolommen, functie(year, company_id) → rijen)
+# =============================================================================
+
+def _cube(year, company_id):
+    return financial_cube(*lab_data.get_ledger_rollup(year, company_id))
+
+
+def overview_rows(year, company_id):
+    cube = _cube(year, company_id)
+    revenue = -cube.slice(accounts=lambda code: pnl_section(code) == "Omzet").total()
+    costs = cube.slice(accounts=lambda code: pnl_section(code) != "Omzet").total()
+    receivables, payables = lab_data.get_receivables_payables(company_id)
+    return [
+        {"Kengetal": "Omzet", "Bedrag": revenue},
+        {"Kengetal": "Kosten", "Bedrag": costs},
+        {"Kengetal": "Resultaat", "Bedrag": revenue - costs},
+        {"Kengetal": "Banksaldo", "Bedrag": lab_data.bank_total(lab_data.get_bank_balances(), company_id)},
+        {"Kengetal": "Debiteuren", "Bedrag": sum(receivables.column("amount_residual", 0))},
+        {"Kengetal": "Crediteuren", "Bedrag": abs(sum(payables.column("amount_residual", 0)))},
+    ]
+
+
+def monthly_rows(year, company_id):
+    cube = _cube(year, company_id)
+    revenue = cube.slice(accounts=lambda code: pnl_section(code) == "Omzet").by_month()
+    costs = cube.slice(accounts=lambda code: pnl_section(code) != "Omzet").by_month()
+    return [{"Maand": month, "Omzet": -revenue.get(month, 0), "Kosten": costs.get(month, 0)}
+            for month in cube.months]
+
+
+def cost_rows(year, company_id):
+    cube = _cube(year, company_id).slice(accounts=lambda code: pnl_section(code) != "Omzet")
+    rows = [
+        {"Sectie": pnl_section(code), "Categorie": lab_data.get_category_name(code), "Code": code,
+         "Rekening": lab_data.translate_account_name(name), "Bedrag": amount}
+        for code, name, amount in cube.by_account()
+    ]
+    return sorted(rows, key=lambda r: (r["Sectie"], r["Categorie"], -r["Bedrag"]))
+
+
+def cashflow_rows(year, company_id):
+    # Prognose vanaf vandaag met de standaard aannames van de app; year speelt geen rol
+    return lab_data.cashflow_forecast(*lab_data.cash_positions(company_id))
+
+
+REPORTS = {
+    "overzicht": [
+        ("overzicht", ["Kengetal", "Bedrag"], overview_rows),
+        ("overzicht_maanden", ["Maand", "Omzet", "Kosten"], monthly_rows),
+    ],
+    "kosten": [
+        ("kosten", ["Sectie", "Categorie", "Code", "Rekening", "Bedrag"], cost_rows),
+    ],
+    "producten": [
+        ("productcategorieen", ["Categorie", "Omzet", "Aantal"], lab_data.product_category_totals),
+        ("top_producten", ["Product", "Omzet", "Aantal"], lab_data.top_product_totals),
+    ],
+    "cashflow": [
+        ("cashflow", ["Week", "Ontvangsten", "Betalingen", "Banksaldo"], cashflow_rows),
+    ],
+}
+
+
+# =============================================================================
+# UITVOER
+# =============================================================================
+
+class CsvWriter:
+    """Eén CSV bestand per rapport, rij voor rij geschreven"""
+
+    def __init__(self, output, suffix):
+        self.output, self.suffix = output, suffix
+
+    def write(self, name, columns, rows):
+        path = os.path.join(self.output, f"lab_{name}_{self.suffix}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+        return path
+
+    def close(self):
+        pass
+
+
+class ParquetWriter(CsvWriter):
+    """Eén Parquet bestand per rapport (pyarrow)"""
+
+    def write(self, name, columns, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.output, f"lab_{name}_{self.suffix}.parquet")
+        rows = list(rows)
+        table = pa.table({c: [r.get(c) for r in rows] for c in columns})
+        pq.write_table(table, path)
+        return path
+
+
+class XlsxWriter:
+    """Eén werkmap met een tabblad per rapport; write-only, dus tabbladen gaan direct naar schijf"""
+
+    def __init__(self, output, suffix):
+        from openpyxl import Workbook
+
+        self.path = os.path.join(output, f"lab_rapport_{suffix}.xlsx")
+        self.workbook = Workbook(write_only=True)
+
+    def write(self, name, columns, rows):
+        sheet = self.workbook.create_sheet(title=name[:31])
+        sheet.append(columns)
+        for row in rows:
+            sheet.append([row.get(c) for c in columns])
+        return f"{self.path} [{name}]"
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter, "xlsx": XlsxWriter}
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def parse_company(value):
+    """Bedrijf als id of (deel van de) naam; None = alle bedrijven"""
+    if not value:
+        return None
+    if value.isdigit() and int(value) in lab_data.COMPANIES:
+        return int(value)
+    matches = [cid for cid, name in lab_data.COMPANIES.items() if value.lower() in name.lower()]
+    if len(matches) != 1:
+        raise argparse.ArgumentTypeError(f"onbekend bedrijf: {value}")
+    return matches[0]
+
+
+def run(year, company_id, reports, writer, workers=4):
+    """Haal de rapporten gelijktijdig op en schrijf ze weg zodra ze klaar zijn; geeft de fouten terug"""
+    errors = []
+    lab_data.set_error_handler(errors.append)
+    tables = [table for report in reports for table in REPORTS[report]]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lab-report") as pool:
+        futures = {pool.submit(func, year, company_id): (name, columns) for name, columns, func in tables}
+        for future in as_completed(futures):
+            name, columns = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                continue
+            path = writer.write(name, columns, rows)
+            print(f"{name:<20} {len(rows):>6} rijen  {time.perf_counter() - started:6.1f}s  {path}",
+                  file=sys.stderr)
+    writer.close()
+    return errors
+
+
+def run_ledger(year, company_id, output, fmt):
+    """Grootboekexport met voortgang op stderr; geeft de fouten terug"""
+    path = os.path.join(output, lab_export.ledger_filename(year, company_id, fmt))
+    started = time.perf_counter()
+
+    def progress(written, total):
+        print(f"\rgrootboek {written:>10,} / {total or 0:,} regels  {time.perf_counter() - started:6.1f}s",
+              end="", file=sys.stderr)
+
+    try:
+        rows = lab_export.export_ledger(path, year, company_id, fmt, progress)
+    except Exception as e:
+        print(file=sys.stderr)
+        return [f"grootboek: {e}"]
+    print(f"\r{'grootboek':<20} {rows:>6} rijen  {time.perf_counter() - started:6.1f}s  {path}",
+          file=sys.stderr)
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LAB dashboard rapportages zonder browser")
+    parser.add_argument("--year", type=int, default=date.today().year)
+    parser.add_argument("--company", type=parse_company, help="bedrijf (id of naam); standaard alle bedrijven")
+    parser.add_argument("--reports", default=",".join(REPORTS),
+                        help=f"komma-gescheiden selectie uit: {', '.join(REPORTS)}")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", default=".", help="uitvoermap")
+    parser.add_argument("--workers", type=int, default=4, help="gelijktijdige datasets")
+    parser.add_argument("--ledger", action="store_true",
+                        help="ook alle grootboekregels van het jaar exporteren (csv.gz of parquet)")
+    args = parser.parse_args()
+
+    reports = [r.strip() for r in args.reports.split(",") if r.strip()]
+    unknown = [r for r in reports if r not in REPORTS]
+    if unknown:
+        parser.error(f"onbekende rapporten: {', '.join(unknown)}")
+    required = REQUIRES.get(args.format)
+    if required and importlib.util.find_spec(required) is None:
+        parser.error(f"--format {args.format} vereist het package {required}")
+    if args.ledger and args.format not in lab_export.FORMATS:
+        parser.error(f"--ledger ondersteunt alleen {', '.join(lab_export.FORMATS)}")
+    if not lab_data.ODOO_API_KEY:
+        parser.error("ODOO_API_KEY niet ingesteld (omgeving of .streamlit/secrets.toml)")
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    os.makedirs(args.output, exist_ok=True)
+    suffix = f"{args.year}_{args.company}" if args.company else str(args.year)
+    writer = WRITERS[args.format](args.output, suffix)
+    errors = run(args.year, args.company, reports, writer, args.workers)
+    if args.ledger:
+        errors += run_ledger(args.year, args.company, args.output, args.format)
+    for error in errors:
+        print(f"FOUT {error}", file=sys.stderr)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
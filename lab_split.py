@@ -0,0 +1,195 @@
+"""
+LAB Dashboard opsplitsen van zware Odoo queries
+===============================================
+Geeft een search_read een timeout, dan splitst odoo_call() de query op in
+plaats van op te geven:
+
+- met een datumbereik in het domein (["date", ">=", ...] en ["date", "<=", ...]):
+  halveren in aaneengesloten datumvensters
+- zonder datumbereik: eerst de ids ophalen (search), dan search_read per id-blok
+
+De delen worden gelijktijdig opgehaald en in de gevraagde volgorde (order)
+samengevoegd; een limit geldt voor het samengevoegde resultaat. Per model wordt de
+venstergrootte onthouden die wel lukte; de volgende call wordt dan meteen
+in vensters van die grootte opgehaald. Gaat een venster ruim binnen de
+timeout, dan groeit het venster weer (verdubbelen).
+
+Dit module bevat alleen de domein- en vensterlogica; het ophalen zelf zit
+in odoo_call().
+"""
+
+import threading
+from datetime import date, datetime, timedelta
+
+SPLIT_WORKERS = 4       # gelijktijdige requests per opgesplitste call
+MAX_SPLIT_DEPTH = 6     # maximaal 2^6 = 64 delen per oorspronkelijk venster
+GROW_BELOW = 0.25       # venster verdubbelen als het binnen 25% van de timeout klaar is
+FULL_YEAR_DAYS = 366
+
+
+def _parse(value):
+    return datetime.fromisoformat(value).date() if len(value) > 10 else date.fromisoformat(value)
+
+
+def _term_end(domain, i):
+    """Index direct na de (prefix-notatie) term die op i begint"""
+    if i >= len(domain):
+        raise ValueError("onvolledig domein")
+    term = domain[i]
+    if term in ("&", "|"):
+        return _term_end(domain, _term_end(domain, i + 1))
+    if term == "!":
+        return _term_end(domain, i + 1)
+    return i + 1
+
+
+def top_level_leaves(domain):
+    """Indexen van de leaves die op het hoogste niveau met AND verbonden zijn
+
+    Leaves onder '|' of '!' tellen niet mee; '&' op het hoogste niveau
+    verandert niets aan de AND. None als het domein niet te ontleden is.
+    """
+    indexes, i = [], 0
+    try:
+        while i < len(domain):
+            term = domain[i]
+            if term == "&":
+                i += 1
+            elif term in ("|", "!"):
+                i = _term_end(domain, i)
+            else:
+                indexes.append(i)
+                i += 1
+    except ValueError:
+        return None
+    return indexes
+
+
+def find_date_range(domain):
+    """(veld, start, eind, is_datetime) als het domein een gesloten datumbereik heeft, anders None
+
+    Alleen grenzen op het hoogste niveau (AND) tellen; een '|' of '!' elders
+    in het domein mag, grenzen daarbinnen worden niet vervangen.
+    """
+    indexes = top_level_leaves(domain)
+    if indexes is None:
+        return None
+    lower, upper = {}, {}
+    for leaf in (domain[i] for i in indexes):
+        if isinstance(leaf, (list, tuple)) and len(leaf) == 3 and isinstance(leaf[2], str):
+            field, op, value = leaf
+            if op == ">=":
+                lower[field] = value
+            elif op == "<=":
+                upper[field] = value
+    for field, value in lower.items():
+        if field not in upper:
+            continue
+        try:
+            start, end = _parse(value), _parse(upper[field])
+        except ValueError:
+            continue
+        if start <= end:
+            return field, start, end, len(value) > 10 or len(upper[field]) > 10
+    return None
+
+
+def with_date_range(domain, field, start, end, is_datetime=False):
+    """Kopie van domain met het bereik op field vervangen door start..end (inclusief)"""
+    low = f"{start.isoformat()} 00:00:00" if is_datetime else start.isoformat()
+    high = f"{end.isoformat()} 23:59:59" if is_datetime else end.isoformat()
+    result = list(domain)
+    for i in top_level_leaves(domain):
+        leaf = domain[i]
+        if len(leaf) == 3 and leaf[0] == field and leaf[1] in (">=", "<="):
+            result[i] = [field, leaf[1], low if leaf[1] == ">=" else high]
+    return result
+
+
+def parse_order(order):
+    """[(veld, aflopend)] uit een Odoo order ("date desc, id")"""
+    result = []
+    for part in (order or "").split(","):
+        words = part.split()
+        if words:
+            result.append((words[0], len(words) > 1 and words[1].lower() == "desc"))
+    return result
+
+
+def _sortable(value):
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        value = value[1]        # many2one: op naam
+    # Leeg achteraan bij oplopend, vooraan bij aflopend (zoals PostgreSQL)
+    return (value is False or value is None, value if value is not False and value is not None else 0)
+
+
+def sort_records(records, order):
+    """Sorteer samengevoegde delen zoals Odoo ze met deze order zou geven (gelijke waarden: op id)"""
+    keys = parse_order(order)
+    if "id" not in (field for field, _ in keys):
+        keys.append(("id", False))
+    for field, descending in reversed(keys):
+        records.sort(key=lambda r: _sortable(r.get(field)), reverse=descending)
+    return records
+
+
+def window_days(start, end):
+    return (end - start).days + 1
+
+
+def split_windows(start, end, days):
+    """Aaneengesloten vensters van hoogstens days dagen (één venster als days leeg is)"""
+    if not days or window_days(start, end) <= days:
+        return [(start, end)]
+    windows = []
+    while start <= end:
+        stop = min(start + timedelta(days=days - 1), end)
+        windows.append((start, stop))
+        start = stop + timedelta(days=1)
+    return windows
+
+
+def bisect(start, end):
+    """Halveer een venster; None als het maar één dag is"""
+    if start >= end:
+        return None
+    middle = start + timedelta(days=(end - start).days // 2)
+    return [(start, middle), (middle + timedelta(days=1), end)]
+
+
+def id_chunks(ids, parts=2):
+    size = -(-len(ids) // parts)
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+class WindowMemory:
+    """Onthoudt per model de venstergrootte (dagen) die zonder timeout lukte"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days = {}
+
+    def get(self, model):
+        with self._lock:
+            return self._days.get(model)
+
+    def shrink(self, model, days):
+        with self._lock:
+            self._days[model] = min(self._days.get(model, days), days)
+
+    def succeeded(self, model, days, elapsed, timeout):
+        """Na een geslaagd venster: groeien als het ruim binnen de timeout bleef"""
+        if elapsed >= timeout * GROW_BELOW:
+            return
+        with self._lock:
+            current = self._days.get(model)
+            if current is None or days < current:
+                return
+            if current * 2 >= FULL_YEAR_DAYS:
+                del self._days[model]
+            else:
+                self._days[model] = current * 2
+
+    def clear(self):
+        with self._lock:
+            self._days.clear()
@@ -0,0 +1,400 @@
+"""
+LAB Dashboard persistente opslag
+================================
+Gedeelde key/value opslag voor cache-entries: afgesloten boekjaren
+(permanent) en de gedeelde/warm-start laag (overleeft een herstart en wordt
+gedeeld door alle replica's).
+
+Backends (keuze via LAB_CACHE_BACKEND):
+- FileBackend: lokale map met file locks (standaard; ook bruikbaar voor
+  replica's op dezelfde machine of een gedeeld volume)
+- RedisBackend: Redis-compatibele server voor replica's op meerdere machines;
+  met LAB_CACHE_BACKEND=memory:// draait hij tegen MemoryRedis, een
+  stand-in binnen het proces (lab_bench.py --cache-backend memory://)
+
+Bestandsformaat (.labc):
+- Header: magic b"LABC", formaatversie, encoding, lengte en SHA-256 van de payload
+- Payload: zlib gecomprimeerd
+  - Odoo records (lijst van dicts met dezelfde velden) worden kolomsgewijs
+    opgeslagen: getallen als packed array, overige waarden dictionary-encoded
+    (unieke waarden + indexen). Herhaalde many2one paren als
+    [1, "LAB Conceptstore"] staan zo maar één keer in het bestand.
+  - Overige waarden via pickle
+
+Schrijven gaat via een tijdelijk bestand + rename zodat een half geschreven
+bestand nooit gelezen wordt; een bestand met afwijkende versie of checksum
+geldt als niet aanwezig.
+"""
+
+import contextlib
+import hashlib
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows: geen file locks
+    fcntl = None
+
+CACHE_DIR = os.environ.get(
+    "LAB_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lab_cache")
+)
+
+CACHE_BACKEND = os.environ.get("LAB_CACHE_BACKEND", "file")
+LOCK_TIMEOUT = 150      # iets langer dan de Odoo timeout
+LOCK_POLL = 0.1
+
+MAGIC = b"LABC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sBBQ32s")
+
+ENCODING_PICKLE = 0
+ENCODING_RECORDS = 1
+
+
+# =============================================================================
+# SERIALISATIE
+# =============================================================================
+
+def _encode_column(values):
+    """Kies de compactste representatie voor één kolom"""
+    if all(type(v) is float for v in values):
+        return ("f", array("d", values).tobytes())
+    if all(type(v) is int for v in values):
+        try:
+            return ("i", array("q", values).tobytes())
+        except OverflowError:
+            pass
+    # Dictionary-encoding; lijsten (many2one) tijdelijk als tuple voor hashing
+    uniques = []
+    index = {}
+    codes = array("I")
+    for v in values:
+        hashable = (type(v), tuple(v)) if isinstance(v, list) else (type(v), v)
+        try:
+            code = index.get(hashable)
+        except TypeError:
+            return ("p", values)
+        if code is None:
+            code = index[hashable] = len(uniques)
+            uniques.append(v)
+        codes.append(code)
+    return ("d", (uniques, codes.tobytes()))
+
+
+def _decode_column(kind, data):
+    if kind == "f":
+        return array("d", data).tolist()
+    if kind == "i":
+        return array("q", data).tolist()
+    if kind == "d":
+        uniques, codes = data
+        return [uniques[c] for c in array("I", codes)]
+    return data
+
+
+def _is_records(value):
+    if not isinstance(value, list) or not value or not isinstance(value[0], dict):
+        return False
+    fields = value[0].keys()
+    return all(isinstance(r, dict) and r.keys() == fields for r in value)
+
+
+def dumps(value, meta=None):
+    """Serialiseer een cachewaarde (+ metadata) naar bytes: header + gecomprimeerde payload"""
+    if _is_records(value):
+        fields = list(value[0].keys())
+        columns = {f: _encode_column([r[f] for r in value]) for f in fields}
+        body = pickle.dumps((meta, (fields, len(value), columns)), protocol=pickle.HIGHEST_PROTOCOL)
+        encoding = ENCODING_RECORDS
+    else:
+        body = pickle.dumps((meta, value), protocol=pickle.HIGHEST_PROTOCOL)
+        encoding = ENCODING_PICKLE
+    payload = zlib.compress(body, 6)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, encoding, len(payload),
+                         hashlib.sha256(payload).digest())
+    return header + payload
+
+
+def loads(blob):
+    """Lees bytes van dumps() terug als (value, meta); ValueError bij een ongeldig of beschadigd bestand"""
+    if len(blob) < HEADER.size:
+        raise ValueError("bestand te kort")
+    magic, version, encoding, length, digest = HEADER.unpack_from(blob)
+    payload = blob[HEADER.size:]
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("onbekend formaat of versie")
+    if len(payload) != length or hashlib.sha256(payload).digest() != digest:
+        raise ValueError("checksum klopt niet")
+    meta, body = pickle.loads(zlib.decompress(payload))
+    if encoding != ENCODING_RECORDS:
+        return body, meta
+    fields, count, columns = body
+    decoded = [_decode_column(*columns[f]) for f in fields]
+    return [dict(zip(fields, row)) for row in zip(*decoded)], meta
+
+
+# =============================================================================
+# BACKENDS
+# =============================================================================
+
+class CacheBackend:
+    """Interface voor een (gedeelde) cache backend
+
+    Alle replica's die dezelfde backend gebruiken delen één opgehaalde versie
+    per dataset. lock() voorkomt dat meerdere processen tegelijk dezelfde key
+    bij Odoo ophalen.
+    """
+
+    def get(self, key):
+        """Geef (value, stored_at) terug, of None"""
+        raise NotImplementedError
+
+    def put(self, key, value, stored_at=None, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @contextlib.contextmanager
+    def lock(self, key, timeout=LOCK_TIMEOUT):
+        """Exclusieve lock op key over processen heen (best effort: na timeout toch door)"""
+        yield
+
+
+class FileBackend(CacheBackend):
+    """Backend in een lokale map; gedeeld tussen processen op dezelfde machine/volume"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key, suffix=".labc"):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.root, f"{digest}{suffix}")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value, meta = loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, zlib.error):
+            self.delete(key)
+            return None
+        if not meta or meta.get("key") != repr(key):
+            return None
+        return value, meta["stored_at"]
+
+    def put(self, key, value, stored_at=None, ttl=None):
+        """Schrijf value atomair weg onder key (ttl wordt bij het lezen gecontroleerd)"""
+        os.makedirs(self.root, exist_ok=True)
+        meta = {"key": repr(key), "stored_at": stored_at or time.time()}
+        blob = dumps(value, meta)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.endswith(".labc"):
+                os.remove(os.path.join(self.root, name))
+
+    @contextlib.contextmanager
+    def lock(self, key, timeout=LOCK_TIMEOUT):
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(key, ".lock"), "a+b") as f:
+            deadline = time.time() + timeout
+            locked = False
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked = True
+                    break
+                except BlockingIOError:
+                    if time.time() >= deadline:
+                        break
+                    time.sleep(LOCK_POLL)
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# Verwijder de lock alleen als hij nog van ons is (atomair op de server)
+RELEASE_LOCK = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class MemoryRedis:
+    """Stand-in voor een Redis server binnen het proces (get/set nx/ex/px, delete, scan_iter, eval)
+
+    Alleen het deel van de redis-py API dat RedisBackend gebruikt; eval kent
+    alleen RELEASE_LOCK.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name):
+        item = self._data.get(name)
+        if item is not None and item[1] is not None and item[1] <= time.monotonic():
+            del self._data[name]
+            item = None
+        return item
+
+    def get(self, name):
+        with self._lock:
+            item = self._live(name)
+            return item[0] if item else None
+
+    def set(self, name, value, ex=None, px=None, nx=False):
+        expires = time.monotonic() + ex if ex else time.monotonic() + px / 1000 if px else None
+        value = value.encode("utf-8") if isinstance(value, str) else value
+        with self._lock:
+            if nx and self._live(name) is not None:
+                return None
+            self._data[name] = (value, expires)
+            return True
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, match="*"):
+        prefix = match.rstrip("*")
+        with self._lock:
+            names = [n for n in list(self._data) if n.startswith(prefix) and self._live(n)]
+        return iter(names)
+
+    def eval(self, script, numkeys, *keys_and_args):
+        if script != RELEASE_LOCK:
+            raise NotImplementedError("MemoryRedis kent alleen RELEASE_LOCK")
+        (name,), (token,) = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        with self._lock:
+            item = self._live(name)
+            if item is not None and item[0] == token:
+                del self._data[name]
+                return 1
+            return 0
+
+
+_memory_servers = {}
+_memory_servers_lock = threading.Lock()
+
+
+def memory_server(url):
+    """Eén MemoryRedis per memory:// url per proces (gedeeld door de namespaces)"""
+    with _memory_servers_lock:
+        return _memory_servers.setdefault(url, MemoryRedis())
+
+
+class RedisBackend(CacheBackend):
+    """Backend op een Redis-compatibele server
+
+    client: elk object met de redis-py API (get/set/delete/scan_iter/eval), bv.
+    redis.Redis.from_url(...) of MemoryRedis.
+    """
+
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key):
+        return self.prefix + hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        blob = self.client.get(self._key(key))
+        if blob is None:
+            return None
+        try:
+            value, meta = loads(blob)
+        except (ValueError, EOFError, pickle.UnpicklingError, zlib.error):
+            return None
+        if not meta or meta.get("key") != repr(key):
+            return None
+        return value, meta["stored_at"]
+
+    def put(self, key, value, stored_at=None, ttl=None):
+        meta = {"key": repr(key), "stored_at": stored_at or time.time()}
+        self.client.set(self._key(key), dumps(value, meta), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    @contextlib.contextmanager
+    def lock(self, key, timeout=LOCK_TIMEOUT):
+        lock_key = self._key(key) + ":lock"
+        token = uuid.uuid4().hex.encode()
+        deadline = time.time() + timeout
+        locked = False
+        while True:
+            if self.client.set(lock_key, token, nx=True, px=int(timeout * 1000)):
+                locked = True
+                break
+            if time.time() >= deadline:
+                break
+            time.sleep(LOCK_POLL)
+        try:
+            yield
+        finally:
+            if locked:
+                # Verlopen en door een andere replica overgenomen: niet diens lock verwijderen
+                self.client.eval(RELEASE_LOCK, 1, lock_key, token)
+
+
+def open_backend(namespace, url=None):
+    """Maak de backend voor een namespace op basis van LAB_CACHE_BACKEND
+
+    namespace: "closed" (afgesloten periodes) of "shared" (gedeelde/warm-start laag)
+
+    - leeg / "file": FileBackend in CACHE_DIR/<namespace>
+    - "redis://host:6379/0": RedisBackend (vereist het redis package)
+    - "memory://": RedisBackend op MemoryRedis (alleen binnen dit proces; voor bench en checks)
+    """
+    url = url if url is not None else CACHE_BACKEND
+    if url.startswith("memory://"):
+        return RedisBackend(memory_server(url), prefix=f"lab:{namespace}:")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+        return RedisBackend(redis.Redis.from_url(url), prefix=f"lab:{namespace}:")
+    return FileBackend(os.path.join(CACHE_DIR, namespace))
@@ -0,0 +1,139 @@
+"""
+LAB Dashboard streaming JSON decoding
+=====================================
+Decodeert de "result" array van een JSON-RPC antwoord incrementeel uit de
+response stream, record voor record, in plaats van response.json() op de
+volledige body. Zo staan de ruwe bytes, de gedecodeerde tekst en de
+complete lijst van dicts nooit tegelijk in het geheugen; bij verwerking
+per batch (iter_batches) is het piekgeheugen begrensd door de batchgrootte.
+
+Alleen de stdlib: json.JSONDecoder.raw_decode op een schuivende buffer.
+"""
+
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 2000
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class RpcErrorResponse(Exception):
+    """Het antwoord bevatte "error" in plaats van "result" """
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+
+class ResultStream:
+    """Itereer over de elementen van "result" in een JSON-RPC antwoord
+
+    chunks: iterable van bytes (bv. response.iter_content(CHUNK_SIZE)).
+    nbytes: aantal gelezen bytes (na het itereren: de grootte van de body).
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.nbytes = 0
+
+    def _fill(self, at_least=1):
+        """Lees minstens at_least tekens bij; False aan het eind van de stream"""
+        pending = self._buf[self._pos:]
+        added = []
+        size = 0
+        for chunk in self._chunks:
+            self.nbytes += len(chunk)
+            text = self._utf8.decode(chunk)
+            added.append(text)
+            size += len(text)
+            if size >= at_least:
+                break
+        else:
+            added.append(self._utf8.decode(b"", final=True))
+            self._eof = True
+        self._buf = pending + "".join(added)
+        self._pos = 0
+        return size > 0
+
+    def _peek(self):
+        """Volgende niet-whitespace teken, of None aan het eind"""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if self._eof or not self._fill():
+                return None
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"ongeldig JSON-RPC antwoord: {char!r} verwacht")
+        self._pos += 1
+
+    def _value(self):
+        """Decodeer de volgende complete JSON waarde uit de buffer"""
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Waarde nog niet compleet: buffer (minstens) verdubbelen
+                if self._eof or not self._fill(max(CHUNK_SIZE, len(self._buf) - self._pos)):
+                    raise
+                continue
+            if end == len(self._buf) and isinstance(value, (int, float)) and not self._eof:
+                # Een getal aan het eind van de buffer kan afgekapt zijn
+                if self._fill():
+                    continue
+            self._pos = end
+            return value
+
+    def __iter__(self):
+        self._expect("{")
+        while True:
+            char = self._peek()
+            if char == "}":
+                raise ValueError("ongeldig JSON-RPC antwoord: geen result")
+            if char == ",":
+                self._pos += 1
+                continue
+            key = self._value()
+            self._expect(":")
+            if key == "error":
+                raise RpcErrorResponse(self._value())
+            if key != "result":
+                self._value()
+                continue
+            if self._peek() != "[":
+                raise ValueError("ongeldig JSON-RPC antwoord: result is geen lijst")
+            self._pos += 1
+            while True:
+                char = self._peek()
+                if char == "]":
+                    self._pos += 1
+                    return
+                if char == ",":
+                    self._pos += 1
+                    continue
+                if char is None:
+                    raise ValueError("ongeldig JSON-RPC antwoord: afgebroken")
+                yield self._value()
+
+
+def iter_batches(records, size=BATCH_SIZE):
+    """Groepeer een iterable van records in lijsten van hoogstens size"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch